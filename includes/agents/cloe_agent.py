@@ -6,55 +6,166 @@ Hardware: CPU-Optimized
 """
 
 import argparse
-import gradio as gr
 import json
 import logging
 import numpy as np
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 import threading
 import time
 
+from cloe_ann import IVFIndex
+from cloe_assignment import candidate_edges, greedy_assignment
+from cloe_market_store import MarketStore
+from cloe_matching import CollectorIndex, artwork_vector, synthetic_collectors
+from cloe_trends import artwork_features, format_trends, score_trends, trending_styles
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class CloeAgent:
     def __init__(self):
         """Initialize CLOE Agent"""
-        self.market_data = {}
+        # Sales history as append-only numpy columns (price, timestamp, category, artist, style)
+        self.market_data = MarketStore()
         self.trend_analysis = {}
-        self.collector_profiles = []
+        # Collector preference vectors, matched against artworks with one matrix-vector product
+        self.collector_profiles = CollectorIndex()
+        
+        # Optional approximate index over the same vectors, for collector bases too large to scan
+        self.collector_ann = None
+        self.ann_nprobe = 16
         
         logger.info("📊 CLOE Agent initialized - Market Analysis & Collector Matching")
     
-    def analyze_market_trends(self, artwork_data: Dict) -> Dict:
+    def analyze_market_trends(self, artwork_data: Dict, seed: Optional[int] = None) -> Dict:
         """Analyze current market trends"""
+        return self.analyze_market_trends_batch([artwork_data], seed=seed)[0]
+    
+    def analyze_market_trends_batch(self, artworks: List[Dict], seed: Optional[int] = None) -> List[Dict]:
+        """Analyze many artworks at once: features are gathered into arrays once and scored together
         
-        analysis = {
-            "trend_score": np.random.uniform(0.6, 0.95),
-            "market_demand": "high",
-            "recommended_price": f"${np.random.randint(50, 500)}",
-            "best_time_to_sell": "next 7 days",
-            "trending_styles": ["digital art", "abstract", "fantasy"],
-            "collector_interest": "85%"
-        }
+        Price jitter is drawn from a local generator, so the same artworks and
+        seed always give the same results.
+        """
+        rng = np.random.default_rng(seed)
+        momentum = self.trend_analysis.get("style_momentum")
+        budgets = self.collector_profiles.budgets if len(self.collector_profiles) else None
         
-        return analysis
+        scores = score_trends(artwork_features(artworks), momentum, rng=rng, collector_budgets=budgets)
+        return format_trends(scores, trending_styles(momentum))
+    
+    def record_sales(self, sales: Iterable[Dict]) -> int:
+        """Append sales given as {price, timestamp, category, artist, style} dicts"""
+        sales = list(sales)
+        return self.market_data.append(
+            [s["price"] for s in sales],
+            [s["timestamp"] for s in sales],
+            [s.get("category", "") for s in sales],
+            [s.get("artist", "") for s in sales],
+            [s.get("style", "") for s in sales]
+        )
+    
+    def open_market_data(self, path: str, mmap: bool = True):
+        """Swap in a store flushed to ``path``; its columns are memory-mapped"""
+        self.market_data = MarketStore.open(path, mmap=mmap)
+        logger.info(f"🗄️ Opened market store with {len(self.market_data)} sales")
     
-    def match_collectors(self, artwork_style: str) -> List[Dict]:
-        """Match artwork with potential collectors"""
+    def add_collectors(self, profiles: Iterable[Dict]):
+        """Register or update collectors: {collector_id, preferences: {style: weight}, budget_min, budget_max}"""
+        rows = self.collector_profiles.add_profiles(profiles)
+        if self.collector_ann is not None and len(rows):
+            self.collector_ann.add(rows, self.collector_profiles.vectors[rows])
+    
+    def build_collector_ann(self, nlist: Optional[int] = None, pq_m: Optional[int] = None,
+                            nprobe: int = 16) -> IVFIndex:
+        """Index every collector for approximate matching (IVF, with PQ when pq_m is set)"""
         
-        matches = [
-            {"collector_id": "C001", "match_score": 0.92, "budget": "$200-500"},
-            {"collector_id": "C042", "match_score": 0.87, "budget": "$100-300"},
-            {"collector_id": "C156", "match_score": 0.81, "budget": "$300-800"}
-        ]
+        vectors = self.collector_profiles.vectors
+        nlist = nlist or int(np.clip(4 * np.sqrt(len(vectors)), 1, 65536))
+        index = IVFIndex(self.collector_profiles.dim, nlist=nlist, pq_m=pq_m)
+        index.train(vectors)
+        index.add(np.arange(len(vectors)), vectors)
+        index.compact()
         
-        return matches
+        self.collector_ann, self.ann_nprobe = index, nprobe
+        logger.info(f"🧭 Collector ANN index built: {index.get_stats()}")
+        return index
+    
+    def save_collector_ann(self, path: str):
+        if self.collector_ann is None:
+            raise RuntimeError("build the collector index before saving it")
+        self.collector_ann.save(path)
+    
+    def load_collector_ann(self, path: str, nprobe: int = 16):
+        """Memory-map a saved index; it must have been built over the current collector rows"""
+        
+        index = IVFIndex.load(path)
+        if len(index) != len(self.collector_profiles):
+            raise ValueError(f"index holds {len(index)} collectors, CLOE has {len(self.collector_profiles)}")
+        self.collector_ann, self.ann_nprobe = index, nprobe
+    
+    def match_collectors(self, artwork_style: str, price: Optional[float] = None, k: int = 3,
+                         tags: Iterable[str] = ()) -> List[Dict]:
+        """Match artwork with potential collectors
+        
+        Collectors are ranked by how well their preferences fit the style and
+        tags; with a price, only collectors whose budget covers it are kept.
+        Uses the approximate index when one has been built.
+        """
+        
+        query = artwork_vector(artwork_style, tags)
+        if self.collector_ann is None:
+            return self.collector_profiles.match(query, k=k, price=price)
+        
+        allowed = self.collector_profiles.eligible(price) if price is not None else None
+        rows, scores = self.collector_ann.search(
+            query, k=k, nprobe=self.ann_nprobe, allowed=allowed,
+            refine=self.collector_profiles.vectors
+        )
+        return self.collector_profiles.describe(rows, scores)
+    
+    def plan_notifications(self, artworks: List[Dict], k: int = 3, per_artwork: Optional[int] = None,
+                           candidates: Optional[int] = None, memory_mb: float = 256) -> Dict[str, List[Dict]]:
+        """Which collectors to notify about which new artworks
+        
+        Artworks are {id, style, tags, price} dicts. Every collector gets at
+        most ``k`` notifications, each artwork goes to at most
+        ``per_artwork`` collectors, and only artworks priced within a
+        collector's budget are sent to them. Each collector's ``candidates``
+        best artworks (default 4k) are considered, which bounds the edge list
+        at collectors x candidates; pass ``len(artworks)`` for all of them.
+        """
+        
+        if not artworks or not len(self.collector_profiles):
+            return {}
+        candidates = candidates if candidates is not None else 4 * k
+        vectors = np.stack([artwork_vector(a.get("style", ""), a.get("tags", ())) for a in artworks])
+        prices = np.array([a.get("price", 0.0) for a in artworks], dtype=np.float32)
+        budget_min, budget_max = self.collector_profiles.budgets
+        
+        edges = candidate_edges(self.collector_profiles.vectors, budget_min, budget_max, vectors, prices,
+                                candidates=candidates, memory_mb=memory_mb)
+        chosen = greedy_assignment(edges, k, per_artwork)
+        
+        collectors, artwork_rows, scores = edges
+        ids = self.collector_profiles.ids
+        plan = {}
+        for row, artwork, score in zip(collectors[chosen].tolist(), artwork_rows[chosen].tolist(),
+                                       scores[chosen].tolist()):
+            plan.setdefault(ids[row], []).append({
+                "artwork_id": artworks[artwork].get("id", artwork),
+                "match_score": round(score, 4)
+            })
+        for notifications in plan.values():
+            notifications.sort(key=lambda n: n["match_score"], reverse=True)
+        return plan
     
     def gradio_interface(self):
         """Create Gradio interface for CLOE"""
         
+        import gradio as gr
+        
         def analyze_with_cloe(artwork_description, style):
             trends = self.analyze_market_trends({"description": artwork_description, "style": style})
             matches = self.match_collectors(style)
@@ -81,10 +192,17 @@ def main():
     parser = argparse.ArgumentParser(description="CLOE Agent")
     parser.add_argument("--port", type=int, default=8000, help="Port to run on")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
+    parser.add_argument("--market-store", type=str, default=None, help="Directory of a flushed market store")
+    parser.add_argument("--synthetic-collectors", type=int, default=0, help="Load this many random collectors for demos")
     
     args = parser.parse_args()
     
     cloe = CloeAgent()
+    if args.market_store:
+        cloe.open_market_data(args.market_store)
+    if args.synthetic_collectors:
+        cloe.collector_profiles.add(*synthetic_collectors(args.synthetic_collectors))
+        logger.info(f"🎯 Loaded {args.synthetic_collectors} synthetic collectors")
     logger.info("📊 CLOE Agent ready on CPU")
     
     interface = cloe.gradio_interface()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+CLOE APPROXIMATE NEAREST NEIGHBOURS
+Inverted-file index (coarse k-means) with optional product quantization, in pure numpy
+Hardware: CPU-Optimized (BLAS), memory-mapped storage
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PQ_CENTROIDS = 256  # codes are uint8
+BLOCK = 16384  # rows per block when assigning or encoding
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, spherical: bool) -> np.ndarray:
+    """Index of the nearest centroid per row: highest dot product, or lowest L2 distance"""
+
+    half_norms = None if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assign = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), BLOCK):
+        scores = x[start:start + BLOCK] @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms  # argmax of x.c - |c|^2/2 is the L2 nearest
+        assign[start:start + BLOCK] = scores.argmax(axis=1)
+    return assign
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0, spherical: bool = False) -> np.ndarray:
+    """Lloyd's k-means; ``spherical`` keeps centroids unit length for inner-product search"""
+
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    if len(x) < k:
+        raise ValueError(f"need at least {k} training vectors, got {len(x)}")
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = _nearest(x, centroids, spherical)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(x[order], starts, axis=0) / counts[filled, None]
+        # Empty clusters restart from random training points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1.0)
+    return centroids
+
+
+class IVFIndex:
+    """Inner-product search over ``nlist`` k-means cells, probing the ``nprobe`` nearest
+
+    Vectors should be L2-normalized (as CollectorIndex rows are), so scores
+    are cosine similarities. With ``pq_m`` set, each vector is stored as
+    ``pq_m`` one-byte codes of its residual from the cell centroid. Scores
+    are then approximate and come from a per-query lookup table. That is 4 *
+    dim / pq_m times less memory than float32.
+
+    Entries are labelled with non-negative integers (e.g. CollectorIndex
+    rows). Adding a label again supersedes its earlier entry; stale entries
+    are skipped at search time and dropped by ``compact``. Storage is a CSR
+    layout sorted by cell plus an in-memory tail for entries added since
+    the last compaction. ``save`` writes the CSR arrays as .npy files that
+    ``load`` memory-maps, so an index larger than RAM pages in on demand.
+    """
+
+    def __init__(self, dim: int, nlist: int = 256, pq_m: Optional[int] = None, seed: int = 0):
+        if pq_m is not None and dim % pq_m:
+            raise ValueError("dim must be a multiple of pq_m")
+        self.dim = dim
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.seed = seed
+
+        self.centroids = None
+        self.codebooks = None  # (pq_m, 256, dim / pq_m)
+
+        width = (pq_m,) if pq_m else (dim,)
+        self._dtype = np.uint8 if pq_m else np.float32
+        self._offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self._labels = np.zeros(0, dtype=np.int64)
+        self._seqs = np.zeros(0, dtype=np.int64)
+        self._data = np.zeros((0,) + width, dtype=self._dtype)
+        self._tail = [[] for _ in range(nlist)]  # per cell: [(labels, seqs, data)]
+        self._tail_size = 0
+
+        self._latest = np.full(1024, -1, dtype=np.int64)  # label -> seq of its live entry
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._latest >= 0))
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def train(self, x: np.ndarray, sample: Optional[int] = None, iters: int = 20):
+        """Fit the coarse centroids (and PQ codebooks) on up to ``sample`` vectors"""
+
+        x = np.asarray(x, dtype=np.float32)
+        sample = sample or max(self.nlist * 64, PQ_CENTROIDS * 64 if self.pq_m else 0)
+        if len(x) > sample:
+            rng = np.random.default_rng(self.seed)
+            x = x[np.sort(rng.choice(len(x), sample, replace=False))]
+
+        start = time.perf_counter()
+        self.centroids = kmeans(x, self.nlist, iters=iters, seed=self.seed, spherical=True)
+        if self.pq_m:
+            residuals = x - self.centroids[_nearest(x, self.centroids, spherical=True)]
+            dsub = self.dim // self.pq_m
+            self.codebooks = np.stack([
+                kmeans(residuals[:, j * dsub:(j + 1) * dsub], PQ_CENTROIDS, iters=iters, seed=self.seed + j)
+                for j in range(self.pq_m)
+            ])
+        logger.info(f"🧭 Trained IVF{self.nlist}{f',PQ{self.pq_m}' if self.pq_m else ''} "
+                    f"on {len(x)} vectors in {time.perf_counter() - start:.2f}s")
+
+    def _encode(self, x: np.ndarray, cells: np.ndarray) -> np.ndarray:
+        if not self.pq_m:
+            return x
+        residuals = x - self.centroids[cells]
+        dsub = self.dim // self.pq_m
+        codes = np.empty((len(x), self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = _nearest(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j], spherical=False)
+        return codes
+
+    def add(self, labels, x: np.ndarray):
+        """Index vectors under integer labels; re-added labels replace their earlier entry"""
+
+        if not self.is_trained:
+            raise RuntimeError("train the index before adding vectors")
+        labels = np.asarray(labels, dtype=np.int64)
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(len(labels), self.dim)
+        cells = _nearest(x, self.centroids, spherical=True)
+        data = self._encode(x, cells)
+
+        with self._lock:
+            seqs = np.arange(self._next_seq, self._next_seq + len(labels), dtype=np.int64)
+            self._next_seq += len(labels)
+            if len(labels) and labels.max() >= len(self._latest):
+                grown = np.full(max(int(labels.max()) + 1, 2 * len(self._latest)), -1, dtype=np.int64)
+                grown[:len(self._latest)] = self._latest
+                self._latest = grown
+            # Within one call the last occurrence of a label wins, as it would across calls
+            self._latest[labels] = seqs
+
+            order = np.argsort(cells, kind="stable")
+            bounds = np.searchsorted(cells[order], np.arange(self.nlist + 1))
+            for cell in np.flatnonzero(np.diff(bounds)):
+                rows = order[bounds[cell]:bounds[cell + 1]]
+                self._tail[cell].append((labels[rows], seqs[rows], data[rows]))
+            self._tail_size += len(labels)
+
+    def compact(self):
+        """Merge the tail into the CSR arrays, dropping superseded entries"""
+
+        with self._lock:
+            parts = ([], [], [])
+            offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+            for cell in range(self.nlist):
+                lo, hi = self._offsets[cell], self._offsets[cell + 1]
+                chunks = [(self._labels[lo:hi], self._seqs[lo:hi], self._data[lo:hi])] + self._tail[cell]
+                labels = np.concatenate([c[0] for c in chunks])
+                seqs = np.concatenate([c[1] for c in chunks])
+                live = self._latest[labels] == seqs
+                for part, chunk_arrays in zip(parts, (labels, seqs, np.concatenate([c[2] for c in chunks]))):
+                    part.append(chunk_arrays[live])
+                offsets[cell + 1] = offsets[cell] + int(live.sum())
+
+            self._labels, self._seqs, self._data = (np.concatenate(part) for part in parts)
+            self._offsets = offsets
+            self._tail = [[] for _ in range(self.nlist)]
+            self._tail_size = 0
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _cell_entries(self, cell: int):
+        lo, hi = self._offsets[cell], self._offsets[cell + 1]
+        chunks = [(self._labels[lo:hi], self._seqs[lo:hi], self._data[lo:hi])] + self._tail[cell]
+        if len(chunks) == 1:
+            return chunks[0]
+        return tuple(np.concatenate([c[i] for c in chunks]) for i in range(3))
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 8,
+               allowed: Optional[np.ndarray] = None, refine: Optional[np.ndarray] = None,
+               refine_factor: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """(labels, scores) of the top k, best first
+
+        ``allowed`` is an optional boolean array indexed by label; labels
+        outside it or False in it are skipped (e.g. collectors over budget).
+        ``refine`` is the full-precision vectors indexed by label; when
+        given, the best ``k * refine_factor`` approximate (PQ) candidates
+        are rescored exactly.
+        """
+
+        query = np.asarray(query, dtype=np.float32)
+        cell_scores = self.centroids @ query
+        nprobe = min(nprobe, self.nlist)
+        cells = np.argpartition(cell_scores, self.nlist - nprobe)[self.nlist - nprobe:]
+
+        tables = None
+        if self.pq_m:
+            # Score of each code per subspace: one (pq_m, 256) table serves every probed cell
+            dsub = self.dim // self.pq_m
+            tables = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.pq_m, dsub))
+            flat_tables = tables.ravel()
+            code_offsets = np.arange(self.pq_m) * PQ_CENTROIDS
+
+        with self._lock:
+            latest = self._latest
+            entries = [self._cell_entries(cell) for cell in cells]
+
+        found_labels, found_scores = [], []
+        for cell, (labels, seqs, data) in zip(cells, entries):
+            if not len(labels):
+                continue
+            keep = latest[labels] == seqs
+            if allowed is not None:
+                in_range = labels < len(allowed)
+                keep &= in_range
+                keep[in_range] &= allowed[labels[in_range]]
+            if not keep.all():
+                labels, data = labels[keep], data[keep]
+            if self.pq_m:
+                scores = cell_scores[cell] + flat_tables[data.astype(np.intp) + code_offsets].sum(axis=1)
+            else:
+                scores = data @ query
+            found_labels.append(labels)
+            found_scores.append(scores)
+
+        if not found_labels:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        labels = np.concatenate(found_labels)
+        scores = np.concatenate(found_scores).astype(np.float32)
+        if refine is not None and self.pq_m:
+            labels, scores = self._top(labels, scores, k * refine_factor)
+            scores = np.asarray(refine[labels], dtype=np.float32) @ query
+        return self._top(labels, scores, k)
+
+    @staticmethod
+    def _top(labels: np.ndarray, scores: np.ndarray, k: int):
+        k = min(k, len(scores))
+        if k == 0:
+            return labels[:0], scores[:0]
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return labels[top], scores[top]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        """Compact and write the index to a directory of .npy files"""
+
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "centroids": self.centroids,
+            "offsets": self._offsets,
+            "labels": self._labels,
+            "seqs": self._seqs,
+            "data": self._data,
+            "latest": self._latest
+        }
+        if self.pq_m:
+            arrays["codebooks"] = self.codebooks
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy.tmp"), array, allow_pickle=False)
+            os.replace(os.path.join(path, f"{name}.npy.tmp.npy"), os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": self.dim, "nlist": self.nlist, "pq_m": self.pq_m, "seed": self.seed,
+                       "next_seq": self._next_seq}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        """Open a saved index; with ``mmap`` the stored vectors stay on disk until searched"""
+
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], meta["nlist"], meta["pq_m"], meta["seed"])
+        mode = "r" if mmap else None
+
+        def read(name, mapped=False):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode if mapped else None)
+
+        index.centroids = read("centroids")
+        if index.pq_m:
+            index.codebooks = read("codebooks")
+        index._offsets = read("offsets")
+        index._labels = read("labels", mapped=True)
+        index._seqs = read("seqs", mapped=True)
+        index._data = read("data", mapped=True)
+        index._latest = read("latest")  # written to on add, so always in memory
+        index._next_seq = meta["next_seq"]
+        return index
+
+    def get_stats(self) -> Dict:
+        sizes = np.diff(self._offsets)
+        return {
+            "vectors": len(self),
+            "nlist": self.nlist,
+            "pq_m": self.pq_m,
+            "tail": self._tail_size,
+            "bytes_per_vector": self._data.itemsize * (self.pq_m or self.dim),
+            "largest_cell": int(sizes.max()) if len(sizes) else 0,
+            "memory_mapped": isinstance(self._data, np.memmap)
+        }
+
+
+def benchmark_recall(size: int = 200_000, dim: int = 64, nlist: int = 512, pq_m: int = 16,
+                     queries: int = 100, k: int = 10, nprobes=(1, 4, 16, 64)) -> List[Dict]:
+    """Recall@k and latency per query of IVF and IVF-PQ against exact search"""
+
+    from cloe_matching import synthetic_collectors
+
+    _, vectors, _, _ = synthetic_collectors(size, dim)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    rng = np.random.default_rng(7)
+    query_vectors = vectors[rng.choice(size, queries, replace=False)] + rng.normal(0, 0.1, (queries, dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = []
+    for query in query_vectors:
+        scores = vectors @ query
+        exact.append(set(np.argpartition(scores, size - k)[size - k:].tolist()))
+    exact_ms = (time.perf_counter() - start) / queries * 1000
+
+    reports = [{"index": "exact", "nprobe": None, "recall": 1.0, "ms_per_query": round(exact_ms, 3)}]
+    for m in (None, pq_m):
+        index = IVFIndex(dim, nlist=nlist, pq_m=m)
+        start = time.perf_counter()
+        index.train(vectors)
+        index.add(np.arange(size), vectors)
+        index.compact()
+        build = time.perf_counter() - start
+
+        for nprobe, refine in [(n, None) for n in nprobes] + ([(n, vectors) for n in nprobes] if m else []):
+            start = time.perf_counter()
+            results = [index.search(query, k=k, nprobe=nprobe, refine=refine)[0] for query in query_vectors]
+            elapsed = (time.perf_counter() - start) / queries * 1000
+            recall = np.mean([len(truth & set(found.tolist())) / k for truth, found in zip(exact, results)])
+            reports.append({
+                "index": f"IVF{nlist}" + (f",PQ{m}" if m else "") + (",refined" if refine is not None else ""),
+                "nprobe": nprobe,
+                "recall": round(float(recall), 3),
+                "ms_per_query": round(elapsed, 3),
+                "build_seconds": round(build, 2),
+                "bytes_per_vector": index.get_stats()["bytes_per_vector"]
+            })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLOE ANN recall vs latency benchmark")
+    parser.add_argument("--size", type=int, default=200_000, help="Indexed vectors")
+    parser.add_argument("--nlist", type=int, default=512, help="Coarse cells")
+    parser.add_argument("--pq-m", type=int, default=16, help="PQ sub-quantizers")
+    parser.add_argument("--queries", type=int, default=100, help="Queries to time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for report in benchmark_recall(args.size, nlist=args.nlist, pq_m=args.pq_m, queries=args.queries):
+        logger.info(f"🧭 ANN benchmark: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+CLOE NOTIFICATION ASSIGNMENT
+Bulk collector x artwork assignment with per-collector and per-artwork caps, scored in memory-bounded blocks
+Hardware: CPU-Optimized (BLAS)
+"""
+
+import argparse
+import heapq
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from cloe_matching import FEATURE_DIM, synthetic_collectors
+
+logger = logging.getLogger(__name__)
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]  # (collector rows, artwork rows, scores)
+
+
+def candidate_edges(collector_vectors: np.ndarray, budget_min: np.ndarray, budget_max: np.ndarray,
+                    artwork_vectors: np.ndarray, prices: np.ndarray, candidates: Optional[int] = None,
+                    min_score: float = 0.0, memory_mb: float = 256) -> Edges:
+    """Eligible (collector, artwork, score) edges, scoring the collectors in blocks
+
+    Each block is one (block, artworks) matrix product of at most
+    ``memory_mb``. Artworks priced outside a collector's budget, or scoring
+    at most ``min_score``, get no edge. With ``candidates``, only each
+    collector's best ``candidates`` artworks are kept, which bounds the
+    edge list at ``collectors * candidates``.
+    """
+
+    artwork_vectors = np.ascontiguousarray(artwork_vectors, dtype=np.float32)
+    prices = np.asarray(prices, dtype=np.float32)
+    count = len(artwork_vectors)
+    # Score matrix plus the eligibility mask and partition scratch, per row
+    block = max(1, int(memory_mb * 1024**2 // max(1, count * 10)))
+
+    parts = []
+    for first in range(0, len(collector_vectors), block):
+        rows = slice(first, first + block)
+        scores = collector_vectors[rows] @ artwork_vectors.T
+        outside = (budget_min[rows, None] > prices[None, :]) | (budget_max[rows, None] < prices[None, :])
+        scores[outside | (scores <= min_score)] = -np.inf
+
+        if candidates is not None and candidates < count:
+            columns = np.argpartition(scores, count - candidates, axis=1)[:, count - candidates:]
+            kept = np.take_along_axis(scores, columns, axis=1)
+            local, slot = np.nonzero(np.isfinite(kept))
+            parts.append((local + first, columns[local, slot], kept[local, slot]))
+        else:
+            local, columns = np.nonzero(np.isfinite(scores))
+            parts.append((local + first, columns, scores[local, columns]))
+
+    if not parts:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+    return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+
+def _best_first(groups: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Order by group, then by descending score, from one uint64 sort
+
+    Float32 scores map to uint32 keys with the same order (flip every bit
+    of negatives, only the sign bit of the rest), so the group and the
+    inverted score share one integer key; this is several times faster
+    than ``np.lexsort`` on millions of edges. Equal scores within a group
+    come out in no particular order.
+    """
+
+    bits = np.ascontiguousarray(scores, dtype=np.float32).view(np.uint32)
+    ordered = np.where(bits >> np.uint32(31), ~bits, bits | np.uint32(0x80000000))
+    keys = groups.astype(np.uint64) << np.uint64(32)
+    keys |= (~ordered).astype(np.uint64)
+    return np.argsort(keys)
+
+
+def greedy_assignment(edges: Edges, per_collector: int, per_artwork: Optional[int] = None) -> np.ndarray:
+    """Indices of the chosen edges, as if taken best-first while both caps allow
+
+    Runs as vectorized deferred-acceptance rounds instead of one edge at a
+    time. Each collector with free slots proposes its next best edges to
+    fill them, and each artwork holds its best ``per_artwork`` proposals
+    and rejects the rest. A round costs O(held + proposed) edges, not the
+    whole edge list. Scores rank every edge the same way from both sides,
+    so the stable result is exactly the best-first greedy assignment,
+    which is within a factor 2 of the optimum (and near it in practice;
+    see ``benchmark_assignment``).
+    """
+
+    collectors, artworks, scores = (np.asarray(edge) for edge in edges)
+    if len(scores) == 0 or per_collector <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = _best_first(collectors, scores)
+    c, a, s = collectors[order], artworks[order], scores[order]
+    groups = int(c.max()) + 1
+    artwork_groups = int(a.max()) + 1
+    counts = np.bincount(c, minlength=groups)
+    starts = np.cumsum(counts) - counts
+
+    # Each round touches only the held edges and the new offers, never the whole edge list
+    held = np.zeros(0, dtype=np.int64)  # positions in the sorted edges
+    proposed = np.zeros(groups, dtype=np.int64)  # each collector's edges are proposed in rank order
+    holding = np.zeros(groups, dtype=np.int64)
+    while True:
+        free = np.minimum(per_collector - holding, counts - proposed)
+        active = np.flatnonzero(free > 0)
+        if len(active) == 0:
+            break
+        sizes = free[active]
+        first = np.repeat(starts[active] + proposed[active] - np.cumsum(sizes) + sizes, sizes)
+        offers = first + np.arange(int(sizes.sum()))
+        proposed[active] += sizes
+        held = np.concatenate([held, offers])
+
+        if per_artwork is not None:
+            # Only artworks over their cap need re-ranking
+            over = np.bincount(a[held], minlength=artwork_groups) > per_artwork
+            contested = over[a[held]]
+            active_edges = held[contested]
+            # Best first within each artwork
+            ranked = active_edges[_best_first(a[active_edges], s[active_edges])]
+            artwork_of = a[ranked]
+            boundaries = np.flatnonzero(np.r_[True, artwork_of[1:] != artwork_of[:-1]])
+            lengths = np.diff(np.r_[boundaries, len(ranked)])
+            position = np.arange(len(ranked)) - np.repeat(boundaries, lengths)
+            held = np.concatenate([held[~contested], ranked[position < per_artwork]])
+        holding = np.bincount(c[held], minlength=groups)
+
+    return np.sort(order[held])
+
+
+def exact_assignment(edges: Edges, per_collector: int, per_artwork: Optional[int] = None) -> np.ndarray:
+    """Optimal edge indices by min-cost flow; for checking the greedy on small inputs only
+
+    Successive shortest paths with Dijkstra on reduced costs. Augmenting
+    stops once the cheapest path no longer adds score.
+    """
+
+    collectors, artworks, scores = (np.asarray(edge) for edge in edges)
+    if len(scores) == 0 or per_collector <= 0:
+        return np.zeros(0, dtype=np.int64)
+    n_c = int(collectors.max()) + 1
+    n_a = int(artworks.max()) + 1
+    source, sink = n_c + n_a, n_c + n_a + 1
+    nodes = n_c + n_a + 2
+    artwork_cap = per_artwork if per_artwork is not None else n_c
+
+    graph = [[] for _ in range(nodes)]  # per node: [to, capacity, cost, reverse index]
+
+    def add(u, v, capacity, cost):
+        graph[u].append([v, capacity, cost, len(graph[v])])
+        graph[v].append([u, 0, -cost, len(graph[u]) - 1])
+
+    for node in range(n_c):
+        add(source, node, per_collector, 0.0)
+    edge_slots = []
+    for c, a, score in zip(collectors.tolist(), artworks.tolist(), scores.tolist()):
+        edge_slots.append((c, len(graph[c])))
+        add(c, n_c + a, 1, -score)
+    for node in range(n_a):
+        add(n_c + node, sink, artwork_cap, 0.0)
+
+    # The initial graph is a DAG, so its shortest distances give valid starting potentials
+    potential = [0.0] * nodes
+    for c, a, score in zip(collectors.tolist(), artworks.tolist(), scores.tolist()):
+        potential[n_c + a] = min(potential[n_c + a], -score)
+    potential[sink] = min(potential[n_c:n_c + n_a])
+
+    while True:
+        dist = [np.inf] * nodes
+        parent = [None] * nodes
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for i, (v, capacity, cost, _) in enumerate(graph[u]):
+                if capacity <= 0:
+                    continue
+                nd = d + cost + potential[u] - potential[v]
+                if nd < dist[v] - 1e-12:
+                    dist[v] = nd
+                    parent[v] = (u, i)
+                    heapq.heappush(heap, (nd, v))
+        if dist[sink] == np.inf or dist[sink] + potential[sink] - potential[source] >= -1e-12:
+            break
+        for node in range(nodes):
+            if dist[node] < np.inf:
+                potential[node] += dist[node]
+
+        node = sink
+        while node != source:
+            u, i = parent[node]
+            graph[u][i][1] -= 1
+            v, _, _, back = graph[u][i]
+            graph[v][back][1] += 1
+            node = u
+
+    return np.array([i for i, (c, slot) in enumerate(edge_slots) if graph[c][slot][1] == 0], dtype=np.int64)
+
+
+def check_caps(edges: Edges, chosen: np.ndarray, per_collector: int, per_artwork: Optional[int] = None) -> bool:
+    collectors, artworks, _ = edges
+    ok = len(chosen) == 0 or np.bincount(collectors[chosen]).max() <= per_collector
+    if per_artwork is not None and len(chosen):
+        ok = ok and np.bincount(artworks[chosen]).max() <= per_artwork
+    return bool(ok)
+
+
+def synthetic_artworks(count: int, dim: int = FEATURE_DIM, seed: int = 1):
+    """(vectors, prices) for ``count`` random new artworks"""
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.random((count, dim), dtype=np.float32)
+    vectors *= rng.random((count, dim), dtype=np.float32) < 0.2
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+    return vectors, np.round(rng.lognormal(5.5, 0.6, count)).astype(np.float32)
+
+
+def benchmark_assignment(collectors: int = 200_000, artworks: int = 500, k: int = 3,
+                         per_artwork: Optional[int] = 500, memory_mb: float = 256,
+                         exact_sizes=((300, 30), (600, 40))) -> Dict:
+    """Wall time at scale, plus greedy vs optimal total score on small inputs"""
+
+    def normalized(vectors):
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+
+    quality = []
+    for n_c, n_a in exact_sizes:
+        _, c_vectors, low, high = synthetic_collectors(n_c, seed=n_c)
+        a_vectors, prices = synthetic_artworks(n_a, seed=n_a)
+        edges = candidate_edges(normalized(c_vectors), low, high, a_vectors, prices)
+        cap = max(1, n_c * k // n_a // 4)  # tight enough that artworks compete for collectors
+        start = time.perf_counter()
+        greedy = greedy_assignment(edges, k, cap)
+        greedy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        exact = exact_assignment(edges, k, cap)
+        exact_seconds = time.perf_counter() - start
+        quality.append({
+            "collectors": n_c,
+            "artworks": n_a,
+            "per_artwork": cap,
+            "greedy_score": round(float(edges[2][greedy].sum()), 3),
+            "optimal_score": round(float(edges[2][exact].sum()), 3),
+            "ratio": round(float(edges[2][greedy].sum() / max(edges[2][exact].sum(), 1e-9)), 4),
+            "greedy_ms": round(greedy_seconds * 1000, 2),
+            "exact_ms": round(exact_seconds * 1000, 1)
+        })
+
+    _, c_vectors, low, high = synthetic_collectors(collectors)
+    c_vectors = normalized(c_vectors)
+    a_vectors, prices = synthetic_artworks(artworks)
+    start = time.perf_counter()
+    edges = candidate_edges(c_vectors, low, high, a_vectors, prices, candidates=4 * k, memory_mb=memory_mb)
+    scoring = time.perf_counter() - start
+    start = time.perf_counter()
+    chosen = greedy_assignment(edges, k, per_artwork)
+    solving = time.perf_counter() - start
+
+    return {
+        "collectors": collectors,
+        "artworks": artworks,
+        "candidate_edges": len(edges[2]),
+        "notifications": len(chosen),
+        "scoring_s": round(scoring, 2),
+        "assignment_s": round(solving, 2),
+        "caps_respected": check_caps(edges, chosen, k, per_artwork),
+        "quality_vs_exact": quality
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLOE notification assignment benchmark")
+    parser.add_argument("--collectors", type=int, default=200_000, help="Synthetic collectors")
+    parser.add_argument("--artworks", type=int, default=500, help="New artworks to place")
+    parser.add_argument("--k", type=int, default=3, help="Notifications per collector")
+    parser.add_argument("--per-artwork", type=int, default=500, help="Notifications per artwork")
+    parser.add_argument("--memory-mb", type=float, default=256, help="Score block size")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = benchmark_assignment(args.collectors, args.artworks, args.k, args.per_artwork, args.memory_mb)
+    logger.info(f"📬 Assignment benchmark: {report}")
+
+
+if __name__ == "__main__":
+    main()
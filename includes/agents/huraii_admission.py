@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+HURAII ADMISSION CONTROL
+Load-adaptive quality tiers that hold a target p95 generation latency
+Hardware: CPU (bookkeeping only)
+"""
+
+import logging
+import math
+import threading
+from collections import Counter, deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+BASE_RESOLUTION = 512
+
+# Ordered from best to cheapest; steps scale the requested count, sizes are multiples of 8
+QUALITY_TIERS = [
+    {"name": "full", "step_scale": 1.0, "size": 512},
+    {"name": "reduced", "step_scale": 0.7, "size": 512},
+    {"name": "economy", "step_scale": 0.5, "size": 448},
+    {"name": "minimal", "step_scale": 0.4, "size": 384}
+]
+
+
+class AdmissionController:
+    """Pick a quality tier per request from queue depth and recent step latency
+
+    Latency is tracked per denoising step, normalized to a 512x512 image, so
+    one history serves every tier. A request's expected latency is the p95
+    step latency times its steps and pixel ratio, times the number of
+    batches queued ahead of it. The controller only moves to a cheaper tier
+    after ``sustain_checks`` consecutive decisions over ``target_p95``, and
+    only moves back up one tier after ``recover_checks`` consecutive
+    decisions with room to spare, so short bursts do not flip quality back
+    and forth. Premium requests always get the full tier.
+    """
+
+    def __init__(self, target_p95: float = 30.0, batch_size: int = 4, window: int = 200,
+                 sustain_checks: int = 3, recover_checks: int = 10, tiers=QUALITY_TIERS):
+        self.target_p95 = target_p95
+        self.batch_size = max(1, batch_size)
+        self.sustain_checks = sustain_checks
+        self.recover_checks = recover_checks
+        self.tiers = tiers
+
+        self._step_latencies = deque(maxlen=window)
+        self._level = 0
+        self._over = 0
+        self._under = 0
+        self._last_estimate = 0.0
+        self._tier_counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, run_time: float, num_inference_steps: int, width: int, height: int):
+        """Feed back the observed pipeline time of a finished run"""
+
+        if num_inference_steps <= 0:
+            return
+        pixel_ratio = (width * height) / BASE_RESOLUTION**2
+        with self._lock:
+            self._step_latencies.append(run_time / num_inference_steps / pixel_ratio)
+
+    def _step_p95(self) -> float:
+        if not self._step_latencies:
+            return 0.0
+        ordered = sorted(self._step_latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def _estimate(self, tier: Dict, steps: int, queue_depth: int, step_p95: float) -> float:
+        tier_steps = max(1, int(round(steps * tier["step_scale"])))
+        pixel_ratio = tier["size"] ** 2 / BASE_RESOLUTION**2
+        batches_ahead = math.ceil((queue_depth + 1) / self.batch_size)
+        return step_p95 * tier_steps * pixel_ratio * batches_ahead
+
+    def admit(self, num_inference_steps: int, premium: bool = False, queue_depth: int = 0) -> Dict:
+        """Decide the steps and resolution a request actually runs with"""
+
+        with self._lock:
+            step_p95 = self._step_p95()
+
+            # Cheapest tier we would need right now to meet the target
+            needed = len(self.tiers) - 1
+            for index, tier in enumerate(self.tiers):
+                if self._estimate(tier, num_inference_steps, queue_depth, step_p95) <= self.target_p95:
+                    needed = index
+                    break
+
+            if needed > self._level:
+                self._over += 1
+                self._under = 0
+                if self._over >= self.sustain_checks:
+                    self._level = needed
+                    self._over = 0
+                    logger.info(f"⚠️ Sustained load: degrading non-premium quality to '{self.tiers[needed]['name']}'")
+            elif needed < self._level:
+                self._under += 1
+                self._over = 0
+                if self._under >= self.recover_checks:
+                    self._level -= 1
+                    self._under = 0
+                    logger.info(f"✅ Load easing: non-premium quality back to '{self.tiers[self._level]['name']}'")
+            else:
+                self._over = self._under = 0
+
+            tier = self.tiers[0] if premium else self.tiers[self._level]
+            self._last_estimate = self._estimate(tier, num_inference_steps, queue_depth, step_p95)
+            self._tier_counts[tier["name"]] += 1
+
+        return {
+            "tier": tier["name"],
+            "num_inference_steps": max(1, int(round(num_inference_steps * tier["step_scale"]))),
+            "width": tier["size"],
+            "height": tier["size"],
+            "requested_steps": num_inference_steps,
+            "degraded": tier is not self.tiers[0]
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "target_p95": self.target_p95,
+                "current_tier": self.tiers[self._level]["name"],
+                "step_latency_p95": round(self._step_p95(), 4),
+                "last_estimate": round(self._last_estimate, 2),
+                "tier_counts": dict(self._tier_counts)
+            }
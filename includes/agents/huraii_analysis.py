@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+HURAII IMAGE ANALYSIS
+Per-image and vectorized batch analysis of generated artwork
+Hardware: CPU
+"""
+
+import argparse
+import logging
+import math
+import time
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on float32 values held in memory at once by the batch path
+BATCH_CHUNK_VALUES = 32 * 1024 * 1024
+
+# Pixels per float32 partial sum; 256 * 255**2 < 2**24 keeps sums of squares exact
+EXACT_BLOCK_PIXELS = 256
+
+# Dominant colors come from a 2**PALETTE_BITS levels-per-channel color cube (4096 bins)
+PALETTE_BITS = 4
+PALETTE_SIZE = 5
+
+# Larger images are strided down to about this many pixels before binning
+PALETTE_SAMPLE_PIXELS = 65536
+
+
+def analyze_colors(img_array: np.ndarray) -> Dict:
+    """Analyze color composition of generated art"""
+
+    pixels = np.asarray(img_array)
+    if pixels.dtype != np.uint8:
+        pixels = np.clip(np.rint(pixels), 0, 255).astype(np.uint8)
+
+    # One float32 copy; sums and sums of squares of 8-bit values are exact in it
+    values = pixels.reshape(1, -1, 3).astype(np.float32)
+    channel_sums = _channel_sums(values)
+    np.multiply(values, values, out=values)
+    channel_squares = _channel_sums(values)
+
+    return _color_analysis(
+        channel_sums[0], channel_squares[0], values.shape[1], dominant_colors_batch(pixels[np.newaxis])[0]
+    )
+
+
+def _color_analysis(channel_sums: np.ndarray, channel_squares: np.ndarray, num_pixels: int,
+                    palette: List[Dict]) -> Dict:
+    """Color stats of one image from its per-channel sums and sums of squares"""
+
+    avg_color = channel_sums / num_pixels
+    color_variance = np.maximum(channel_squares / num_pixels - avg_color**2, 0.0)
+    overall_mean = channel_sums.sum() / (3 * num_pixels)
+    overall_var = max(channel_squares.sum() / (3 * num_pixels) - overall_mean**2, 0.0)
+
+    return {
+        "average_rgb": avg_color.tolist(),
+        "color_variance": color_variance.tolist(),
+        "brightness": float(np.mean(avg_color)),
+        "contrast": float(np.sqrt(overall_var)),
+        "dominant_colors": palette
+    }
+
+
+def dominant_colors_batch(images: np.ndarray, k: int = PALETTE_SIZE,
+                          max_samples: int = PALETTE_SAMPLE_PIXELS) -> List[List[Dict]]:
+    """Top-k colors with pixel weights for each image of an (N, H, W, 3) uint8 stack
+
+    Pixels are quantized into a coarse color cube and counted with a single
+    ``bincount`` over the whole stack (bins offset per image). Images larger
+    than ``max_samples`` pixels are read with a fixed stride, so the cost
+    stays flat as resolution grows. Each reported color is the mean of the
+    sampled pixels in its bin, not the bin center.
+    """
+
+    n, height, width, _ = images.shape
+    stride = max(1, math.ceil(math.sqrt(height * width / max_samples)))
+    sample = images[:, ::stride, ::stride].reshape(n, -1, 3)
+
+    bits = PALETTE_BITS
+    bins = 1 << (3 * bits)
+    quantized = sample >> (8 - bits)
+    index = quantized[..., 0].astype(np.intp) << (2 * bits)
+    index |= quantized[..., 1].astype(np.intp) << bits
+    index |= quantized[..., 2]
+    index += (np.arange(n, dtype=np.intp) * bins)[:, np.newaxis]
+    index = index.ravel()
+
+    counts = np.bincount(index, minlength=n * bins).reshape(n, bins)
+    color_sums = np.stack([
+        np.bincount(index, weights=sample[..., c].ravel(), minlength=n * bins).reshape(n, bins)
+        for c in range(3)
+    ], axis=-1)
+
+    k = min(k, bins)
+    top = np.argpartition(-counts, k - 1, axis=1)[:, :k]
+    top_counts = np.take_along_axis(counts, top, axis=1)
+    # Heaviest first; ties broken by bin index so results are deterministic
+    order = np.lexsort((top, -top_counts), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_counts = np.take_along_axis(top_counts, order, axis=1)
+
+    total = sample.shape[1]
+    palettes = []
+    for i in range(n):
+        palette = []
+        for bin_index, count in zip(top[i], top_counts[i]):
+            if count == 0:
+                break
+            rgb = np.rint(color_sums[i, bin_index] / count).astype(int)
+            palette.append({"rgb": rgb.tolist(), "weight": round(float(count / total), 4)})
+        palettes.append(palette)
+    return palettes
+
+
+def calculate_quality_score(img_array: np.ndarray) -> float:
+    """Calculate overall quality score of the generated art"""
+
+    # Calculate sharpness (using gradient magnitude)
+    gray = np.mean(img_array, axis=2) if len(img_array.shape) == 3 else img_array
+    gradient_x = np.gradient(gray, axis=1)
+    gradient_y = np.gradient(gray, axis=0)
+    gradient_magnitude = np.sqrt(gradient_x**2 + gradient_y**2)
+    sharpness = np.mean(gradient_magnitude)
+
+    # Normalize sharpness to 0-1 scale
+    quality_score = min(1.0, sharpness / 100)
+
+    return round(quality_score, 3)
+
+
+def _channel_sums(values: np.ndarray) -> np.ndarray:
+    """Exact per-channel sums of an (N, P, 3) float32 stack of integer values
+
+    Blocks of EXACT_BLOCK_PIXELS are reduced with a float32 matmul (exact for
+    these magnitudes) and the block sums are then added in float64.
+    """
+
+    n, num_pixels, _ = values.shape
+    blocked = num_pixels - num_pixels % EXACT_BLOCK_PIXELS
+    ones = np.ones(EXACT_BLOCK_PIXELS, dtype=np.float32)
+
+    blocks = values[:, :blocked].reshape(n, -1, EXACT_BLOCK_PIXELS, 3)
+    sums = np.matmul(ones, blocks).sum(axis=1, dtype=np.float64)
+    if blocked < num_pixels:
+        sums += values[:, blocked:].sum(axis=1, dtype=np.float64)
+    return sums
+
+
+def _gradient_magnitude_mean(gray: np.ndarray) -> np.ndarray:
+    """Mean |np.gradient| over each (H, W) plane of an (N, H, W) float32 stack"""
+
+    # Same stencil as np.gradient: central differences inside, one-sided at the edges
+    gx = np.empty_like(gray)
+    np.subtract(gray[:, :, 2:], gray[:, :, :-2], out=gx[:, :, 1:-1])
+    gx[:, :, 1:-1] *= 0.5
+    gx[:, :, 0] = gray[:, :, 1] - gray[:, :, 0]
+    gx[:, :, -1] = gray[:, :, -1] - gray[:, :, -2]
+
+    gy = np.empty_like(gray)
+    np.subtract(gray[:, 2:, :], gray[:, :-2, :], out=gy[:, 1:-1, :])
+    gy[:, 1:-1, :] *= 0.5
+    gy[:, 0, :] = gray[:, 1, :] - gray[:, 0, :]
+    gy[:, -1, :] = gray[:, -1, :] - gray[:, -2, :]
+
+    np.multiply(gx, gx, out=gx)
+    np.multiply(gy, gy, out=gy)
+    np.add(gx, gy, out=gx)
+    np.sqrt(gx, out=gx)
+
+    return gx.mean(axis=(1, 2), dtype=np.float64)
+
+
+def analyze_image_batch(images: np.ndarray) -> List[Dict]:
+    """Color stats and quality score for an (N, H, W, 3) uint8 stack
+
+    Returns one ``{"color_analysis": ..., "quality_score": ...}`` dict per
+    image, matching ``analyze_colors`` and ``calculate_quality_score``.
+    Each chunk of images is converted to float32 once; every statistic is
+    taken from that single copy. Integer-valued intermediates (channel sums,
+    squares, gray-level differences) are exact in float32, and reductions
+    accumulate in float64, so results agree with the per-image path.
+    """
+
+    images = np.asarray(images)
+    if images.ndim == 3:
+        images = images[np.newaxis]
+    if images.ndim != 4 or images.shape[-1] != 3:
+        raise ValueError(f"expected an (N, H, W, 3) stack, got shape {images.shape}")
+    if images.dtype != np.uint8:
+        raise ValueError(f"expected uint8 pixels, got {images.dtype}")
+
+    n, height, width, _ = images.shape
+    if height < 2 or width < 2:
+        raise ValueError("images must be at least 2x2 pixels")
+
+    num_pixels = height * width
+    channel_sums = np.empty((n, 3))
+    channel_squares = np.empty((n, 3))
+    sharpness = np.empty(n)
+
+    chunk = max(1, BATCH_CHUNK_VALUES // (num_pixels * 3))
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        values = images[start:stop].astype(np.float32)
+
+        # Gray is kept as the channel sum (exact) and scaled by 1/3 after the reduction
+        gray = values[..., 0] + values[..., 1]
+        gray += values[..., 2]
+
+        flat = values.reshape(stop - start, num_pixels, 3)
+        channel_sums[start:stop] = _channel_sums(flat)
+        np.multiply(flat, flat, out=flat)
+        channel_squares[start:stop] = _channel_sums(flat)
+        del values, flat
+
+        sharpness[start:stop] = _gradient_magnitude_mean(gray) / 3.0
+
+    palettes = dominant_colors_batch(images)
+    quality = np.minimum(1.0, sharpness / 100)
+
+    results = []
+    for i in range(n):
+        results.append({
+            "color_analysis": _color_analysis(channel_sums[i], channel_squares[i], num_pixels, palettes[i]),
+            "quality_score": round(float(quality[i]), 3)
+        })
+
+    return results
+
+
+def benchmark_analysis(num_images=32, size=512, seed=0) -> Dict:
+    """Compare images/sec of the per-image path and the batch path"""
+
+    rng = np.random.default_rng(seed)
+    images = rng.integers(0, 256, size=(num_images, size, size, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for img_array in images:
+        analyze_colors(img_array)
+        calculate_quality_score(img_array)
+    per_image_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyze_image_batch(images)
+    batch_time = time.perf_counter() - start
+
+    return {
+        "num_images": num_images,
+        "size": f"{size}x{size}",
+        "per_image_images_per_sec": round(num_images / per_image_time, 1),
+        "batch_images_per_sec": round(num_images / batch_time, 1),
+        "speedup": round(per_image_time / batch_time, 2)
+    }
+
+
+def benchmark_palette(sizes=(512, 2048), repeats=5, seed=0) -> List[Dict]:
+    """Time analyze_colors (with the palette) against the mean/variance-only version it replaced"""
+
+    def mean_variance_only(img_array):
+        pixels = img_array.reshape(-1, 3)
+        avg_color = np.mean(pixels, axis=0)
+        color_variance = np.var(pixels, axis=0)
+        return avg_color, color_variance, float(np.mean(avg_color)), float(np.std(pixels))
+
+    rng = np.random.default_rng(seed)
+    reports = []
+    for size in sizes:
+        img_array = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+
+        timings = {}
+        for name, fn in (("previous", mean_variance_only), ("with_palette", analyze_colors)):
+            fn(img_array)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn(img_array)
+            timings[name] = (time.perf_counter() - start) / repeats
+
+        reports.append({
+            "size": f"{size}x{size}",
+            "previous_ms": round(timings["previous"] * 1000, 2),
+            "with_palette_ms": round(timings["with_palette"] * 1000, 2),
+            "speedup": round(timings["previous"] / timings["with_palette"], 2)
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII analysis benchmark")
+    parser.add_argument("--images", type=int, default=32, help="Images per run")
+    parser.add_argument("--size", type=int, default=512, help="Image width and height")
+    parser.add_argument("--palette", action="store_true", help="Benchmark analyze_colors at 512 and 2048 instead")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.palette:
+        for report in benchmark_palette():
+            logger.info(f"🎨 Palette benchmark: {report}")
+        return
+
+    report = benchmark_analysis(num_images=args.images, size=args.size)
+    logger.info(f"📈 Analysis benchmark: {report}")
+
+if __name__ == "__main__":
+    main()
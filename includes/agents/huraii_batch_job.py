@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+HURAII BATCH GENERATION JOB
+Manifest-driven generation with incremental outputs and checkpoint/resume
+Hardware: GPU (through HuraiiGPUEngine)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE = "results.jsonl"
+CHECKPOINT_FILE = "checkpoint.json"
+DIGEST_FILE = "manifest.sha256"
+REPORT_FILE = "report.json"
+IMAGE_DIR = "images"
+
+# Keys of a manifest item that are passed on to generate_art
+GENERATION_KEYS = ("prompt", "style", "quality", "seed", "premium", "output_size")
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """Read a JSON list or JSONL manifest; items get an ``id`` if they lack one"""
+
+    with open(path) as f:
+        text = f.read()
+
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        items = json.loads(text)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    seen = set()
+    for index, item in enumerate(items):
+        if not item.get("prompt"):
+            raise ValueError(f"manifest item {index} has no prompt")
+        item.setdefault("id", f"{index:06d}")
+        item["id"] = str(item["id"])
+        if item["id"] in seen:
+            raise ValueError(f"duplicate manifest id: {item['id']}")
+        seen.add(item["id"])
+    return items
+
+
+def manifest_digest(items: List[Dict]) -> str:
+    return hashlib.sha256(json.dumps(items, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _write_json_atomic(path: str, payload: Dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class BatchGenerationJob:
+    """Generate every item of a manifest into ``output_dir``, resumably
+
+    ``generate(**item)`` is ``HuraiiGPUEngine.generate_art`` (or anything
+    returning the same shape). Up to ``concurrency`` items are in flight at
+    once so the engine can batch them on the device. Each finished item is
+    written straight away: its image to ``images/<id>.png``, then one line
+    to ``results.jsonl``, flushed and fsynced. That log is the record of
+    progress. On restart, items with a completed line are skipped, a torn
+    final line from a crash is dropped, and failed items are tried again.
+    ``checkpoint.json`` carries running totals across restarts. The
+    manifest digest goes to ``manifest.sha256`` when a run starts, and a
+    run refuses to resume against a changed manifest.
+    """
+
+    def __init__(self, generate: Callable, manifest: List[Dict], output_dir: str,
+                 concurrency: int = 8, checkpoint_every: int = 16):
+        self.generate = generate
+        self.manifest = manifest
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.digest = manifest_digest(manifest)
+
+        self._stop = threading.Event()
+        self._results_path = os.path.join(output_dir, RESULTS_FILE)
+        self._checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self._digest_path = os.path.join(output_dir, DIGEST_FILE)
+        os.makedirs(os.path.join(output_dir, IMAGE_DIR), exist_ok=True)
+
+    def stop(self):
+        """Finish the items in flight, checkpoint and return (e.g. on SIGTERM)"""
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Progress records
+    # ------------------------------------------------------------------
+
+    def _claim_output_dir(self, restart: bool):
+        """Record the manifest digest, or refuse a directory holding another manifest's run
+
+        Written before the first item, so a run stopped before its first
+        checkpoint is still tied to its manifest.
+        """
+
+        if not restart and os.path.exists(self._digest_path):
+            with open(self._digest_path) as f:
+                if f.read().strip() != self.digest:
+                    raise ValueError(f"{self.output_dir} holds a run of a different manifest; "
+                                     "use a new output directory or restart")
+            return
+        with open(self._digest_path + ".tmp", "w") as f:
+            f.write(self.digest + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self._digest_path + ".tmp", self._digest_path)
+
+    def _load_checkpoint(self, restart: bool) -> Dict:
+        fresh = {"manifest_digest": self.digest, "runs": 0, "completed": 0, "failed": 0,
+                 "wall_seconds": 0.0, "device_seconds": 0.0}
+        self._claim_output_dir(restart)
+        if restart or not os.path.exists(self._checkpoint_path):
+            if restart and os.path.exists(self._results_path):
+                os.remove(self._results_path)
+            return fresh
+
+        with open(self._checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("manifest_digest") != self.digest:
+            raise ValueError(f"{self.output_dir} holds a run of a different manifest; "
+                             "use a new output directory or restart")
+        return checkpoint
+
+    def _completed_ids(self) -> Set[str]:
+        """Ids with a completed result line; truncates a torn trailing line"""
+
+        completed = set()
+        if not os.path.exists(self._results_path):
+            return completed
+
+        good_bytes = 0
+        with open(self._results_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_bytes += len(line)
+                if record.get("status") == "completed":
+                    completed.add(record["id"])
+
+        if good_bytes < os.path.getsize(self._results_path):
+            logger.warning(f"⚠️ Dropping a partial result line from {self._results_path}")
+            with open(self._results_path, "r+b") as f:
+                f.truncate(good_bytes)
+        return completed
+
+    def _save_image(self, item: Dict, image) -> str:
+        """Write the item's PNG; returns its path within the run directory"""
+
+        image_path = os.path.join(IMAGE_DIR, f"{item['id']}.png")
+        full_path = os.path.join(self.output_dir, image_path)
+        try:
+            image.save(full_path + ".tmp", format="PNG")
+            os.replace(full_path + ".tmp", full_path)
+        except OSError:
+            if os.path.exists(full_path + ".tmp"):
+                os.remove(full_path + ".tmp")
+            raise
+        return image_path
+
+    def _record(self, results_file, item: Dict, result: Dict) -> Dict:
+        error = result.get("error")
+        if error is None:
+            # A full disk or unwritable file fails this item, not the whole batch
+            try:
+                image_path = self._save_image(item, result["image"])
+            except OSError as e:
+                error = f"could not save image: {e}"
+
+        if error is not None:
+            record = {"id": item["id"], "status": "failed", "error": error}
+        else:
+            metadata = result["metadata"]
+            record = {
+                "id": item["id"],
+                "status": "completed",
+                "image": image_path,
+                "prompt": item["prompt"],
+                "style": metadata.get("style"),
+                "seed": metadata.get("seed"),
+                "output_id": result.get("output_id"),
+                "generation_time": round(result["generation_time"], 3),
+                "device_time": metadata.get("device_time", 0.0),
+                "cache_hit": metadata.get("cache_hit", False),
+                "quality_score": result["analysis"].get("quality_score"),
+                "metadata": metadata
+            }
+
+        results_file.write(json.dumps(record, default=str) + "\n")
+        results_file.flush()
+        os.fsync(results_file.fileno())
+        return record
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+
+    def run(self, restart: bool = False, limit: Optional[int] = None) -> Dict:
+        """Generate the outstanding items (at most ``limit``); returns the throughput report"""
+
+        checkpoint = self._load_checkpoint(restart)
+        done = self._completed_ids()
+        pending = [item for item in self.manifest if item["id"] not in done]
+        if limit is not None:
+            pending = pending[:limit]
+
+        checkpoint["runs"] += 1
+        logger.info(f"🌙 Batch job: {len(done)} of {len(self.manifest)} already done, "
+                    f"{len(pending)} to generate this run")
+
+        run_stats = {"completed": 0, "failed": 0, "device_seconds": 0.0, "cache_hits": 0}
+        start = time.monotonic()
+
+        def save_checkpoint():
+            elapsed = time.monotonic() - start
+            snapshot = dict(checkpoint)
+            for key in ("completed", "failed", "device_seconds"):
+                snapshot[key] = checkpoint[key] + run_stats[key]
+            snapshot["wall_seconds"] = checkpoint["wall_seconds"] + elapsed
+            snapshot["updated_at"] = time.time()
+            _write_json_atomic(self._checkpoint_path, snapshot)
+            return snapshot
+
+        queue = iter(pending)
+        in_flight = {}
+        with open(self._results_path, "a") as results_file, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="huraii-batch") as pool:
+
+            def refill():
+                while len(in_flight) < self.concurrency and not self._stop.is_set():
+                    item = next(queue, None)
+                    if item is None:
+                        return
+                    params = {key: item[key] for key in GENERATION_KEYS if key in item}
+                    in_flight[pool.submit(self.generate, **params)] = item
+
+            refill()
+            since_checkpoint = 0
+            while in_flight:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"error": str(e)}
+
+                    record = self._record(results_file, item, result)
+                    if record["status"] == "completed":
+                        run_stats["completed"] += 1
+                        run_stats["device_seconds"] += record["device_time"]
+                        run_stats["cache_hits"] += int(record["cache_hit"])
+                    else:
+                        run_stats["failed"] += 1
+                        logger.warning(f"⚠️ Item {item['id']} failed: {record['error']}")
+
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        save_checkpoint()
+                        since_checkpoint = 0
+                refill()
+
+        totals = save_checkpoint()
+        report = self._report(run_stats, time.monotonic() - start, totals,
+                              remaining=len(self.manifest) - len(self._completed_ids()))
+        _write_json_atomic(os.path.join(self.output_dir, REPORT_FILE), report)
+        return report
+
+    def _report(self, run_stats: Dict, elapsed: float, totals: Dict, remaining: int) -> Dict:
+        """Throughput of this run and of the job across all its runs"""
+
+        def throughput(images, wall, device):
+            return {
+                "images_per_hour": round(images / wall * 3600, 1) if wall > 0 else 0.0,
+                "gpu_seconds_per_image": round(device / images, 3) if images else 0.0
+            }
+
+        return {
+            "manifest_items": len(self.manifest),
+            "remaining": remaining,
+            "stopped_early": self._stop.is_set(),
+            "this_run": {
+                "completed": run_stats["completed"],
+                "failed": run_stats["failed"],
+                "cache_hits": run_stats["cache_hits"],
+                "wall_seconds": round(elapsed, 2),
+                **throughput(run_stats["completed"], elapsed, run_stats["device_seconds"])
+            },
+            "all_runs": {
+                "runs": totals["runs"],
+                "completed": totals["completed"],
+                "failed": totals["failed"],
+                "wall_seconds": round(totals["wall_seconds"], 2),
+                **throughput(totals["completed"], totals["wall_seconds"], totals["device_seconds"])
+            }
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII Nightly Batch Generation")
+    parser.add_argument("manifest", help="JSON or JSONL manifest of {id, prompt, style, seed, ...} items")
+    parser.add_argument("--output-dir", type=str, required=True, help="Run directory (images, results, checkpoint)")
+    parser.add_argument("--model", type=str, default="runwayml/stable-diffusion-v1-5", help="Diffusers model id ('stub' for a CPU stand-in)")
+    parser.add_argument("--gpu", type=str, default="cuda:0", help="GPU device to use")
+    parser.add_argument("--max-batch-size", type=int, default=4, help="Max prompts per pipeline call")
+    parser.add_argument("--concurrency", type=int, default=None, help="Items in flight (default: 2x batch size)")
+    parser.add_argument("--checkpoint-every", type=int, default=16, help="Items between checkpoint writes")
+    parser.add_argument("--limit", type=int, default=None, help="Generate at most this many items this run")
+    parser.add_argument("--restart", action="store_true", help="Discard earlier progress in the output directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from huraii_gpu_engine import HuraiiGPUEngine
+
+    engine = HuraiiGPUEngine(
+        gpu_device=args.gpu,
+        max_batch_size=args.max_batch_size,
+        history_dir=os.path.join(args.output_dir, "history"),
+        model_id=args.model,
+        load_mode="eager"
+    )
+    job = BatchGenerationJob(
+        engine.generate_art,
+        load_manifest(args.manifest),
+        args.output_dir,
+        concurrency=args.concurrency or args.max_batch_size * 2,
+        checkpoint_every=args.checkpoint_every
+    )
+
+    # Preemption sends SIGTERM: drain what is running, checkpoint, exit cleanly
+    def on_signal(signum, frame):
+        logger.info("🛑 Stop requested; finishing items in flight")
+        job.stop()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    report = job.run(restart=args.restart, limit=args.limit)
+    logger.info(f"📊 Batch throughput: {json.dumps(report, indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+HURAII BATCH SCHEDULER
+Dynamic request batching in front of the diffusion pipeline
+Hardware: GPU-Optimized (runs on CPU with a stub pipeline)
+"""
+
+import argparse
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# What a caller gets back from a batched run; ``post`` is the postprocess output for this item
+BatchItemResult = namedtuple(
+    "BatchItemResult",
+    ["output", "batch_size", "queue_wait", "run_time", "post", "post_time"],
+    defaults=(None, 0.0)
+)
+
+
+class GenerationInterrupted(Exception):
+    """Every request in a batch gave up, so the pipeline run was stopped early"""
+
+
+class _PendingRequest:
+    """A single prompt waiting to be batched"""
+
+    __slots__ = ("prompt", "seed", "params", "progress", "context", "cancelled", "future", "enqueued_at")
+
+    def __init__(self, prompt, seed, params, progress=None, context=None):
+        self.prompt = prompt
+        self.seed = seed
+        self.params = params
+        self.progress = progress
+        self.context = context
+        self.cancelled = False
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """Collect concurrent generation requests and run them as batched pipeline calls
+
+    Requests are grouped by their pipeline parameters (steps, guidance, size);
+    only requests that share every parameter can ride in the same batch.
+    A group is dispatched as soon as it reaches ``max_batch_size`` or its
+    oldest request has waited ``max_wait_ms``.
+
+    ``run_batch(prompts, seeds, params, step_callback)`` must return one
+    output per prompt, in order. When it is not None, ``step_callback(step,
+    total, latents)`` should be called after each denoising step; it returns
+    True once nobody is waiting for the batch any more and the run can stop.
+    A request's ``progress(step, total, latents)`` callback gets its own slice
+    of the latents; if it raises, that request stops receiving progress.
+
+    ``postprocess(outputs, contexts)``, when given, runs the CPU-side work for
+    a finished batch (analysis, encoding) and returns one value per output.
+    With ``postprocess_workers`` > 0 it runs on a worker pool so the device
+    thread can start the next batch straight away; at most
+    ``2 * postprocess_workers`` batches wait for post-processing before the
+    device thread is held back. With 0 workers it runs inline.
+    """
+
+    def __init__(self, run_batch: Callable, max_batch_size: int = 4,
+                 max_wait_ms: float = 50.0, stats_window: int = 1024,
+                 postprocess: Optional[Callable] = None, postprocess_workers: int = 2):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.postprocess = postprocess
+        self._post_pool = None
+        if postprocess is not None and postprocess_workers > 0:
+            self._post_pool = ThreadPoolExecutor(max_workers=postprocess_workers, thread_name_prefix="huraii-post")
+            self._post_slots = threading.BoundedSemaphore(2 * postprocess_workers)
+
+        self._groups = OrderedDict()  # params key -> [_PendingRequest]
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Stats
+        self._batch_sizes = Counter()
+        self._queue_waits = deque(maxlen=stats_window)
+        self._run_times = deque(maxlen=stats_window)
+        self._requests_served = 0
+        self._batches_run = 0
+        self._failed_batches = 0
+        self._interrupted_batches = 0
+        self._post_times = deque(maxlen=stats_window)
+        self._post_waits = deque(maxlen=stats_window)
+        self._device_busy = 0.0
+        self._first_run_at = None
+        self._last_done_at = None
+
+        self._worker = threading.Thread(target=self._worker_loop, name="huraii-batcher", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def batch_key(params: Dict):
+        """Requests with equal keys can share a pipeline call"""
+        return tuple(sorted(params.items()))
+
+    def submit(self, prompt: str, seed: Optional[int] = None,
+               progress: Optional[Callable] = None, context=None, **params) -> Future:
+        """Queue a prompt; the returned future resolves to a BatchItemResult
+
+        ``context`` is passed through to ``postprocess`` untouched.
+        """
+
+        request = _PendingRequest(prompt, seed, params, progress, context)
+        key = self.batch_key(params)
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is shut down")
+            self._groups.setdefault(key, []).append(request)
+            self._cond.notify()
+
+        return request.future
+
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a batch slot"""
+        with self._cond:
+            return sum(len(group) for group in self._groups.values())
+
+    def _next_batch(self):
+        """Block until a batch is ready to run; returns (params, requests) or None on shutdown"""
+
+        with self._cond:
+            while True:
+                if not self._groups:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                oldest_key, oldest_deadline = None, None
+
+                for key, group in self._groups.items():
+                    # Full groups go first, then whichever group has waited longest
+                    if len(group) >= self.max_batch_size or self._closed:
+                        return self._take(key)
+                    deadline = group[0].enqueued_at + self.max_wait
+                    if oldest_deadline is None or deadline < oldest_deadline:
+                        oldest_key, oldest_deadline = key, deadline
+
+                if oldest_deadline <= now:
+                    return self._take(oldest_key)
+
+                self._cond.wait(timeout=oldest_deadline - now)
+
+    def _take(self, key):
+        """Pop up to max_batch_size requests from a group (caller holds the lock)"""
+
+        group = self._groups[key]
+        batch, rest = group[:self.max_batch_size], group[self.max_batch_size:]
+        if rest:
+            self._groups[key] = rest
+        else:
+            del self._groups[key]
+        return dict(key), batch
+
+    def _worker_loop(self):
+        """Dispatch batches to the pipeline until shut down"""
+
+        while True:
+            item = self._next_batch()
+            if item is None:
+                return
+            params, batch = item
+            self._run(params, batch)
+
+    def _run(self, params: Dict, batch: List[_PendingRequest]):
+        """Run one batched pipeline call and hand each result back to its caller"""
+
+        # Drop requests whose callers already gave up
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        run_start = time.monotonic()
+        if self._first_run_at is None:
+            self._first_run_at = run_start
+        waits = [run_start - request.enqueued_at for request in batch]
+        step_callback = self._step_callback(batch) if any(r.progress for r in batch) else None
+
+        try:
+            outputs = self.run_batch([r.prompt for r in batch], [r.seed for r in batch], params, step_callback)
+            if all(r.cancelled for r in batch):
+                raise GenerationInterrupted("all requests in the batch were cancelled")
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"run_batch returned {len(outputs)} outputs for {len(batch)} prompts")
+        except GenerationInterrupted as e:
+            logger.info(f"⏹️ Batch of {len(batch)} stopped early: {e}")
+            with self._cond:
+                self._interrupted_batches += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        except Exception as e:
+            logger.error(f"❌ Batched generation failed ({len(batch)} requests): {e}")
+            with self._cond:
+                self._failed_batches += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        run_time = time.monotonic() - run_start
+
+        with self._cond:
+            self._batches_run += 1
+            self._batch_sizes[len(batch)] += 1
+            self._queue_waits.extend(waits)
+            self._run_times.append(run_time)
+            self._device_busy += run_time
+
+        if self._post_pool is None:
+            self._finish(batch, outputs, waits, run_time, time.monotonic())
+        else:
+            # Hand CPU work to the pool and go back for the next batch
+            self._post_slots.acquire()
+            future = self._post_pool.submit(self._finish, batch, outputs, waits, run_time, time.monotonic())
+            future.add_done_callback(lambda _: self._post_slots.release())
+
+    def _finish(self, batch, outputs, waits, run_time, handed_off_at):
+        """Post-process a finished batch and resolve each caller's future"""
+
+        post_start = time.monotonic()
+        posts = [None] * len(batch)
+        if self.postprocess is not None:
+            try:
+                posts = self.postprocess(outputs, [r.context for r in batch])
+            except Exception as e:
+                logger.error(f"❌ Post-processing failed ({len(batch)} requests): {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+        done = time.monotonic()
+        post_time = done - post_start
+
+        with self._cond:
+            self._requests_served += len(batch)
+            self._post_times.append(post_time)
+            self._post_waits.append(post_start - handed_off_at)
+            self._last_done_at = done
+
+        for request, output, post, queue_wait in zip(batch, outputs, posts, waits):
+            request.future.set_result(BatchItemResult(output, len(batch), queue_wait, run_time, post, post_time))
+
+    @staticmethod
+    def _step_callback(batch: List[_PendingRequest]):
+        """Fan per-step progress out to each request in a batch"""
+
+        def step_callback(step, total, latents=None):
+            wanted = 0
+            for index, request in enumerate(batch):
+                if request.progress is None:
+                    wanted += 1
+                    continue
+                if request.cancelled:
+                    continue
+                try:
+                    request.progress(step, total, latents[index] if latents is not None else None)
+                    wanted += 1
+                except Exception:
+                    request.cancelled = True
+            return wanted == 0
+
+        return step_callback
+
+    def get_stats(self) -> Dict:
+        """Batch size and queue wait statistics"""
+
+        with self._cond:
+            waits = sorted(self._queue_waits)
+            run_times = list(self._run_times)
+            batches = self._batches_run
+            served = self._requests_served
+            histogram = dict(sorted(self._batch_sizes.items()))
+            failed = self._failed_batches
+            interrupted = self._interrupted_batches
+            post_times = list(self._post_times)
+            post_waits = list(self._post_waits)
+            elapsed = (self._last_done_at - self._first_run_at) if self._last_done_at else 0.0
+            device_busy = self._device_busy
+            depth = sum(len(group) for group in self._groups.values())
+
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "queue_depth": depth,
+            "batches_run": batches,
+            "failed_batches": failed,
+            "interrupted_batches": interrupted,
+            "requests_served": served,
+            "avg_batch_size": round(served / batches, 2) if batches else 0.0,
+            "batch_size_histogram": histogram,
+            "queue_wait_avg_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "queue_wait_p95_ms": round(percentile(waits, 95) * 1000, 2),
+            "queue_wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+            "avg_batch_run_time": round(sum(run_times) / len(run_times), 3) if run_times else 0.0,
+            "postprocess_pipelined": self._post_pool is not None,
+            "avg_postprocess_ms": round(sum(post_times) / len(post_times) * 1000, 2) if post_times else 0.0,
+            "avg_postprocess_wait_ms": round(sum(post_waits) / len(post_waits) * 1000, 2) if post_waits else 0.0,
+            "throughput_per_sec": round(served / elapsed, 2) if elapsed > 0 else 0.0,
+            "device_utilization": round(min(1.0, device_busy / elapsed), 3) if elapsed > 0 else 0.0
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting requests; queued requests are still run"""
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._worker.join()
+        if self._post_pool is not None:
+            self._post_pool.shutdown(wait=wait)
+
+
+def benchmark_pipelining(requests=32, batch_size=4, steps=20, step_time=0.002, size=256) -> Dict:
+    """Throughput with post-processing inline on the device thread vs pipelined, on a stub pipeline"""
+
+    import numpy as np
+    from huraii_analysis import analyze_image_batch
+    from huraii_stub_pipeline import StubDiffusionPipeline
+
+    pipe = StubDiffusionPipeline(step_time=step_time)
+
+    def run_batch(prompts, seeds, params, step_callback=None):
+        return pipe(prompts, generator=seeds, **params).images
+
+    def postprocess(images, contexts):
+        return analyze_image_batch(np.stack([np.asarray(image) for image in images]))
+
+    report = {}
+    for label, workers in (("inline", 0), ("pipelined", 2)):
+        scheduler = BatchScheduler(run_batch, max_batch_size=batch_size, max_wait_ms=5,
+                                   postprocess=postprocess, postprocess_workers=workers)
+        params = {"num_inference_steps": steps, "width": size, "height": size}
+        start = time.perf_counter()
+        futures = [scheduler.submit(f"prompt {i}", seed=i, **params) for i in range(requests)]
+        wait(futures)
+        elapsed = time.perf_counter() - start
+        scheduler.shutdown()
+
+        stats = scheduler.get_stats()
+        report[label] = {
+            "images_per_sec": round(requests / elapsed, 2),
+            "avg_batch_run_time": stats["avg_batch_run_time"],
+            "avg_postprocess_ms": stats["avg_postprocess_ms"],
+            "device_utilization": stats["device_utilization"]
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII batching benchmark (stub pipeline)")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per run")
+    parser.add_argument("--batch-size", type=int, default=4, help="Max batch size")
+    parser.add_argument("--steps", type=int, default=20, help="Inference steps per request")
+    parser.add_argument("--size", type=int, default=256, help="Image width and height")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = benchmark_pipelining(requests=args.requests, batch_size=args.batch_size,
+                                  steps=args.steps, size=args.size)
+    logger.info(f"📈 Pipelining benchmark: {report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+HURAII GENERATION CACHE
+Content-addressed cache of deterministic (seeded) generation results
+Hardware: CPU
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def generation_key(enhanced_prompt: str, seed: int, num_inference_steps: int,
+                   guidance_scale: float, width: int, height: int, model_id: str = "") -> str:
+    """Hash of every input that determines a seeded generation's pixels"""
+
+    payload = json.dumps({
+        "prompt": enhanced_prompt,
+        "seed": int(seed),
+        "steps": int(num_inference_steps),
+        "guidance": float(guidance_scale),
+        "width": int(width),
+        "height": int(height),
+        "model": model_id
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier LRU cache: images in memory in front of a size-capped PNG store
+
+    ``memory_items`` bounds the in-memory tier. When ``disk_dir`` is set,
+    entries are also written to ``<disk_dir>/<key[:2]>/<key>.png`` with a
+    ``.json`` metadata sidecar, and the least recently used files are removed
+    once the store exceeds ``disk_max_bytes``. Returned images are shared with
+    the cache and must not be modified in place.
+    """
+
+    def __init__(self, memory_items: int = 64, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 2 * 1024**3):
+        self.memory_items = memory_items
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory = OrderedDict()  # key -> (image, metadata)
+        self._disk = OrderedDict()  # key -> bytes on disk, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0
+        }
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.disk_dir, key[:2], key)
+        return base + ".png", base + ".json"
+
+    def _load_disk_index(self):
+        """Rebuild the LRU order of the disk tier from file modification times"""
+
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                key = name[:-4]
+                image_path, meta_path = self._paths(key)
+                if not os.path.exists(meta_path):
+                    continue
+                size = os.path.getsize(image_path) + os.path.getsize(meta_path)
+                entries.append((os.path.getmtime(image_path), key, size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+        if entries:
+            logger.info(f"💾 Generation cache: {len(entries)} entries on disk ({self._disk_bytes / 1024**2:.1f} MB)")
+
+    def get(self, key: str):
+        """Return (image, metadata) for a cached generation, or None"""
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if on_disk:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, entry)
+                return entry
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, image, metadata: Dict):
+        """Cache a generation result"""
+
+        entry = (image, metadata)
+        with self._lock:
+            self._remember(key, entry)
+
+        if self.disk_dir:
+            self._write_disk(key, image, metadata)
+
+    def _remember(self, key, entry):
+        """Insert into the memory tier (caller holds the lock)"""
+
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _read_disk(self, key: str):
+        image_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                metadata = json.load(f)
+            with Image.open(image_path) as stored:
+                image = stored.copy()
+            os.utime(image_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Dropping unreadable cache entry {key[:12]}: {e}")
+            self._forget_disk(key)
+            return None
+        return image, metadata
+
+    def _write_disk(self, key: str, image, metadata: Dict):
+        image_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+
+        try:
+            # Write-then-rename so a crash never leaves a half-written entry
+            image.save(image_path + ".tmp", format="PNG", compress_level=1)
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(metadata, f, default=str)
+            os.replace(meta_path + ".tmp", meta_path)
+            os.replace(image_path + ".tmp", image_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write cache entry {key[:12]}: {e}")
+            return
+
+        size = os.path.getsize(image_path) + os.path.getsize(meta_path)
+        expired = []
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                self.stats["disk_evictions"] += 1
+                expired.append(old_key)
+
+        for old_key in expired:
+            self._remove_files(old_key)
+
+    def _forget_disk(self, key: str):
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict:
+        """Hit/miss/eviction counters and tier sizes"""
+
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = len(self._disk)
+            stats["disk_mb"] = round(self._disk_bytes / 1024**2, 2)
+
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+class FlightAbandoned(Exception):
+    """Raised from a shared progress callback once no caller wants the run any more"""
+
+
+class _Flight:
+    """One in-flight run: its future and the progress callback of each caller"""
+
+    __slots__ = ("future", "callbacks", "dropped")
+
+    def __init__(self):
+        self.future = Future()  # of (result, cost)
+        self.callbacks = []  # one per caller; None for callers without progress
+        self.dropped = set()  # indexes of callers whose callback raised
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution
+
+    The first caller for a key runs ``fn``; callers that arrive while it is
+    still running wait for the same result (or exception) instead of
+    starting their own run. ``cost(result)`` gives the device seconds a run
+    used, which every waiting caller counts as saved.
+
+    With ``fan_out=True``, ``fn`` is called with one progress callback that
+    forwards each step to every caller's ``progress``. A caller whose
+    callback raises (cancelled, timed out) stops receiving steps. The run
+    is abandoned only once every caller has dropped out, so cancelling the
+    first caller does not fail the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "executions": 0,
+            "coalesced": 0,
+            "gpu_seconds_saved": 0.0
+        }
+
+    def _fan_out(self, flight: _Flight) -> Callable:
+        def progress(step, total, latents=None):
+            with self._lock:
+                callbacks = list(enumerate(flight.callbacks))
+            wanted = False
+            for index, callback in callbacks:
+                if index in flight.dropped:
+                    continue
+                if callback is None:
+                    wanted = True
+                    continue
+                try:
+                    callback(step, total, latents)
+                    wanted = True
+                except Exception:
+                    flight.dropped.add(index)
+            if not wanted:
+                raise FlightAbandoned("every caller of the shared run gave up")
+
+        return progress
+
+    def do(self, key: str, fn: Callable, cost: Optional[Callable] = None,
+           progress: Optional[Callable] = None, fan_out: bool = False):
+        """Run ``fn`` once per in-flight key; returns (result, coalesced)"""
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["executions"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            flight.callbacks.append(progress)
+        future = flight.future
+
+        if not leader:
+            result, seconds = future.result()
+            with self._lock:
+                self.stats["gpu_seconds_saved"] += seconds
+            return result, True
+
+        # Followers block on the future, so it must be resolved however this ends
+        start = time.monotonic()
+        try:
+            result = fn(self._fan_out(flight)) if fan_out else fn()
+            seconds = cost(result) if cost is not None else time.monotonic() - start
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result((result, seconds))
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._inflight)
+        stats["gpu_seconds_saved"] = round(stats["gpu_seconds_saved"], 3)
+        return stats
@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+"""
+HURAII DEVICE POOL
+One worker process per device, least-loaded routing, health checks and failover
+Hardware: Multi-GPU (runs on CPU with stub workers)
+"""
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, wait
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from huraii_batching import BatchScheduler
+from huraii_telemetry import device_memory
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+STARTING = "starting"
+RESTARTING = "restarting"
+FAILED = "failed"
+
+
+class WorkerLost(RuntimeError):
+    """The worker process died or stopped answering while a call was in flight"""
+
+
+def _to_host(latents):
+    """Latents as a half-precision numpy array, small enough to send every step"""
+
+    if latents is None:
+        return None
+    if hasattr(latents, "detach"):
+        latents = latents.detach().float().cpu().numpy()
+    return np.asarray(latents, dtype=np.float16)
+
+
+def _worker_main(conn, factory: Callable, device: str, heartbeat_interval: float):
+    """Body of a worker process: build the runner for ``device`` and serve calls on ``conn``
+
+    Calls run one at a time on this process's device. A reader thread picks
+    up interrupts while a call runs; a heartbeat thread tells the pool the
+    process is still responsive and carries its device memory stats.
+    """
+
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            conn.send(message)
+
+    load_start = time.perf_counter()
+    try:
+        runner = factory(device)
+    except Exception as e:
+        send("failed", f"{type(e).__name__}: {e}")
+        return
+    runner_device = getattr(runner, "device", None) or device
+    send("ready", {
+        "pid": os.getpid(),
+        "device": runner_device,
+        "load_seconds": round(time.perf_counter() - load_start, 3)
+    })
+
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(heartbeat_interval):
+            try:
+                send("heartbeat", device_memory(runner_device))
+            except (OSError, ValueError):
+                return
+
+    calls = queue.Queue()
+    interrupts = set()
+
+    def reader():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = ("stop",)
+            if message[0] == "interrupt":
+                interrupts.add(message[1])
+                continue
+            calls.put(message)
+            if message[0] == "stop":
+                return
+
+    threading.Thread(target=heartbeat, name="huraii-worker-heartbeat", daemon=True).start()
+    threading.Thread(target=reader, name="huraii-worker-reader", daemon=True).start()
+
+    while True:
+        message = calls.get()
+        if message[0] == "stop":
+            break
+        _, call_id, method, args, kwargs, wants_progress = message
+
+        if wants_progress:
+            def step_callback(step, total, latents=None, call_id=call_id):
+                send("step", call_id, step, total, _to_host(latents))
+                return call_id in interrupts
+            kwargs = dict(kwargs, step_callback=step_callback)
+
+        try:
+            send("result", call_id, getattr(runner, method)(*args, **kwargs))
+        except Exception as e:
+            try:
+                send("error", call_id, e)
+            except Exception:
+                # The exception itself would not pickle; send its text instead
+                send("error", call_id, RuntimeError(f"{type(e).__name__}: {e}"))
+        interrupts.discard(call_id)
+
+    stopped.set()
+
+
+class _PendingCall:
+    __slots__ = ("future", "step_callback")
+
+    def __init__(self, step_callback=None):
+        self.future = Future()
+        self.step_callback = step_callback
+
+
+class PoolWorker:
+    """Parent-side handle for one device's worker process
+
+    Owns the process, its pipe and a BatchScheduler that batches requests
+    routed to this device. A lost process (exit, crash, or missed
+    heartbeats) fails its in-flight calls with WorkerLost and is restarted
+    after a backoff, unless it was already restarted ``max_restarts`` times
+    within ``restart_window`` seconds; then it stays failed.
+    """
+
+    def __init__(self, pool: "DevicePool", index: int, device: str):
+        self.pool = pool
+        self.index = index
+        self.device = device
+
+        self.state = STARTING
+        self.error = None
+        self.info = {}
+        self.process = None
+        self.started_at = None
+        self.last_heartbeat = None
+        self.memory = None  # device allocator stats from the latest heartbeat
+        self.outstanding = 0  # requests routed here and not yet finished
+        self.last_routed = 0.0
+        self.restarts = 0
+        self.lost = 0
+
+        self._conn = None
+        self._incarnation = 0
+        self._calls = {}
+        self._ids = itertools.count()
+        self._restart_times = deque()
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+
+        self.scheduler = BatchScheduler(
+            self.run_pipeline_batch,
+            max_batch_size=pool.max_batch_size,
+            max_wait_ms=pool.max_wait_ms,
+            postprocess=pool.postprocess,
+            postprocess_workers=pool.postprocess_workers
+        )
+
+    # ------------------------------------------------------------------
+    # Process lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.pool.factory, self.device, self.pool.heartbeat_interval),
+            name=f"huraii-worker-{self.index}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        with self._cond:
+            self._incarnation += 1
+            incarnation = self._incarnation
+            self._conn = parent_conn
+            self.process = process
+            self.started_at = time.monotonic()
+            self.last_heartbeat = None
+        threading.Thread(
+            target=self._receive, args=(parent_conn, incarnation),
+            name=f"huraii-worker-{self.index}-recv", daemon=True
+        ).start()
+        logger.info(f"🧵 Worker {self.index} starting on {self.device} (pid {process.pid})")
+
+    def kill(self, reason: str):
+        """Terminate the process; its receiver notices and handles the loss"""
+
+        process = self.process
+        if process is not None and process.is_alive():
+            logger.warning(f"⚠️ Killing worker {self.index} on {self.device}: {reason}")
+            with self._cond:
+                self.error = reason
+            process.kill()
+
+    def _set_state(self, state: str):
+        self.state = state
+        self._cond.notify_all()
+        self.pool._state_changed()
+
+    def _receive(self, conn, incarnation: int):
+        """Read messages from one incarnation of the process until its pipe closes"""
+
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+
+            if kind == "heartbeat":
+                self.last_heartbeat = time.monotonic()
+                self.memory = message[1]
+            elif kind == "ready":
+                with self._cond:
+                    self.info = message[1]
+                    self.error = None
+                    self.last_heartbeat = time.monotonic()
+                    self._set_state(READY)
+                logger.info(f"✅ Worker {self.index} ready on {self.info['device']} "
+                            f"({self.info['load_seconds']}s to load)")
+            elif kind == "failed":
+                with self._cond:
+                    self.error = message[1]
+            elif kind == "step":
+                self._on_step(conn, *message[1:])
+            elif kind in ("result", "error"):
+                with self._cond:
+                    pending = self._calls.pop(message[1], None)
+                if pending is None:
+                    continue
+                if kind == "result":
+                    pending.future.set_result(message[2])
+                else:
+                    pending.future.set_exception(message[2])
+
+        self._on_lost(incarnation)
+
+    def _on_step(self, conn, call_id, step, total, latents):
+        pending = self._calls.get(call_id)
+        if pending is None or pending.step_callback is None:
+            return
+        try:
+            interrupt = pending.step_callback(step, total, latents)
+        except Exception:
+            interrupt = False
+        if interrupt:
+            try:
+                with self._send_lock:
+                    conn.send(("interrupt", call_id))
+            except (OSError, ValueError):
+                pass
+
+    def _on_lost(self, incarnation: int):
+        """Fail the calls of a dead incarnation and schedule a restart"""
+
+        with self._cond:
+            if incarnation != self._incarnation:
+                return
+            calls, self._calls = self._calls, {}
+            process = self.process
+            reason = self.error or "worker process exited"
+            closed = self.pool.closed
+            if not closed:
+                self.lost += 1
+                now = time.monotonic()
+                while self._restart_times and now - self._restart_times[0] > self.pool.restart_window:
+                    self._restart_times.popleft()
+                give_up = len(self._restart_times) >= self.pool.max_restarts
+                self._set_state(FAILED if give_up else RESTARTING)
+
+        for pending in calls.values():
+            pending.future.set_exception(WorkerLost(f"worker {self.index} on {self.device}: {reason}"))
+        if process is not None:
+            process.join(timeout=5)
+        if closed:
+            return
+
+        if self.state == FAILED:
+            logger.error(f"❌ Worker {self.index} on {self.device} failed for good: {reason}")
+            return
+
+        delay = self.pool.restart_backoff * (2 ** len(self._restart_times))
+        logger.warning(f"⚠️ Worker {self.index} on {self.device} lost ({reason}); restarting in {delay:.1f}s")
+        self._restart_times.append(time.monotonic())
+        timer = threading.Timer(delay, self._restart)
+        timer.daemon = True
+        timer.start()
+
+    def _restart(self):
+        if self.pool.closed:
+            return
+        with self._cond:
+            self.restarts += 1
+        self.start()
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def call(self, method: str, *args, step_callback: Optional[Callable] = None, **kwargs):
+        """Run ``runner.method(*args, **kwargs)`` in the worker process and return its result
+
+        Waits while the process starts, unless another worker could take the
+        call now; then it raises WorkerLost so the pool routes it elsewhere.
+        """
+
+        with self._cond:
+            while self.state != READY:
+                if self.state == FAILED:
+                    raise WorkerLost(f"worker {self.index} on {self.device} has failed: {self.error}")
+                if self.pool.closed:
+                    raise WorkerLost("device pool is shut down")
+                if self.pool.ready_workers(exclude=self):
+                    raise WorkerLost(f"worker {self.index} on {self.device} is {self.state}")
+                self._cond.wait(timeout=0.1)
+            call_id = next(self._ids)
+            pending = _PendingCall(step_callback)
+            self._calls[call_id] = pending
+            conn = self._conn
+
+        try:
+            with self._send_lock:
+                conn.send(("call", call_id, method, args, kwargs, step_callback is not None))
+        except (OSError, ValueError) as e:
+            with self._cond:
+                self._calls.pop(call_id, None)
+            raise WorkerLost(f"worker {self.index} on {self.device}: {e}") from e
+        return pending.future.result()
+
+    def run_pipeline_batch(self, prompts, seeds, params, step_callback=None):
+        return self.call("run_pipeline_batch", prompts, seeds, params, step_callback=step_callback)
+
+    def stop(self, timeout: float = 5.0):
+        self.scheduler.shutdown(wait=True)
+        try:
+            with self._send_lock:
+                self._conn.send(("stop",))
+        except (OSError, ValueError, AttributeError):
+            pass
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+
+    def get_stats(self) -> Dict:
+        now = time.monotonic()
+        with self._cond:
+            heartbeat_age = round(now - self.last_heartbeat, 2) if self.last_heartbeat else None
+            stats = {
+                "index": self.index,
+                "device": self.info.get("device", self.device),
+                "pid": self.process.pid if self.process is not None else None,
+                "state": self.state,
+                "error": self.error,
+                "outstanding": self.outstanding,
+                "restarts": self.restarts,
+                "lost": self.lost,
+                "heartbeat_age": heartbeat_age,
+                "device_memory": self.memory,
+                "load_seconds": self.info.get("load_seconds")
+            }
+        stats["batching"] = self.scheduler.get_stats()
+        return stats
+
+
+class DevicePool:
+    """Route generation requests across one worker process per device
+
+    Stands in for a single BatchScheduler in front of the engine: ``submit``
+    has the same signature and returns a future resolving to a
+    BatchItemResult. ``factory(device)`` is called inside each worker
+    process and returns the runner (``HuraiiGPUEngine`` pinned to that
+    device, or a ``StubWorker``); it must be picklable. Requests are batched
+    per device, and each request goes to the ready worker with the fewest
+    outstanding requests. Requests on a worker that is lost are sent to
+    another worker, up to ``max_attempts`` tries in all. Post-processing
+    stays in this process.
+
+    A monitor thread kills workers that stop sending heartbeats for
+    ``heartbeat_timeout`` seconds, or that take longer than
+    ``start_timeout`` to load.
+    """
+
+    def __init__(self, factory: Callable, devices: List[str], max_batch_size: int = 4,
+                 max_wait_ms: float = 50.0, postprocess: Optional[Callable] = None,
+                 postprocess_workers: int = 2, heartbeat_interval: float = 1.0,
+                 heartbeat_timeout: float = 10.0, start_timeout: float = 600.0,
+                 max_attempts: int = 3, max_restarts: int = 3, restart_window: float = 300.0,
+                 restart_backoff: float = 1.0):
+        if not devices:
+            raise ValueError("DevicePool needs at least one device")
+
+        self.factory = factory
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.postprocess = postprocess
+        self.postprocess_workers = postprocess_workers
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.start_timeout = start_timeout
+        self.max_attempts = max_attempts
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.restart_backoff = restart_backoff
+
+        self.closed = False
+        self._lock = threading.Lock()
+        self._health = threading.Condition()
+        self._failovers = 0
+        self._unroutable = 0
+
+        self.workers = [PoolWorker(self, index, device) for index, device in enumerate(devices)]
+        for worker in self.workers:
+            worker.start()
+
+        self._monitor = threading.Thread(target=self._monitor_loop, name="huraii-pool-monitor", daemon=True)
+        self._monitor.start()
+
+    # ------------------------------------------------------------------
+    # Health
+    # ------------------------------------------------------------------
+
+    def _state_changed(self):
+        with self._health:
+            self._health.notify_all()
+
+    def ready_workers(self, exclude: Optional[PoolWorker] = None) -> List[PoolWorker]:
+        return [w for w in self.workers if w.state == READY and w is not exclude]
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        """Block until at least one worker is ready; raises if every worker has failed"""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._health:
+            while not self.ready_workers():
+                if all(w.state == FAILED for w in self.workers):
+                    errors = "; ".join(f"{w.device}: {w.error}" for w in self.workers)
+                    raise RuntimeError(f"every HURAII worker failed ({errors})")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise RuntimeError("no HURAII worker is ready yet")
+                self._health.wait(timeout=0.5 if remaining is None else min(0.5, remaining))
+
+    def _monitor_loop(self):
+        while not self.closed:
+            time.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.state == READY and worker.last_heartbeat is not None \
+                        and now - worker.last_heartbeat > self.heartbeat_timeout:
+                    worker.kill(f"no heartbeat for {now - worker.last_heartbeat:.1f}s")
+                elif worker.state in (STARTING, RESTARTING) and worker.started_at is not None \
+                        and now - worker.started_at > self.start_timeout:
+                    worker.kill(f"not ready after {self.start_timeout:.0f}s")
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def _pick(self) -> Optional[PoolWorker]:
+        """Ready worker with the fewest outstanding requests; a starting one if none is ready"""
+
+        candidates = self.ready_workers() or [w for w in self.workers if w.state in (STARTING, RESTARTING)]
+        if not candidates:
+            return None
+        with self._lock:
+            worker = min(candidates, key=lambda w: (w.outstanding, w.last_routed))
+            worker.outstanding += 1
+            worker.last_routed = time.monotonic()
+        return worker
+
+    def _release(self, worker: PoolWorker):
+        with self._lock:
+            worker.outstanding -= 1
+
+    def submit(self, prompt: str, seed: Optional[int] = None,
+               progress: Optional[Callable] = None, context=None, **params) -> Future:
+        """Queue a prompt on the least-loaded worker; resolves to a BatchItemResult"""
+
+        if self.closed:
+            raise RuntimeError("DevicePool is shut down")
+        outer = Future()
+        self._dispatch(outer, (prompt, seed, progress, context, params), attempt=1)
+        return outer
+
+    def _dispatch(self, outer: Future, request, attempt: int):
+        prompt, seed, progress, context, params = request
+        worker = self._pick()
+        if worker is None:
+            with self._lock:
+                self._unroutable += 1
+            outer.set_exception(RuntimeError("no HURAII worker is available"))
+            return
+
+        inner = worker.scheduler.submit(prompt, seed=seed, progress=progress, context=context, **params)
+        outer.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+
+        def settle(done: Future):
+            self._release(worker)
+            if done.cancelled() or outer.done():
+                return
+            error = done.exception()
+            if isinstance(error, WorkerLost) and attempt < self.max_attempts and not self.closed:
+                with self._lock:
+                    self._failovers += 1
+                logger.warning(f"🔁 Rerouting request after attempt {attempt}: {error}")
+                self._dispatch(outer, request, attempt + 1)
+                return
+            try:
+                if error is not None:
+                    outer.set_exception(error)
+                else:
+                    outer.set_result(done.result())
+            except InvalidStateError:
+                pass  # cancelled by the caller meanwhile
+
+        inner.add_done_callback(settle)
+
+    def call(self, method: str, *args, **kwargs):
+        """Run one unbatched runner method (e.g. tile refinement) on the least-loaded worker"""
+
+        for attempt in range(1, self.max_attempts + 1):
+            worker = self._pick()
+            if worker is None:
+                raise RuntimeError("no HURAII worker is available")
+            try:
+                return worker.call(method, *args, **kwargs)
+            except WorkerLost as e:
+                if attempt == self.max_attempts or self.closed:
+                    raise
+                with self._lock:
+                    self._failovers += 1
+                logger.warning(f"🔁 Rerouting {method} after attempt {attempt}: {e}")
+            finally:
+                self._release(worker)
+
+    def queue_depth(self) -> int:
+        return sum(worker.scheduler.queue_depth() for worker in self.workers)
+
+    def get_stats(self) -> Dict:
+        workers = [worker.get_stats() for worker in self.workers]
+        batching = [w["batching"] for w in workers]
+        served = sum(b["requests_served"] for b in batching)
+        batches = sum(b["batches_run"] for b in batching)
+        with self._lock:
+            failovers, unroutable = self._failovers, self._unroutable
+        return {
+            "devices": len(self.workers),
+            "ready_workers": sum(1 for w in workers if w["state"] == READY),
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": sum(b["queue_depth"] for b in batching),
+            "requests_served": served,
+            "batches_run": batches,
+            "avg_batch_size": round(served / batches, 2) if batches else 0.0,
+            "throughput_per_sec": round(sum(b["throughput_per_sec"] for b in batching), 2),
+            "failovers": failovers,
+            "unroutable": unroutable,
+            "restarts": sum(w["restarts"] for w in workers),
+            "workers": workers
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting requests, finish queued ones and stop the worker processes"""
+
+        self.closed = True
+        for worker in self.workers:
+            if wait:
+                worker.stop()
+            else:
+                worker.scheduler.shutdown(wait=False)
+                worker.kill("pool shut down")
+
+
+class StubWorker:
+    """Worker runner around the CPU stub pipeline, for tests and benchmarks
+
+    Has the engine's ``run_pipeline_batch`` signature, so a pool of stub
+    workers exercises the same routing, batching and failover as GPUs.
+    """
+
+    def __init__(self, device: str, step_time: float = 0.001):
+        from huraii_stub_pipeline import StubDiffusionPipeline
+
+        self.device = device
+        self.pipe = StubDiffusionPipeline(step_time=step_time)
+
+    def run_pipeline_batch(self, prompts, seeds, params, step_callback=None):
+        def stop_when_cancelled(pipe, step, timestep, callback_kwargs):
+            if step_callback(step + 1, params["num_inference_steps"], callback_kwargs.get("latents")):
+                pipe._interrupt = True
+            return callback_kwargs
+
+        on_step_end = stop_when_cancelled if step_callback is not None else None
+        return self.pipe(prompts, generator=list(seeds), callback_on_step_end=on_step_end, **params).images
+
+
+def benchmark_pool(worker_counts=(1, 2, 4), requests: int = 32, batch_size: int = 4,
+                   steps: int = 20, step_time: float = 0.005, size: int = 64) -> List[Dict]:
+    """Throughput of stub pools of different sizes, and of one with a worker killed mid-run"""
+
+    params = {"num_inference_steps": steps, "width": size, "height": size}
+    reports = []
+    for count in worker_counts:
+        for kill in (False, True) if count > 1 else (False,):
+            pool = DevicePool(partial(StubWorker, step_time=step_time), ["cpu"] * count,
+                              max_batch_size=batch_size, max_wait_ms=5, restart_backoff=0.1)
+            pool.wait_ready(timeout=60)
+            while len(pool.ready_workers()) < count:
+                time.sleep(0.05)
+
+            start = time.perf_counter()
+            futures = [pool.submit(f"prompt {i}", seed=i, **params) for i in range(requests)]
+            if kill:
+                time.sleep(steps * step_time)
+                pool.workers[0].kill("benchmark")
+            done, _ = wait(futures)
+            elapsed = time.perf_counter() - start
+
+            stats = pool.get_stats()
+            pool.shutdown()
+            reports.append({
+                "workers": count,
+                "killed_one": kill,
+                "images_per_sec": round(requests / elapsed, 2),
+                "failed_requests": sum(1 for f in done if f.exception() is not None),
+                "failovers": stats["failovers"],
+                "served_per_worker": [w["batching"]["requests_served"] for w in stats["workers"]]
+            })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII device pool benchmark (stub workers)")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="Comma-separated pool sizes")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per run")
+    parser.add_argument("--batch-size", type=int, default=4, help="Max batch size per worker")
+    parser.add_argument("--steps", type=int, default=20, help="Inference steps per request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = [int(count) for count in args.workers.split(",")]
+    for report in benchmark_pool(counts, requests=args.requests, batch_size=args.batch_size, steps=args.steps):
+        logger.info(f"🧵 Device pool benchmark: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+HURAII PROMPT EMBEDDING CACHE
+LRU cache of text-encoder outputs keyed by normalized prompt
+Hardware: GPU (embeddings stay on the device), CPU (bookkeeping)
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key for a prompt: CLIP's tokenizer lowercases and ignores repeated whitespace"""
+    return " ".join(prompt.lower().split())
+
+
+def _nbytes(embedding) -> int:
+    if hasattr(embedding, "element_size"):
+        return embedding.element_size() * embedding.nelement()
+    return embedding.nbytes
+
+
+def _split(batch) -> List:
+    """Per-prompt (1, tokens, dim) copies, so one cached prompt never pins a whole batch"""
+
+    if hasattr(batch, "clone"):
+        return [batch[i:i + 1].clone() for i in range(batch.shape[0])]
+    return [batch[i:i + 1].copy() for i in range(batch.shape[0])]
+
+
+def _stack(embeddings: List):
+    if hasattr(embeddings[0], "clone"):
+        return sys.modules["torch"].cat(embeddings)
+    return np.concatenate(embeddings)
+
+
+class PromptEmbeddingCache:
+    """Memoize ``encode(prompts)`` per prompt, bounded by bytes
+
+    ``encode`` takes a list of prompts and returns a (N, tokens, dim) tensor
+    or array. ``get`` answers the prompts it has seen from memory and
+    encodes the rest in one call. The text encoder attends over the whole
+    prompt, so embeddings are cached for complete prompts; style suffixes
+    cannot be encoded once and reused separately. The least recently used
+    embeddings are evicted once the cache holds more than ``max_bytes``.
+    """
+
+    def __init__(self, encode: Callable, max_bytes: int = 128 * 1024**2):
+        self.encode = encode
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # normalized prompt -> embedding
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "prewarmed": 0,
+            "encode_calls": 0,
+            "encode_seconds": 0.0
+        }
+
+    def get(self, prompts: List[str]):
+        """Embeddings for ``prompts`` stacked in order"""
+
+        keys = [normalize_prompt(prompt) for prompt in prompts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            hits = sum(1 for key in keys if key in found)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            found.update(self._encode(missing))
+        return _stack([found[key] for key in keys])
+
+    def prewarm(self, prompts: Iterable[str]) -> int:
+        """Encode prompts ahead of traffic; returns how many were new"""
+
+        with self._lock:
+            missing = list(dict.fromkeys(
+                key for key in map(normalize_prompt, prompts) if key not in self._entries
+            ))
+        if missing:
+            self._encode(missing)
+            with self._lock:
+                self.stats["prewarmed"] += len(missing)
+        return len(missing)
+
+    def _encode(self, keys: List[str]) -> Dict:
+        start = time.perf_counter()
+        embeddings = dict(zip(keys, _split(self.encode(keys))))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats["encode_calls"] += 1
+            self.stats["encode_seconds"] += elapsed
+            for key, embedding in embeddings.items():
+                if key in self._entries:
+                    self._bytes -= _nbytes(self._entries.pop(key))
+                self._entries[key] = embedding
+                self._bytes += _nbytes(embedding)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+                self.stats["evictions"] += 1
+        return embeddings
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["memory_mb"] = round(self._bytes / 1024**2, 2)
+
+        lookups = stats["hits"] + stats["misses"]
+        encoded = stats["misses"] + stats["prewarmed"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        # Encoder time the hits would have cost, at the average per-prompt encode time
+        per_prompt = stats["encode_seconds"] / encoded if encoded else 0.0
+        stats["encode_seconds_saved"] = round(stats["hits"] * per_prompt, 3)
+        stats["encode_seconds"] = round(stats["encode_seconds"], 3)
+        return stats
@@ -5,95 +5,461 @@ Generative AI Engine for VORTEX AI Marketplace
 Hardware: GPU-Optimized (CUDA/PyTorch)
 """
 
-import torch
-import torch.nn as nn
+import time
+
+# Measured before anything else is imported so startup timings cover the whole cold start
+PROCESS_START = time.perf_counter()
+
 import argparse
-import gradio as gr
+import contextlib
+import functools
+import importlib
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
-from diffusers import StableDiffusionPipeline
 import os
 import json
 import logging
+import sys
+import secrets
+import threading
+from collections import Counter
 from datetime import datetime
-import requests
+
+import huraii_analysis
+from huraii_admission import AdmissionController
+from huraii_batching import BatchScheduler
+from huraii_device_pool import DevicePool
+from huraii_cache import GenerationCache, SingleFlight, generation_key
+from huraii_embeddings import PromptEmbeddingCache
+from huraii_history import GenerationHistory
+from huraii_jobs import JobManager, load_api_keys, mount_job_routes
+from huraii_phash import PerceptualHashIndex, hash_to_hex, hex_to_hash, phash_batch
+from huraii_telemetry import TelemetrySampler, device_memory, mount_telemetry_routes, process_rss, series
+from huraii_tiling import PeakMemory, RefinedTiles, TiledGenerator, check_output_size
+from huraii_output import OutputEncoder, RenditionStore, describe_renditions, mount_output_routes, parse_renditions
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# torch, diffusers and gradio are imported on first use; time taken per module
+IMPORT_TIMINGS = {}
+
+STUB_MODEL_ID = "stub"
+
+STYLE_PROMPTS = {
+    "photorealistic": "highly detailed, photorealistic, 8k resolution, professional photography",
+    "artistic": "beautiful artwork, artistic masterpiece, detailed illustration",
+    "abstract": "abstract art, modern composition, creative interpretation",
+    "fantasy": "fantasy art, magical, mystical, enchanted",
+    "cyberpunk": "cyberpunk style, neon lights, futuristic, digital art",
+    "vintage": "vintage style, retro aesthetic, classic composition"
+}
+
+
+def timed_import(name):
+    """Import a heavy module on first use and record how long it took"""
+    
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMINGS[name] = round(time.perf_counter() - start, 3)
+    logger.info(f"⏱️ Imported {name} in {IMPORT_TIMINGS[name]}s")
+    return module
+
+
 class HuraiiGPUEngine:
-    def __init__(self, gpu_device="cuda:0"):
-        """Initialize HURAII GPU Engine"""
-        self.device = gpu_device if torch.cuda.is_available() else "cpu"
+    def __init__(self, gpu_device="cuda:0", max_batch_size=4, max_wait_ms=50,
+                 history_size=1000, history_dir=None, history_max_segments=16,
+                 cache_items=64, cache_dir=None, cache_max_bytes=2 * 1024**3,
+                 job_queue_size=32, job_timeout=120, target_p95=30.0, postprocess_workers=2,
+                 model_id="runwayml/stable-diffusion-v1-5", load_mode="eager",
+                 output_dir=None, output_workers=2, output_memory_mb=256, renditions=None,
+                 duplicate_distance=6, tile_size=512, tile_overlap=64, tile_memory_mb=None,
+                 tile_dir=None, tile_strength=0.35, max_output_side=8192, embedding_cache_mb=128, prewarm_prompts=8,
+                 devices=None, telemetry_interval=1.0, telemetry_samples=600):
+        """Initialize HURAII GPU Engine
+        
+        load_mode: "eager" loads models before returning, "background" starts
+        loading in a thread and returns while the engine reports "warming",
+        "on_demand" defers loading to the first generation.
+        
+        devices: list of device strings to run one worker process per device
+        instead of loading the model here; see DevicePool. Worker processes
+        start loading straight away whatever the load_mode.
+        
+        telemetry_interval: seconds between background telemetry samples
+        (0 disables the sampler thread; stage timings are still recorded).
+        
+        max_output_side: largest width or height a tiled output may request;
+        its source and result images are held in RAM.
+        
+        history_max_segments: 64 MB log segments kept under history_dir; the
+        oldest is deleted when a new one starts (0 or None keeps them all).
+        """
+        if load_mode not in ("eager", "background", "on_demand"):
+            raise ValueError(f"Unknown load_mode: {load_mode}")
+        
+        # Resolved against torch.cuda once torch is imported
+        self.requested_device = gpu_device
+        self.device = None
+        self.model_id = model_id
         self.model_cache = {}
-        self.generation_history = []
+        self.sd_pipe = None
+        self.img2img_pipe = None
+        # sd_pipe and img2img_pipe share one UNet; only one of them runs on the device at a time
+        self._device_lock = threading.RLock()
+        
+        # Startup state reported by get_status() and the /health endpoint
+        self.state = "cold"
+        self.load_error = None
+        self.startup_timings = {}
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        
+        # Finished seeded generations, keyed by a hash of their parameters
+        self.result_cache = GenerationCache(
+            memory_items=cache_items,
+            disk_dir=cache_dir,
+            disk_max_bytes=cache_max_bytes
+        )
+        
+        # Identical seeded requests already running share that run instead of starting another
+        self.single_flight = SingleFlight()
+        
+        # Archival file and thumbnails per generation, encoded once on a process pool
+        self.output_encoder = OutputEncoder(renditions=renditions, workers=output_workers)
+        self.outputs = RenditionStore(memory_bytes=output_memory_mb * 1024**2, disk_dir=output_dir)
+        
+        # Recent generations in memory, everything else in the on-disk log
+        self.generation_history = GenerationHistory(
+            capacity=history_size, log_dir=history_dir, max_segments=history_max_segments or None
+        )
+        
+        # Perceptual hashes of every generation for near-duplicate checks; the log is
+        # indexed in the background while new generations go straight in
+        self.duplicate_distance = duplicate_distance
+        self.duplicates = PerceptualHashIndex()
+        self.duplicates_loaded = threading.Event()
+        threading.Thread(
+            target=self._index_history, args=(self.generation_history.iter_log(),),
+            name="huraii-phash-index", daemon=True
+        ).start()
+        
+        logger.info(f"🚀 HURAII GPU Engine initializing ({load_mode} model load)")
+        
+        # Concurrent requests with matching parameters share one pipeline call;
+        # analysis of a finished batch overlaps with the next batch on the device
+        self.pool = None
+        if devices:
+            # One process per device, each a model-only engine with its own embedding cache
+            self.pool = DevicePool(
+                functools.partial(device_worker, model_id=model_id, embedding_cache_mb=embedding_cache_mb,
+                                  tile_strength=tile_strength),
+                devices,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                postprocess=self.postprocess_batch,
+                postprocess_workers=postprocess_workers
+            )
+            self.batcher = self.pool
+        else:
+            self.batcher = BatchScheduler(
+                self.run_pipeline_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                postprocess=self.postprocess_batch,
+                postprocess_workers=postprocess_workers
+            )
+        self.device_count = len(devices) if devices else 1
+        
+        # Text-encoder outputs for recent prompts; 0 MB disables the cache
+        self.prewarm_prompts = prewarm_prompts
+        self.embedding_cache = PromptEmbeddingCache(
+            self.encode_prompts, max_bytes=int(embedding_cache_mb * 1024**2)
+        ) if embedding_cache_mb > 0 and self.pool is None else None
+        
+        # Outputs beyond the base resolution are refined tile by tile under a memory cap
+        self.tile_strength = tile_strength
+        self.max_output_side = max_output_side
+        self.tiler = TiledGenerator(
+            self.refine_tiles,
+            tile_size=tile_size,
+            overlap=tile_overlap,
+            max_memory_mb=tile_memory_mb,
+            work_dir=tile_dir,
+            lock=self._device_lock
+        )
+        
+        # Trades steps/resolution for latency on non-premium requests under load
+        self.admission = AdmissionController(target_p95=target_p95, batch_size=max_batch_size)
+        
+        # Background jobs; enough workers to keep batches full
+        self.jobs = JobManager(
+            self.run_generation_job,
+            max_queue=job_queue_size,
+            workers=max_batch_size * 2 * self.device_count,
+            default_timeout=job_timeout
+        )
+        
+        # Memory, queue depth and per-stage timings, sampled off the request path
+        self.telemetry = TelemetrySampler(
+            self.telemetry_gauges, interval=telemetry_interval, capacity=telemetry_samples
+        )
+        self.telemetry.start()
         
-        logger.info(f"🚀 HURAII GPU Engine initializing on {self.device}")
+        self.startup_timings["engine_init"] = round(time.perf_counter() - PROCESS_START, 3)
         
         # Initialize models
-        self.init_models()
+        if load_mode == "eager":
+            self.init_models()
+        elif load_mode == "background":
+            self.state = "warming"
+            threading.Thread(target=self._load_in_background, name="huraii-model-load", daemon=True).start()
         
     def init_models(self):
-        """Initialize AI models for art generation"""
-        try:
-            # Stable Diffusion for art generation
-            logger.info("Loading Stable Diffusion model...")
-            self.sd_pipe = StableDiffusionPipeline.from_pretrained(
-                "runwayml/stable-diffusion-v1-5",
-                torch_dtype=torch.float16 if self.device != "cpu" else torch.float32,
-                safety_checker=None,
-                requires_safety_checker=False
-            )
-            self.sd_pipe = self.sd_pipe.to(self.device)
+        """Initialize AI models for art generation (runs once)"""
+        
+        with self._load_lock:
+            if self._ready.is_set():
+                return
+            self.state = "warming"
+            load_start = time.perf_counter()
             
-            # Enable memory efficient attention
-            if self.device != "cpu":
-                self.sd_pipe.enable_attention_slicing()
-                self.sd_pipe.enable_memory_efficient_attention()
+            try:
+                if self.pool is not None:
+                    # Models load in the worker processes; serve once any of them is up
+                    self.pool.wait_ready()
+                    self.device = [worker.device for worker in self.pool.workers]
+                elif self.model_id == STUB_MODEL_ID:
+                    # CPU stand-in with the pipeline's call signature, for tests and benchmarks
+                    from huraii_stub_pipeline import StubDiffusionPipeline
+                    self.device = "cpu"
+                    self.sd_pipe = StubDiffusionPipeline()
+                    self.img2img_pipe = self.sd_pipe
+                else:
+                    torch = timed_import("torch")
+                    diffusers = timed_import("diffusers")
+                    self.device = self.requested_device if torch.cuda.is_available() else "cpu"
+                    
+                    # Stable Diffusion for art generation
+                    logger.info(f"Loading Stable Diffusion model on {self.device}...")
+                    self.sd_pipe = diffusers.StableDiffusionPipeline.from_pretrained(
+                        self.model_id,
+                        torch_dtype=torch.float16 if self.device != "cpu" else torch.float32,
+                        safety_checker=None,
+                        requires_safety_checker=False
+                    )
+                    self.sd_pipe = self.sd_pipe.to(self.device)
+                    
+                    # Enable memory efficient attention
+                    if self.device != "cpu":
+                        self.sd_pipe.enable_attention_slicing()
+                        self.sd_pipe.enable_memory_efficient_attention()
+                    
+                    # Tile refinement shares the loaded weights rather than loading them twice,
+                    # but schedulers keep per-run state, so it gets its own
+                    components = dict(self.sd_pipe.components)
+                    components["scheduler"] = type(self.sd_pipe.scheduler).from_config(
+                        self.sd_pipe.scheduler.config
+                    )
+                    self.img2img_pipe = diffusers.StableDiffusionImg2ImgPipeline(**components)
+                
+            except Exception as e:
+                self.state = "failed"
+                self.load_error = str(e)
+                self._ready.set()  # wake waiters; they see the failed state
+                logger.error(f"❌ Model loading failed: {e}")
+                raise
             
-            logger.info("✅ HURAII models loaded successfully")
+            self.startup_timings["model_load"] = round(time.perf_counter() - load_start, 3)
             
+            if self.embedding_cache is not None:
+                prewarm_start = time.perf_counter()
+                self.prewarm_embeddings()
+                self.startup_timings["embedding_prewarm"] = round(time.perf_counter() - prewarm_start, 3)
+
+            self.startup_timings["ready_after"] = round(time.perf_counter() - PROCESS_START, 3)
+            self.state = "ready"
+            self._ready.set()
+            logger.info(f"✅ HURAII models loaded successfully ({self.get_status()['timings']})")
+    
+    def _load_in_background(self):
+        try:
+            self.init_models()
+        except Exception:
+            pass  # reported through get_status()
+    
+    def _index_history(self, entries):
+        index_start = time.perf_counter()
+        try:
+            indexed = self.duplicates.add_log(entries)
+            self.startup_timings["phash_index"] = round(time.perf_counter() - index_start, 3)
+            if indexed:
+                logger.info(f"🔍 Indexed {indexed} perceptual hashes from the history log in {self.startup_timings['phash_index']}s")
         except Exception as e:
-            logger.error(f"❌ Model loading failed: {e}")
-            raise
+            logger.error(f"❌ Could not index the history log for near-duplicates: {e}")
+        finally:
+            self.duplicates_loaded.set()
+    
+    def ensure_ready(self, timeout=None):
+        """Block until models are loaded, loading them now if nothing has started yet"""
+        
+        if self.state == "cold":
+            self.init_models()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("HURAII models are still loading")
+        if self.state == "failed":
+            raise RuntimeError(f"HURAII model loading failed: {self.load_error}")
+    
+    def get_status(self):
+        """Startup state plus import and model load timings"""
+        
+        timings = dict(self.startup_timings)
+        timings.update({f"import_{name}": seconds for name, seconds in IMPORT_TIMINGS.items()})
+        return {
+            "state": self.state,
+            "model_id": self.model_id,
+            "device": self.device,
+            "error": self.load_error,
+            "timings": timings
+        }
     
-    def generate_art(self, prompt, style="photorealistic", quality="high", seed=None):
-        """Generate AI art based on prompt and style"""
+    def generate_art(self, prompt, style="photorealistic", quality="high", seed=None,
+                     progress_callback=None, premium=False, output_size=None):
+        """Generate AI art based on prompt and style
+        
+        output_size: (width, height) beyond the base resolution, e.g. for
+        prints; the base image is upscaled and refined in tiles.
+        """
         
         generation_start = datetime.now()
         
+        # Outputs come from clients; an unbounded size would allocate an unbounded canvas
+        if output_size is not None:
+            try:
+                output_size = check_output_size(output_size, self.max_output_side)
+            except ValueError as e:
+                return {"error": str(e)}
+        
         # Enhance prompt based on style
         enhanced_prompt = self.enhance_prompt(prompt, style)
         
-        # Set generation parameters
-        num_inference_steps = 50 if quality == "high" else 30
+        # Set generation parameters; under sustained load non-premium requests get a cheaper tier
+        requested_steps = 50 if quality == "high" else 30
+        admission = self.admission.admit(
+            requested_steps,
+            premium=premium,
+            queue_depth=self.batcher.queue_depth() + self.jobs.queue_depth()
+        )
+        num_inference_steps = admission["num_inference_steps"]
         guidance_scale = 7.5
-        width, height = 512, 512
+        width, height = admission["width"], admission["height"]
+        params = {
+            "num_inference_steps": num_inference_steps,
+            "guidance_scale": guidance_scale,
+            "width": width,
+            "height": height
+        }
+        
+        # Tiled outputs are keyed by their final size and tiling settings
+        key_model, key_params = self.model_id, params
+        if output_size is not None:
+            key_model = f"{self.model_id}+tiled:{self.tiler.tile_size}/{self.tiler.overlap}/{self.tile_strength}/{width}"
+            key_params = dict(params, width=output_size[0], height=output_size[1])
         
+        # Seeded requests are deterministic, so identical ones can be served from the cache
+        cache_key = None
         if seed is not None:
-            generator = torch.Generator(device=self.device).manual_seed(seed)
-        else:
-            generator = None
+            cache_key = generation_key(enhanced_prompt, seed, model_id=key_model, **key_params)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                image, cached_meta = cached
+                
+                # Renditions live under the cache key; re-encode only if they were never stored
+                renditions = cached_meta.get("renditions")
+                if renditions is None or self.outputs.get(cache_key) is None:
+                    encoded = self.output_encoder.encode(image)
+                    self.outputs.put(cache_key, encoded)
+                    renditions = describe_renditions(encoded)
+                
+                generation_time = (datetime.now() - generation_start).total_seconds()
+                generation_log = {
+                    "timestamp": generation_start.isoformat(),
+                    "prompt": prompt,
+                    "enhanced_prompt": enhanced_prompt,
+                    "style": style,
+                    "quality": quality,
+                    "quality_tier": admission["tier"],
+                    "num_inference_steps": num_inference_steps,
+                    "resolution": f"{image.size[0]}x{image.size[1]}",
+                    "seed": seed,
+                    "generation_time": generation_time,
+                    "cache_hit": True,
+                    "original_generation_time": cached_meta["generation_time"],
+                    "output_id": cache_key,
+                    "renditions": renditions,
+                    "phash": cached_meta.get("phash"),
+                    "analysis": cached_meta["analysis"]
+                }
+                self.generation_history.append(generation_log)
+                self.telemetry.record_stages({"cache_hit": generation_time})
+                
+                return {
+                    "image": image,
+                    "generation_time": generation_time,
+                    "analysis": cached_meta["analysis"],
+                    "output_id": cache_key,
+                    "renditions": renditions,
+                    "metadata": generation_log
+                }
         
         try:
-            # Generate image
-            with torch.autocast(self.device):
-                result = self.sd_pipe(
+            # Generate image (batched with compatible concurrent requests)
+            context = {"prompt": prompt, "style": style}
+            
+            def render(progress=progress_callback):
+                batched = self.batcher.submit(
                     enhanced_prompt,
-                    num_inference_steps=num_inference_steps,
-                    guidance_scale=guidance_scale,
-                    width=width,
-                    height=height,
-                    generator=generator,
-                    return_dict=True
+                    seed=seed,
+                    progress=progress,
+                    context=context,
+                    **params
+                ).result()
+                if output_size is None:
+                    return batched
+                return self.tile_result(batched, enhanced_prompt, seed, params, output_size, context)
+            
+            coalesced = False
+            if cache_key is not None:
+                # Every coalesced caller gets progress; the run stops only when all of them give up
+                batched, coalesced = self.single_flight.do(
+                    cache_key,
+                    render,
+                    cost=lambda item: item.run_time / item.batch_size,
+                    progress=progress_callback,
+                    fan_out=True
                 )
+            else:
+                batched = render()
             
-            image = result.images[0]
+            image = batched.output
             generation_time = (datetime.now() - generation_start).total_seconds()
+            if not coalesced:
+                self.admission.record(batched.run_time, num_inference_steps, width, height)
             
-            # Analyze generated image
-            analysis = self.analyze_generated_art(image, prompt, style)
+            # Analysis and encoding already ran on the post-processing pools
+            analysis = batched.post["analysis"]
+            output_id = cache_key or secrets.token_hex(32)
+            renditions = describe_renditions(batched.post["renditions"])
+            if not coalesced:
+                self.outputs.put(output_id, batched.post["renditions"])
+            
+            # Earlier generations that look the same, then register this one
+            phash = batched.post["phash"]
+            near_duplicates = self.find_near_duplicates(phash)
+            if not coalesced:
+                self.duplicates.add(hex_to_hash(phash), output_id)
             
             # Log generation
             generation_log = {
@@ -102,17 +468,53 @@ class HuraiiGPUEngine:
                 "enhanced_prompt": enhanced_prompt,
                 "style": style,
                 "quality": quality,
+                "quality_tier": admission["tier"],
+                "num_inference_steps": num_inference_steps,
+                "resolution": f"{image.size[0]}x{image.size[1]}",
                 "seed": seed,
                 "generation_time": generation_time,
+                "cache_hit": False,
+                "coalesced": coalesced,
+                "batch_size": batched.batch_size,
+                "queue_wait": round(batched.queue_wait, 4),
+                "device_time": 0.0 if coalesced else round(batched.run_time / batched.batch_size, 4),
+                "output_id": output_id,
+                "renditions": renditions,
+                "phash": phash,
+                "near_duplicates": near_duplicates,
+                "tiling": batched.post.get("tiling"),
                 "analysis": analysis
             }
             
             self.generation_history.append(generation_log)
             
+            if coalesced:
+                self.telemetry.record_stages({"coalesced": generation_time})
+            else:
+                tiling = batched.post.get("tiling")
+                self.telemetry.record_stages({
+                    "queue_wait": batched.queue_wait,
+                    "device": batched.run_time,
+                    "postprocess": batched.post_time,
+                    "tiling": tiling["total_time"] if tiling else None,
+                    "total": generation_time
+                })
+            
+            if cache_key is not None and not coalesced:
+                self.result_cache.put(cache_key, image, {
+                    "generation_time": generation_time,
+                    "analysis": analysis,
+                    "renditions": renditions,
+                    "phash": phash
+                })
+            
             return {
                 "image": image,
                 "generation_time": generation_time,
                 "analysis": analysis,
+                "output_id": output_id,
+                "renditions": renditions,
+                "near_duplicates": near_duplicates,
                 "metadata": generation_log
             }
             
@@ -120,19 +522,171 @@ class HuraiiGPUEngine:
             logger.error(f"❌ Art generation failed: {e}")
             return {"error": str(e)}
     
+    def run_generation_job(self, job, prompt, style="photorealistic", quality="high", seed=None,
+                           premium=False, output_size=None):
+        """Job body for the async API; reports per-step progress to the job"""
+        return self.generate_art(
+            prompt, style, quality, seed,
+            progress_callback=job.report_progress,
+            premium=premium,
+            output_size=output_size
+        )
+    
+    def tile_result(self, batched, enhanced_prompt, seed, params, output_size, context):
+        """Upscale a finished base image to output_size and redo its post-processing"""
+        
+        tiled = self.tiler.run(
+            batched.output, output_size[0], output_size[1],
+            prompt=enhanced_prompt,
+            seed=seed,
+            num_inference_steps=params["num_inference_steps"],
+            guidance_scale=params["guidance_scale"]
+        )
+        post = self.postprocess_batch([tiled.image], [context])[0]
+        post["tiling"] = {
+            "tiles": len(tiled.tiles),
+            "tile_size": self.tiler.tile_size,
+            "peak_memory_mb": tiled.peak_memory_mb,
+            "seconds_per_tile": round(sum(t["seconds"] for t in tiled.tiles) / len(tiled.tiles), 4),
+            "total_time": tiled.total_time
+        }
+        logger.info(f"🧩 Tiled {tiled.image.size[0]}x{tiled.image.size[1]} output: {post['tiling']}")
+        return batched._replace(output=tiled.image, post=post)
+    
+    def refine_tiles(self, tiles, prompt, seed, num_inference_steps, guidance_scale):
+        """img2img pass over a batch of upscaled tiles, as RefinedTiles
+        
+        The peak is measured in the process that runs the pipeline, so with a
+        device pool it is the worker's, not this front end's.
+        """
+        
+        if self.pool is not None:
+            return self.pool.call("refine_tiles", tiles, prompt, seed, num_inference_steps, guidance_scale)
+        
+        self.ensure_ready()
+        torch, generators = self._generators([seed] * len(tiles))
+        
+        autocast = torch.autocast(self.device.split(":")[0]) if torch else contextlib.nullcontext()
+        with self._device_lock, autocast, PeakMemory() as peak:
+            result = self.img2img_pipe(
+                image=tiles,
+                strength=self.tile_strength,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                generator=generators,
+                return_dict=True,
+                **self.text_inputs([prompt] * len(tiles), guidance_scale)
+            )
+        
+        return RefinedTiles(result.images, peak.peak_bytes)
+    
+    def _generators(self, seeds):
+        """(torch or None, one generator per seed); the stub takes raw seeds"""
+        
+        if self.model_id == STUB_MODEL_ID:
+            return None, list(seeds)
+        
+        torch = timed_import("torch")
+        generators = []
+        for seed in seeds:
+            generator = torch.Generator(device=self.device)
+            if seed is not None:
+                generator.manual_seed(seed)
+            else:
+                generator.seed()
+            generators.append(generator)
+        return torch, generators
+    
+    def postprocess_batch(self, images, contexts):
+        """CPU-side work for a finished batch, run off the device thread"""
+        
+        # Encoding runs in other processes while this thread does the analysis
+        encodings = [self.output_encoder.submit(image) for image in images]
+        analyses = self.analyze_generated_art_batch(
+            images,
+            [context["prompt"] for context in contexts],
+            [context["style"] for context in contexts]
+        )
+        hashes = phash_batch([np.asarray(image) for image in images])
+        return [
+            {"analysis": analysis, "renditions": encoding.result(), "phash": hash_to_hex(code)}
+            for analysis, encoding, code in zip(analyses, encodings, hashes)
+        ]
+    
+    def find_near_duplicates(self, phash, max_distance=None, limit=10):
+        """Earlier generations within a Hamming distance of a hex perceptual hash"""
+        
+        max_distance = self.duplicate_distance if max_distance is None else max_distance
+        return [
+            {"output_id": output_id, "distance": distance}
+            for output_id, distance in self.duplicates.query(hex_to_hash(phash), max_distance, limit=limit)
+        ]
+    
+    def run_pipeline_batch(self, prompts, seeds, params, step_callback=None):
+        """Run one batched diffusion call; returns one image per prompt"""
+        
+        # First request waits here when models load on demand or are still warming
+        self.ensure_ready()
+        
+        # One generator per prompt keeps seeded results identical to unbatched runs
+        torch, generators = self._generators(seeds)
+        
+        def stop_when_cancelled(pipe, step, timestep, callback_kwargs):
+            # Stop early once every request in the batch has been cancelled
+            if step_callback(step + 1, params["num_inference_steps"], callback_kwargs.get("latents")):
+                pipe._interrupt = True
+            return callback_kwargs
+        
+        text_inputs = self.text_inputs(prompts, params.get("guidance_scale", 7.5))
+        
+        autocast = torch.autocast(self.device.split(":")[0]) if torch else contextlib.nullcontext()
+        with self._device_lock, autocast:
+            result = self.sd_pipe(
+                generator=generators,
+                callback_on_step_end=stop_when_cancelled if step_callback is not None else None,
+                return_dict=True,
+                **text_inputs,
+                **params
+            )
+        
+        return result.images
+    
+    def text_inputs(self, prompts, guidance_scale):
+        """Pipeline text arguments; cached embeddings skip the text encoder for prompts seen before"""
+        
+        if self.embedding_cache is None:
+            return {"prompt": list(prompts)}
+        
+        inputs = {"prompt_embeds": self.embedding_cache.get(list(prompts))}
+        if guidance_scale > 1:
+            inputs["negative_prompt_embeds"] = self.embedding_cache.get([""] * len(prompts))
+        return inputs
+    
+    def encode_prompts(self, prompts):
+        """Text-encoder outputs for a list of prompts, without classifier-free guidance pairs"""
+        
+        if self.model_id == STUB_MODEL_ID:
+            return self.sd_pipe.encode_prompt(prompts, self.device, 1, False)[0]
+        
+        torch = timed_import("torch")
+        with torch.no_grad():
+            return self.sd_pipe.encode_prompt(prompts, self.device, 1, False)[0]
+    
+    def prewarm_embeddings(self):
+        """Encode the empty negative prompt and each style preset over the most requested prompts"""
+        
+        recent = self.generation_history.last(self.generation_history.capacity)
+        popular = Counter(entry["prompt"] for entry in recent if entry.get("prompt"))
+        prompts = [prompt for prompt, _ in popular.most_common(self.prewarm_prompts)]
+        
+        texts = [""] + [self.enhance_prompt(prompt, style) for prompt in prompts for style in STYLE_PROMPTS]
+        added = self.embedding_cache.prewarm(texts)
+        logger.info(f"🔥 Prewarmed {added} prompt embeddings ({len(prompts)} popular prompts x {len(STYLE_PROMPTS)} styles)")
+    
     def enhance_prompt(self, prompt, style):
         """Enhance prompt based on artistic style"""
         
-        style_prompts = {
-            "photorealistic": "highly detailed, photorealistic, 8k resolution, professional photography",
-            "artistic": "beautiful artwork, artistic masterpiece, detailed illustration",
-            "abstract": "abstract art, modern composition, creative interpretation",
-            "fantasy": "fantasy art, magical, mystical, enchanted",
-            "cyberpunk": "cyberpunk style, neon lights, futuristic, digital art",
-            "vintage": "vintage style, retro aesthetic, classic composition"
-        }
-        
-        style_enhancement = style_prompts.get(style, "high quality artwork")
+        style_enhancement = STYLE_PROMPTS.get(style, "high quality artwork")
         enhanced = f"{prompt}, {style_enhancement}"
         
         return enhanced
@@ -154,22 +708,29 @@ class HuraiiGPUEngine:
         
         return analysis
     
+    def analyze_generated_art_batch(self, images, original_prompts, styles):
+        """Analyze many same-sized artworks in one vectorized pass"""
+        
+        stack = np.stack([np.asarray(image) for image in images])
+        height, width = stack.shape[1:3]
+        batch_stats = huraii_analysis.analyze_image_batch(stack)
+        
+        analyses = []
+        for img_array, stats, prompt, style in zip(stack, batch_stats, original_prompts, styles):
+            analyses.append({
+                "dimensions": f"{width}x{height}",
+                "color_analysis": stats["color_analysis"],
+                "composition_score": self.score_composition(img_array),
+                "style_match": self.evaluate_style_match(img_array, style),
+                "prompt_adherence": self.evaluate_prompt_adherence(prompt),
+                "quality_score": stats["quality_score"]
+            })
+        
+        return analyses
+    
     def analyze_colors(self, img_array):
         """Analyze color composition of generated art"""
-        
-        # Calculate dominant colors
-        pixels = img_array.reshape(-1, 3)
-        
-        # Simple color analysis
-        avg_color = np.mean(pixels, axis=0)
-        color_variance = np.var(pixels, axis=0) 
-        
-        return {
-            "average_rgb": avg_color.tolist(),
-            "color_variance": color_variance.tolist(),
-            "brightness": float(np.mean(avg_color)),
-            "contrast": float(np.std(pixels))
-        }
+        return huraii_analysis.analyze_colors(img_array)
     
     def score_composition(self, img_array):
         """Score the composition of the artwork"""
@@ -213,24 +774,54 @@ class HuraiiGPUEngine:
     
     def calculate_quality_score(self, img_array):
         """Calculate overall quality score of the generated art"""
+        return huraii_analysis.calculate_quality_score(img_array)
+    
+    def telemetry_gauges(self):
+        """Gauges for the telemetry sampler; device memory comes from each worker's heartbeat in pool mode"""
         
-        # Calculate sharpness (using gradient magnitude)
-        gray = np.mean(img_array, axis=2) if len(img_array.shape) == 3 else img_array
-        gradient_x = np.gradient(gray, axis=1)
-        gradient_y = np.gradient(gray, axis=0)
-        gradient_magnitude = np.sqrt(gradient_x**2 + gradient_y**2)
-        sharpness = np.mean(gradient_magnitude)
+        gauges = {
+            "queue_depth": self.batcher.queue_depth(),
+            "job_queue_depth": self.jobs.queue_depth(),
+            "ready": float(self.state == "ready")
+        }
         
-        # Normalize sharpness to 0-1 scale
-        quality_score = min(1.0, sharpness / 100)
+        if self.pool is not None:
+            gauges["ready_workers"] = len(self.pool.ready_workers())
+            devices = []
+            for worker in self.pool.workers:
+                # Until a worker reports its pid, process_rss(None) would read this process instead
+                pid = worker.info.get("pid")
+                if pid is not None:
+                    gauges[series("host_rss_bytes", worker=worker.index)] = process_rss(pid)
+                devices.append((worker.info.get("device", worker.device), worker.memory))
+        else:
+            devices = [(self.device, device_memory(self.device))]
         
-        return round(quality_score, 3)
+        for device, memory in devices:
+            for kind, value in (memory or {}).items():
+                gauges[series(f"device_memory_{kind}_bytes", device=device)] = value
+        return gauges
     
     def get_gpu_stats(self):
         """Get current GPU utilization stats"""
         
-        if not torch.cuda.is_available():
-            return {"gpu_available": False}
+        engine_stats = {
+            "engine": self.get_status(),
+            "batching": self.batcher.get_stats(),
+            "cache": self.result_cache.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "jobs": self.jobs.get_stats(),
+            "admission": self.admission.get_stats(),
+            "outputs": {**self.output_encoder.get_stats(), "store": self.outputs.get_stats()},
+            "duplicates": {**self.duplicates.get_stats(), "history_indexed": self.duplicates_loaded.is_set()},
+            "embeddings": self.embedding_cache.get_stats() if self.embedding_cache is not None else None,
+            "telemetry": self.telemetry.get_stats()
+        }
+        
+        # Only look at torch once something else imported it; importing here would stall the caller
+        torch = sys.modules.get("torch")
+        if torch is None or not torch.cuda.is_available():
+            return {"gpu_available": False, **engine_stats}
         
         gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
         gpu_memory_used = torch.cuda.memory_allocated(0) / 1024**3
@@ -242,12 +833,15 @@ class HuraiiGPUEngine:
             "gpu_memory_total": round(gpu_memory, 2),
             "gpu_memory_used": round(gpu_memory_used, 2),
             "gpu_memory_cached": round(gpu_memory_cached, 2),
-            "gpu_utilization": f"{(gpu_memory_used/gpu_memory)*100:.1f}%"
+            "gpu_utilization": f"{(gpu_memory_used/gpu_memory)*100:.1f}%",
+            **engine_stats
         }
     
     def gradio_interface(self):
         """Create Gradio interface for HURAII"""
         
+        gr = timed_import("gradio")
+        
         def generate_with_gradio(prompt, style, quality, seed_input):
             """Gradio wrapper for art generation"""
             
@@ -262,7 +856,8 @@ class HuraiiGPUEngine:
             info_text = (f"Generation Time: {result['generation_time']:.2f}s\n"
                         f"Quality Score: {result['analysis']['quality_score']}\n"
                         f"Style Match: {result['analysis']['style_match']}\n"
-                        f"GPU Utilization: {gpu_stats.get('gpu_utilization', 'N/A')}")
+                        f"GPU Utilization: {gpu_stats.get('gpu_utilization', 'N/A')}\n"
+                        f"Downloads: /outputs/{result['output_id']}")
             
             return result['image'], info_text, result['analysis']
         
@@ -284,7 +879,7 @@ class HuraiiGPUEngine:
                 gr.Textbox(label="Seed (optional)", placeholder="Random seed for reproducible results")
             ],
             outputs=[
-                gr.Image(label="Generated Artwork"),
+                gr.Image(label="Generated Artwork", format="webp"),
                 gr.Textbox(label="Generation Info"),
                 gr.JSON(label="Analysis Details")
             ],
@@ -293,8 +888,32 @@ class HuraiiGPUEngine:
             theme="default"
         )
         
+        # Let enough requests in concurrently to fill a batch
+        iface.queue(default_concurrency_limit=self.batcher.max_batch_size * 2 * self.device_count)
+        
         return iface
 
+def device_worker(device, model_id, embedding_cache_mb=128, tile_strength=0.35):
+    """Runner for one DevicePool worker process: a model-only engine on ``device``
+    
+    Post-processing, caches and jobs live in the front-end engine, so this
+    one keeps them minimal and loads its model before returning.
+    """
+    return HuraiiGPUEngine(
+        gpu_device=device,
+        max_batch_size=1,
+        history_size=1,
+        cache_items=1,
+        job_queue_size=1,
+        postprocess_workers=0,
+        output_workers=0,
+        model_id=model_id,
+        load_mode="eager",
+        tile_strength=tile_strength,
+        embedding_cache_mb=embedding_cache_mb,
+        telemetry_interval=0
+    )
+
 def main():
     """Main function to start HURAII GPU Engine"""
     
@@ -302,28 +921,101 @@ def main():
     parser.add_argument("--port", type=int, default=7860, help="Port to run Gradio interface")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--gpu", type=str, default="cuda:0", help="GPU device to use")
+    parser.add_argument("--devices", type=str, default=None,
+                        help="Comma-separated devices, one worker process each (e.g. cuda:0,cuda:1); overrides --gpu")
+    parser.add_argument("--max-batch-size", type=int, default=4, help="Max prompts per pipeline call")
+    parser.add_argument("--max-wait-ms", type=float, default=50, help="Max time a request waits for a batch to fill")
+    parser.add_argument("--history-size", type=int, default=1000, help="Generations kept in memory")
+    parser.add_argument("--history-dir", type=str, default="huraii_history", help="Directory for the generation log")
+    parser.add_argument("--history-max-segments", type=int, default=16,
+                        help="64 MB generation log segments kept on disk (0 keeps every segment)")
+    parser.add_argument("--cache-items", type=int, default=64, help="Seeded results kept in memory")
+    parser.add_argument("--cache-dir", type=str, default="huraii_cache", help="Directory for cached results")
+    parser.add_argument("--cache-max-gb", type=float, default=2.0, help="Disk budget for cached results")
+    parser.add_argument("--job-queue-size", type=int, default=32, help="Max queued async jobs")
+    parser.add_argument("--job-timeout", type=float, default=120, help="Default async job timeout in seconds")
+    parser.add_argument("--premium-keys-file", type=str, default=None,
+                        help="File of API keys (one per line) whose /jobs requests skip quality degradation")
+    parser.add_argument("--target-p95", type=float, default=30.0, help="Latency target (s) for adaptive quality")
+    parser.add_argument("--postprocess-workers", type=int, default=2, help="Threads for post-generation analysis (0 = inline)")
+    parser.add_argument("--model", type=str, default="runwayml/stable-diffusion-v1-5", help="Diffusers model id ('stub' for a CPU stand-in)")
+    parser.add_argument("--output-dir", type=str, default="huraii_outputs", help="Directory for archival files and thumbnails")
+    parser.add_argument("--output-workers", type=int, default=2, help="Processes encoding outputs (0 = inline)")
+    parser.add_argument("--renditions", type=str, default=None,
+                        help="Output renditions as name:format[:max_size[:quality]],... (default: PNG archival plus WebP/JPEG thumbnails)")
+    parser.add_argument("--duplicate-distance", type=int, default=6, help="Max pHash Hamming distance reported as a near duplicate")
+    parser.add_argument("--tile-memory-mb", type=float, default=None, help="Device memory cap for tiled high-res refinement")
+    parser.add_argument("--tile-dir", type=str, default=None, help="Directory for memory-mapped tiling canvases")
+    parser.add_argument("--max-output-side", type=int, default=8192, help="Largest width or height of a tiled output")
+    parser.add_argument("--embedding-cache-mb", type=float, default=128, help="Memory for cached prompt embeddings (0 = off)")
+    parser.add_argument("--telemetry-interval", type=float, default=1.0, help="Seconds between telemetry samples (0 = off)")
+    parser.add_argument("--load-mode", type=str, default="background", choices=["eager", "background", "on_demand"],
+                        help="When to load models: before serving, in the background, or on first request")
     
     args = parser.parse_args()
     
     # Initialize HURAII
-    huraii = HuraiiGPUEngine(gpu_device=args.gpu)
+    huraii = HuraiiGPUEngine(
+        gpu_device=args.gpu,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        history_size=args.history_size,
+        history_dir=args.history_dir,
+        history_max_segments=args.history_max_segments,
+        cache_items=args.cache_items,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=int(args.cache_max_gb * 1024**3),
+        job_queue_size=args.job_queue_size,
+        job_timeout=args.job_timeout,
+        target_p95=args.target_p95,
+        postprocess_workers=args.postprocess_workers,
+        model_id=args.model,
+        load_mode=args.load_mode,
+        output_dir=args.output_dir,
+        output_workers=args.output_workers,
+        renditions=parse_renditions(args.renditions) if args.renditions else None,
+        duplicate_distance=args.duplicate_distance,
+        tile_memory_mb=args.tile_memory_mb,
+        tile_dir=args.tile_dir,
+        max_output_side=args.max_output_side,
+        embedding_cache_mb=args.embedding_cache_mb,
+        devices=args.devices.split(",") if args.devices else None,
+        telemetry_interval=args.telemetry_interval
+    )
     
-    # Get GPU stats
-    gpu_stats = huraii.get_gpu_stats()
+    # Get engine status
+    status = huraii.get_status()
     logger.info(f"🚀 HURAII GPU Engine Status:")
-    logger.info(f"   GPU Available: {gpu_stats.get('gpu_available', False)}")
-    if gpu_stats.get('gpu_available'):
-        logger.info(f"   GPU Name: {gpu_stats['gpu_name']}")
-        logger.info(f"   GPU Memory: {gpu_stats['gpu_memory_total']} GB")
+    logger.info(f"   State: {status['state']}")
+    logger.info(f"   Startup Timings: {status['timings']}")
+    
+    fastapi = timed_import("fastapi")
+    uvicorn = timed_import("uvicorn")
+    gr = timed_import("gradio")
+    
+    # Serve the async job API next to the Gradio interface
+    app = fastapi.FastAPI(title="HURAII GPU Engine")
+    premium_keys = load_api_keys(args.premium_keys_file) if args.premium_keys_file else ()
+    mount_job_routes(app, huraii.jobs, premium_keys=premium_keys, styles=list(STYLE_PROMPTS), max_output_side=huraii.max_output_side)
+    mount_output_routes(app, huraii.outputs)
+    mount_telemetry_routes(app, huraii.telemetry)
+    
+    @app.get("/health")
+    def health():
+        """Liveness: answers as soon as the server binds, reporting 'warming' until models load"""
+        return huraii.get_status()
+    
+    @app.get("/ready")
+    def ready():
+        """Readiness: 503 until models are loaded"""
+        status = huraii.get_status()
+        if status["state"] != "ready":
+            raise fastapi.HTTPException(status_code=503, detail=status["state"])
+        return status
     
-    # Create and launch Gradio interface
     interface = huraii.gradio_interface()
-    interface.launch(
-        server_name=args.host,
-        server_port=args.port,
-        share=False,
-        debug=False
-    )
+    app = gr.mount_gradio_app(app, interface, path="/")
+    uvicorn.run(app, host=args.host, port=args.port)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
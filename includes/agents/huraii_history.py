@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+HURAII GENERATION HISTORY
+Fixed-size in-memory ring of recent generations backed by a segmented JSONL log
+Hardware: CPU
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "history-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _as_timestamp(value) -> str:
+    """Entries carry ISO-8601 timestamps, which sort lexicographically"""
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class _Segment:
+    """Bookkeeping for one log file; entries themselves stay on disk"""
+
+    __slots__ = ("path", "first_ts", "last_ts", "size")
+
+    def __init__(self, path, first_ts=None, last_ts=None, size=0):
+        self.path = path
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.size = size
+
+
+class GenerationHistory:
+    """Bounded record of generations
+
+    The newest ``capacity`` entries are kept in memory. When ``log_dir`` is
+    set, every entry is also appended to a JSONL segment; a new segment is
+    started once the current one reaches ``segment_max_bytes``, and only the
+    newest ``max_segments`` are kept (all of them when None). Queries that
+    reach past the in-memory ring read one segment at a time, so memory use
+    is bounded by the segment size rather than the length of the history.
+    """
+
+    def __init__(self, capacity: int = 1000, log_dir: Optional[str] = None,
+                 segment_max_bytes: int = 64 * 1024 * 1024, max_segments: Optional[int] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+
+        self.capacity = capacity
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+
+        self._recent = deque(maxlen=capacity)
+        self._segments: List[_Segment] = []
+        self._file = None
+        self._lock = threading.Lock()
+        self.total_appended = 0
+
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            self._load_segments()
+
+    # ------------------------------------------------------------------
+    # Segment management
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.log_dir, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        name = os.path.basename(path)
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def _load_segments(self):
+        """Index existing segments by reading only their first and last lines"""
+
+        names = sorted(
+            name for name in os.listdir(self.log_dir)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        for name in names:
+            path = os.path.join(self.log_dir, name)
+            first, last = self._edge_timestamps(path)
+            self._segments.append(_Segment(path, first, last, os.path.getsize(path)))
+
+        if self._segments:
+            logger.info(f"📚 Generation history: {len(self._segments)} log segments in {self.log_dir}")
+
+    @staticmethod
+    def _parse(line: bytes) -> Optional[Dict]:
+        try:
+            return json.loads(line)
+        except ValueError:
+            # A torn final line from a crash mid-write
+            return None
+
+    def _edge_timestamps(self, path: str):
+        with open(path, "rb") as f:
+            first = self._parse(f.readline())
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            f.seek(max(0, end - 64 * 1024))
+            tail = f.read().splitlines()
+
+        last = None
+        for line in reversed(tail):
+            last = self._parse(line)
+            if last is not None:
+                break
+
+        first_ts = first.get("timestamp") if first else None
+        last_ts = last.get("timestamp") if last else None
+        return first_ts, last_ts
+
+    def _open_segment(self):
+        """Return the file handle for appends, rotating by size"""
+
+        current = self._segments[-1] if self._segments else None
+        if current is not None and current.size < self.segment_max_bytes:
+            if self._file is None:
+                self._file = open(current.path, "ab")
+            return current
+
+        if self._file is not None:
+            self._file.close()
+
+        number = self._segment_number(current.path) + 1 if current else 1
+        current = _Segment(self._segment_path(number))
+        self._segments.append(current)
+        self._file = open(current.path, "ab")
+
+        if self.max_segments is not None:
+            while len(self._segments) > self.max_segments:
+                expired = self._segments.pop(0)
+                os.remove(expired.path)
+                logger.info(f"🗑️ Rotated out history segment {os.path.basename(expired.path)}")
+
+        return current
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, entry: Dict):
+        """Record a generation"""
+
+        with self._lock:
+            self._recent.append(entry)
+            self.total_appended += 1
+
+            if not self.log_dir:
+                return
+
+            line = (json.dumps(entry, default=str) + "\n").encode("utf-8")
+            segment = self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+
+            timestamp = entry.get("timestamp")
+            if segment.first_ts is None:
+                segment.first_ts = timestamp
+            segment.last_ts = timestamp
+            segment.size += len(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        """Number of entries held in memory"""
+        return len(self._recent)
+
+    def __iter__(self):
+        """Iterate the in-memory entries, oldest first"""
+        with self._lock:
+            return iter(list(self._recent))
+
+    def _read_segment(self, segment: _Segment) -> List[Dict]:
+        with open(segment.path, "rb") as f:
+            entries = (self._parse(line) for line in f)
+            return [entry for entry in entries if entry is not None]
+
+    def _segments_snapshot(self) -> List[_Segment]:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            return list(self._segments)
+
+    def last(self, n: int) -> List[Dict]:
+        """The ``n`` most recent entries, oldest first"""
+
+        if n <= 0:
+            return []
+
+        with self._lock:
+            if n <= len(self._recent) or not self.log_dir:
+                return list(self._recent)[-n:]
+
+        # Walk segments newest first, holding at most one segment plus the result
+        collected = deque()
+        for segment in reversed(self._segments_snapshot()):
+            entries = self._read_segment(segment)
+            collected.extendleft(reversed(entries[-(n - len(collected)):]))
+            if len(collected) >= n:
+                break
+        return list(collected)
+
+    def between(self, start, end) -> Iterator[Dict]:
+        """Stream entries with ``start <= timestamp < end``, oldest first"""
+
+        start, end = _as_timestamp(start), _as_timestamp(end)
+
+        def in_range(entry):
+            timestamp = entry.get("timestamp")
+            return timestamp is not None and start <= timestamp < end
+
+        with self._lock:
+            recent = list(self._recent)
+
+        # Served from memory when the ring reaches back far enough
+        if not self.log_dir or (recent and recent[0].get("timestamp", end) <= start):
+            yield from filter(in_range, recent)
+            return
+
+        for segment in self._segments_snapshot():
+            if segment.last_ts is not None and segment.last_ts < start:
+                continue
+            if segment.first_ts is not None and segment.first_ts >= end:
+                break
+            yield from filter(in_range, self._read_segment(segment))
+
+    def iter_log(self) -> Iterator[Dict]:
+        """Stream every entry retained at the time of the call, oldest first
+
+        The extent of each segment is fixed when this is called, so entries
+        appended while the stream is read (e.g. from a background thread)
+        are left out rather than seen twice.
+        """
+
+        if not self.log_dir:
+            return iter(self)
+
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            extents = [(segment.path, segment.size) for segment in self._segments]
+        return self._read_extents(extents)
+
+    def _read_extents(self, extents) -> Iterator[Dict]:
+        for path, size in extents:
+            try:
+                with open(path, "rb") as f:
+                    lines = f.read(size).splitlines()
+            except FileNotFoundError:
+                continue  # rotated out since the call
+            for line in lines:
+                entry = self._parse(line)
+                if entry is not None:
+                    yield entry
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_memory": len(self._recent),
+                "capacity": self.capacity,
+                "total_appended": self.total_appended,
+                "log_segments": len(self._segments),
+                "log_bytes": sum(segment.size for segment in self._segments)
+            }
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+HURAII GENERATION JOBS
+Asynchronous job API with progress streaming, cancellation and timeouts
+Hardware: CPU (job bookkeeping only)
+"""
+
+import hmac
+import io
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Annotated, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED, TIMED_OUT)
+MAX_PROMPT_CHARS = 2000
+
+# Linear map from Stable Diffusion 1.x latent channels to RGB, good enough for previews
+LATENT_RGB_FACTORS = np.array([
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177]
+], dtype=np.float32)
+
+
+class JobCancelled(Exception):
+    """Raised from a progress callback once its job is cancelled or past its deadline"""
+
+
+def latents_to_preview(latents) -> Image.Image:
+    """Cheap low-res preview of one (4, h, w) latent without running the VAE"""
+
+    if hasattr(latents, "detach"):
+        latents = latents.detach().float().cpu().numpy()
+    rgb = np.einsum("chw,cr->hwr", np.asarray(latents, dtype=np.float32), LATENT_RGB_FACTORS)
+    pixels = np.clip((rgb + 1.0) * 127.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+class GenerationJob:
+    """State of one submitted generation"""
+
+    def __init__(self, job_id: str, params: Dict, timeout: float):
+        self.job_id = job_id
+        self.params = params
+        self.status = QUEUED
+        self.step = 0
+        self.total_steps = None
+        self.error = None
+        self.result = None
+        self.latents = None
+
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.deadline = time.monotonic() + timeout
+
+        self.cancel_requested = threading.Event()
+        self.version = 0  # bumped on every change, for streaming
+        self.changed = threading.Condition()
+
+    def touch(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def report_progress(self, step, total, latents=None):
+        """Per-step callback handed to the pipeline"""
+
+        if self.cancel_requested.is_set():
+            raise JobCancelled(self.job_id)
+        if time.monotonic() > self.deadline:
+            raise JobCancelled(f"{self.job_id} timed out")
+
+        self.step = step
+        self.total_steps = total
+        if latents is not None:
+            self.latents = latents
+        self.touch()
+
+    def snapshot(self) -> Dict:
+        progress = round(self.step / self.total_steps, 3) if self.total_steps else 0.0
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "step": self.step,
+            "total_steps": self.total_steps,
+            "progress": 1.0 if self.status == COMPLETED else progress,
+            "preview_available": self.latents is not None and self.status == RUNNING,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobManager:
+    """Run generations in the background and track them by job id
+
+    ``run_job(job, **params)`` does the work and is expected to pass
+    ``job.report_progress`` to the pipeline as its per-step callback. At most
+    ``max_queue`` jobs wait at once; further submissions are refused.
+    Requested timeouts are clamped to ``max_timeout``.
+    Finished jobs are kept for ``retention`` seconds so clients can fetch
+    their results.
+    """
+
+    def __init__(self, run_job: Callable, max_queue: int = 32, workers: int = 4,
+                 default_timeout: float = 120.0, retention: float = 3600.0,
+                 preview_fn: Callable = latents_to_preview, max_timeout: float = 600.0):
+        self.run_job = run_job
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.max_timeout = max(max_timeout, default_timeout)
+        self.retention = retention
+        self.preview_fn = preview_fn
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()  # job_id -> GenerationJob, in submission order
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "rejected": 0,
+            COMPLETED: 0,
+            FAILED: 0,
+            CANCELLED: 0,
+            TIMED_OUT: 0
+        }
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"huraii-job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ------------------------------------------------------------------
+    # Client API
+    # ------------------------------------------------------------------
+
+    def submit(self, timeout: Optional[float] = None, **params) -> Dict:
+        """Queue a generation; returns its job id right away"""
+
+        # Timeouts come from clients; an unbounded one would let a job hold a worker forever
+        timeout = float(timeout or self.default_timeout)
+        timeout = min(timeout, self.max_timeout) if timeout > 0 else self.default_timeout
+
+        self._expire_finished()
+        job = GenerationJob(uuid.uuid4().hex, params, timeout)
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.stats["rejected"] += 1
+                return {"error": "queue full", "queue_depth": self._queue.qsize()}
+            self._jobs[job.job_id] = job
+            self.stats["submitted"] += 1
+
+        return {"job_id": job.job_id, "status": QUEUED, "queue_depth": self._queue.qsize()}
+
+    def get_status(self, job_id: str) -> Dict:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {"error": "unknown job", "job_id": job_id}
+        return job.snapshot()
+
+    def get_result(self, job_id: str) -> Dict:
+        """The generate_art result of a completed job"""
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {"error": "unknown job", "job_id": job_id}
+        if job.status != COMPLETED:
+            return {"error": f"job is {job.status}", "job_id": job_id, "status": job.status}
+        return job.result
+
+    def get_preview(self, job_id: str):
+        """Low-res preview of a running job's latest step, or None"""
+
+        job = self._jobs.get(job_id)
+        if job is None or job.latents is None or self.preview_fn is None:
+            return None
+        return self.preview_fn(job.latents)
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a queued or running job to stop"""
+
+        job = self._jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return False
+
+        # A running job notices at its next step; a queued one is finished here
+        job.cancel_requested.set()
+        with self._lock:
+            queued = job.status == QUEUED
+        if queued:
+            self._finish(job, CANCELLED)
+        return True
+
+    def stream(self, job_id: str, heartbeat: float = 15.0) -> Iterator[Dict]:
+        """Yield the job's status every time it changes, until it finishes"""
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            yield {"error": "unknown job", "job_id": job_id}
+            return
+
+        seen = -1
+        while True:
+            with job.changed:
+                if job.version == seen:
+                    job.changed.wait(timeout=heartbeat)
+                seen = job.version
+            snapshot = job.snapshot()
+            yield snapshot
+            if snapshot["status"] in TERMINAL_STATES:
+                return
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tracked_jobs"] = len(self._jobs)
+            stats["running"] = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_queue"] = self.max_queue
+        return stats
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _finish(self, job: GenerationJob, status: str, error: Optional[str] = None):
+        with self._lock:
+            if job.status in TERMINAL_STATES:
+                return
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            job.latents = None
+            self.stats[status] += 1
+        job.touch()
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: GenerationJob):
+        if time.monotonic() > job.deadline:
+            self._finish(job, TIMED_OUT, "timed out while queued")
+            return
+
+        with self._lock:
+            if job.status in TERMINAL_STATES:
+                return  # cancelled while queued
+            job.status = RUNNING
+            job.started_at = time.time()
+        job.touch()
+
+        try:
+            result = self.run_job(job, **job.params)
+        except Exception as e:
+            result = {"error": str(e)}
+
+        if job.cancel_requested.is_set():
+            self._finish(job, CANCELLED)
+        elif time.monotonic() > job.deadline:
+            self._finish(job, TIMED_OUT, "timed out while running")
+        elif "error" in result:
+            self._finish(job, FAILED, result["error"])
+        else:
+            job.result = result
+            self._finish(job, COMPLETED)
+
+    def _expire_finished(self):
+        """Forget finished jobs older than the retention window"""
+
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.status in TERMINAL_STATES and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+def load_api_keys(path: str) -> List[str]:
+    """One key per line; blank lines and ``#`` comments are skipped"""
+
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def job_request_model(styles: Sequence[str] = (), max_timeout: float = 600.0, max_output_side: int = 8192):
+    """Pydantic model of a POST /jobs body: typed, bounded, and closed to unknown keys"""
+
+    from typing import Literal, Tuple
+
+    from pydantic import BaseModel, ConfigDict, Field
+
+    Style = Literal[tuple(styles)] if styles else Annotated[str, Field(max_length=64)]
+    Side = Annotated[int, Field(ge=1, le=max_output_side)]
+
+    class JobRequest(BaseModel):
+        model_config = ConfigDict(extra="forbid")
+
+        prompt: str = Field(..., min_length=1, max_length=MAX_PROMPT_CHARS)
+        style: Style = "photorealistic"
+        quality: Literal["standard", "high"] = "high"
+        seed: Optional[int] = Field(None, ge=0, le=2**32 - 1)
+        timeout: Optional[float] = Field(None, gt=0, le=max_timeout, allow_inf_nan=False)
+        output_size: Optional[Tuple[Side, Side]] = None
+
+    return JobRequest
+
+
+def mount_job_routes(app, manager: JobManager, prefix: str = "/jobs", premium_keys: Sequence[str] = (),
+                     styles: Sequence[str] = (), max_output_side: int = 8192):
+    """Expose a JobManager over HTTP on a FastAPI app (e.g. Gradio's)
+
+    Bodies are validated against ``job_request_model``, so a malformed or
+    unknown field is a 422 rather than an error inside the job. Premium
+    quality is never taken from the request body: a job is premium only
+    when its ``X-API-Key`` header matches one of ``premium_keys``.
+    """
+
+    from fastapi import HTTPException, Request
+    from fastapi.responses import Response, StreamingResponse
+
+    premium_keys = [key.encode("utf-8") for key in premium_keys]
+    JobRequest = job_request_model(styles, manager.max_timeout, max_output_side)
+
+    def _is_premium(request) -> bool:
+        presented = request.headers.get("x-api-key", "").encode("utf-8")
+        # Compare against every key in constant time so timing reveals nothing
+        matches = [hmac.compare_digest(presented, key) for key in premium_keys]
+        return bool(presented) and any(matches)
+
+    def _status_or_404(job_id):
+        status = manager.get_status(job_id)
+        if "error" in status:
+            raise HTTPException(status_code=404, detail=status["error"])
+        return status
+
+    def _png(image):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return Response(content=buffer.getvalue(), media_type="image/png")
+
+    @app.post(prefix)
+    def submit_job(body: JobRequest, request: Request):
+        submitted = manager.submit(premium=_is_premium(request), **body.model_dump(exclude_none=True))
+        if "error" in submitted:
+            raise HTTPException(status_code=429, detail=submitted["error"])
+        return submitted
+
+    @app.get(prefix + "/{job_id}")
+    def job_status(job_id: str):
+        return _status_or_404(job_id)
+
+    @app.get(prefix + "/{job_id}/events")
+    def job_events(job_id: str):
+        _status_or_404(job_id)
+        events = (f"data: {json.dumps(update)}\n\n" for update in manager.stream(job_id))
+        return StreamingResponse(events, media_type="text/event-stream")
+
+    @app.get(prefix + "/{job_id}/preview")
+    def job_preview(job_id: str):
+        _status_or_404(job_id)
+        preview = manager.get_preview(job_id)
+        if preview is None:
+            raise HTTPException(status_code=404, detail="no preview available")
+        return _png(preview)
+
+    @app.get(prefix + "/{job_id}/result")
+    def job_result(job_id: str):
+        result = manager.get_result(job_id)
+        if "error" in result:
+            raise HTTPException(status_code=409, detail=result["error"])
+        return {key: value for key, value in result.items() if key != "image"}
+
+    @app.get(prefix + "/{job_id}/image")
+    def job_image(job_id: str):
+        result = manager.get_result(job_id)
+        if "error" in result:
+            raise HTTPException(status_code=409, detail=result["error"])
+        return _png(result["image"])
+
+    @app.delete(prefix + "/{job_id}")
+    def cancel_job(job_id: str):
+        _status_or_404(job_id)
+        return {"job_id": job_id, "cancelled": manager.cancel(job_id)}
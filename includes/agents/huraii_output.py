@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+HURAII OUTPUT PIPELINE
+Archival files and compressed WebP/JPEG thumbnails for generated art
+Hardware: CPU (process pool)
+"""
+
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# max_size bounds the longer edge (None keeps full resolution); options go to Image.save
+Rendition = namedtuple("Rendition", ["name", "format", "max_size", "options"])
+
+DEFAULT_RENDITIONS = [
+    Rendition("archival", "PNG", None, {"compress_level": 6}),
+    Rendition("large", "WEBP", 512, {"quality": 85, "method": 4}),
+    Rendition("medium", "WEBP", 256, {"quality": 80, "method": 4}),
+    Rendition("small", "JPEG", 128, {"quality": 80, "optimize": True, "progressive": True})
+]
+
+MEDIA_TYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+EXTENSIONS = {"PNG": "png", "WEBP": "webp", "JPEG": "jpg"}
+
+# Output ids are sha256 hex digests; anything else never reaches the filesystem
+OUTPUT_ID = re.compile(r"[0-9a-f]{64}")
+
+
+def valid_output_id(output_id: str) -> bool:
+    return isinstance(output_id, str) and OUTPUT_ID.fullmatch(output_id) is not None
+
+
+def parse_renditions(spec: str) -> List[Rendition]:
+    """Parse ``name:format[:max_size[:quality]]`` entries separated by commas
+
+    e.g. ``"archival:png,large:webp:512:85,small:jpeg:128:80"``
+    """
+
+    renditions = []
+    for entry in spec.split(","):
+        parts = entry.strip().split(":")
+        if len(parts) < 2:
+            raise ValueError(f"Bad rendition '{entry}', expected name:format[:max_size[:quality]]")
+        name, fmt = parts[0], parts[1].upper().replace("JPG", "JPEG")
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported rendition format: {parts[1]}")
+        max_size = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        options = {"quality": int(parts[3])} if len(parts) > 3 else {}
+        renditions.append(Rendition(name, fmt, max_size, options))
+    return renditions
+
+
+def encode_renditions(image: Image.Image, renditions: List[Rendition]) -> Dict:
+    """Encode one image into every rendition; runs inside the process pool
+
+    Returns {name: {"format", "width", "height", "data"}}. Thumbnails are
+    downscaled from the largest one already made, which keeps Lanczos cheap.
+    """
+
+    encoded = {}
+    source = image.convert("RGB") if image.mode not in ("RGB", "RGBA", "L") else image
+    for rendition in sorted(renditions, key=lambda r: -(r.max_size or 1 << 30)):
+        scaled = source
+        if rendition.max_size and max(source.size) > rendition.max_size:
+            scaled = source.copy()
+            scaled.thumbnail((rendition.max_size, rendition.max_size), Image.LANCZOS)
+            source = scaled
+        if rendition.format == "JPEG" and scaled.mode != "RGB":
+            scaled = scaled.convert("RGB")
+
+        buffer = io.BytesIO()
+        scaled.save(buffer, format=rendition.format, **rendition.options)
+        encoded[rendition.name] = {
+            "format": rendition.format,
+            "width": scaled.size[0],
+            "height": scaled.size[1],
+            "data": buffer.getvalue()
+        }
+    return encoded
+
+
+def describe_renditions(encoded: Dict) -> Dict:
+    """Rendition summary without the bytes, for generation records"""
+    return {
+        name: {"format": r["format"], "width": r["width"], "height": r["height"], "bytes": len(r["data"])}
+        for name, r in encoded.items()
+    }
+
+
+class OutputEncoder:
+    """Encode generated images into their renditions on a process pool
+
+    Encoding is CPU-bound, so it runs in ``workers`` spawned processes and
+    stays clear of the engine's batching and request threads;
+    ``workers=0`` encodes inline.
+    """
+
+    def __init__(self, renditions: Optional[List[Rendition]] = None, workers: int = 2):
+        self.renditions = list(renditions or DEFAULT_RENDITIONS)
+        self.workers = workers
+
+        # spawn, not fork: the engine already runs batching and job threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) if workers > 0 else None
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "images_encoded": 0,
+            "encode_seconds": 0.0,
+            "raw_bytes": 0,
+            "encoded_bytes": Counter()
+        }
+
+    def submit(self, image: Image.Image) -> Future:
+        """Start encoding; the future resolves to encode_renditions' result"""
+
+        start = time.monotonic()
+        if self._pool is None:
+            future = Future()
+            try:
+                future.set_result(encode_renditions(image, self.renditions))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self._pool.submit(encode_renditions, image, self.renditions)
+
+        raw_bytes = image.size[0] * image.size[1] * len(image.getbands())
+        future.add_done_callback(lambda f: self._record(f, start, raw_bytes))
+        return future
+
+    def encode(self, image: Image.Image) -> Dict:
+        return self.submit(image).result()
+
+    def _record(self, future: Future, start: float, raw_bytes: int):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            self.stats["images_encoded"] += 1
+            self.stats["encode_seconds"] += time.monotonic() - start
+            self.stats["raw_bytes"] += raw_bytes
+            for name, rendition in future.result().items():
+                self.stats["encoded_bytes"][name] += len(rendition["data"])
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            count = self.stats["images_encoded"]
+            raw = self.stats["raw_bytes"]
+            encoded = dict(self.stats["encoded_bytes"])
+            return {
+                "workers": self.workers,
+                "renditions": [r.name for r in self.renditions],
+                "images_encoded": count,
+                "encode_ms_avg": round(self.stats["encode_seconds"] / count * 1000, 2) if count else 0.0,
+                "bytes_per_image": {name: total // count for name, total in encoded.items()} if count else {},
+                "compression_ratio": {name: round(raw / total, 1) for name, total in encoded.items() if total}
+            }
+
+
+class RenditionStore:
+    """Encoded renditions keyed by generation, so galleries never re-encode
+
+    Recently used renditions stay in memory up to ``memory_bytes``. With
+    ``disk_dir`` set they are also written to
+    ``<disk_dir>/<id[:2]>/<id>/<name>.<ext>``; the disk copy is the archive
+    and is not evicted.
+    """
+
+    def __init__(self, memory_bytes: int = 256 * 1024**2, disk_dir: Optional[str] = None):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+
+        self._memory = OrderedDict()  # output_id -> {name: rendition}
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _dir(self, output_id: str) -> str:
+        return os.path.join(self.disk_dir, output_id[:2], output_id)
+
+    @staticmethod
+    def _size(encoded: Dict) -> int:
+        return sum(len(r["data"]) for r in encoded.values())
+
+    def put(self, output_id: str, encoded: Dict):
+        if not valid_output_id(output_id):
+            raise ValueError("output_id must be 64 lowercase hex characters")
+        with self._lock:
+            self._remember(output_id, encoded)
+            self.stats["stored"] += 1
+
+        if self.disk_dir:
+            directory = self._dir(output_id)
+            os.makedirs(directory, exist_ok=True)
+            for name, rendition in encoded.items():
+                path = os.path.join(directory, f"{name}.{EXTENSIONS[rendition['format']]}")
+                try:
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(rendition["data"])
+                    os.replace(path + ".tmp", path)
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not write rendition {output_id[:12]}/{name}: {e}")
+
+    def _remember(self, output_id: str, encoded: Dict):
+        """Insert into the memory tier (caller holds the lock)"""
+
+        if output_id in self._memory:
+            self._memory_used -= self._size(self._memory.pop(output_id))
+        self._memory[output_id] = encoded
+        self._memory_used += self._size(encoded)
+        while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= self._size(evicted)
+
+    def _read_disk(self, output_id: str) -> Optional[Dict]:
+        directory = self._dir(output_id)
+        if not os.path.isdir(directory):
+            return None
+
+        formats = {ext: fmt for fmt, ext in EXTENSIONS.items()}
+        encoded = {}
+        for filename in os.listdir(directory):
+            name, _, ext = filename.rpartition(".")
+            if ext not in formats:
+                continue
+            with open(os.path.join(directory, filename), "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as probe:
+                width, height = probe.size
+            encoded[name] = {"format": formats[ext], "width": width, "height": height, "data": data}
+        return encoded or None
+
+    def get(self, output_id: str) -> Optional[Dict]:
+        """All renditions of a generation, or None"""
+
+        if not valid_output_id(output_id):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            if output_id in self._memory:
+                self._memory.move_to_end(output_id)
+                self.stats["memory_hits"] += 1
+                return self._memory[output_id]
+
+        encoded = self._read_disk(output_id) if self.disk_dir else None
+        with self._lock:
+            if encoded is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(output_id, encoded)
+        return encoded
+
+    def get_rendition(self, output_id: str, name: str):
+        """(bytes, media type) of one rendition, or None"""
+
+        encoded = self.get(output_id)
+        if encoded is None or name not in encoded:
+            return None
+        rendition = encoded[name]
+        return rendition["data"], MEDIA_TYPES[rendition["format"]]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._memory)
+            stats["memory_mb"] = round(self._memory_used / 1024**2, 2)
+        return stats
+
+
+def mount_output_routes(app, store: RenditionStore, prefix: str = "/outputs"):
+    """Serve stored renditions over HTTP on a FastAPI app"""
+
+    from fastapi import HTTPException
+    from fastapi.responses import Response
+
+    @app.get(prefix + "/{output_id}")
+    def list_renditions(output_id: str):
+        encoded = store.get(output_id)
+        if encoded is None:
+            raise HTTPException(status_code=404, detail="unknown output")
+        return describe_renditions(encoded)
+
+    @app.get(prefix + "/{output_id}/{name}")
+    def get_rendition(output_id: str, name: str):
+        found = store.get_rendition(output_id, name)
+        if found is None:
+            raise HTTPException(status_code=404, detail="unknown rendition")
+        data, media_type = found
+        # Renditions never change once written
+        return Response(content=data, media_type=media_type,
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+def benchmark_encoding(count: int = 16, size: int = 512, workers: int = 4) -> Dict:
+    """Compare the raw PNG the UI used to send with the encoded renditions"""
+
+    from huraii_stub_pipeline import StubDiffusionPipeline
+
+    # Upscaled noise compresses like smooth artwork; raw stub noise would not compress at all
+    images = [
+        image.resize((size, size), Image.BICUBIC)
+        for image in StubDiffusionPipeline(step_time=0.0)(
+            [f"benchmark {i}" for i in range(count)],
+            generator=list(range(count)),
+            num_inference_steps=1, width=32, height=32
+        ).images
+    ]
+
+    start = time.perf_counter()
+    png_bytes = 0
+    for image in images:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=0)
+        png_bytes += buffer.tell()
+    png_time = time.perf_counter() - start
+
+    results = {"uncompressed_png_kb": round(png_bytes / count / 1024, 1), "png_seconds": round(png_time, 3)}
+    for pool_size in sorted({0, workers}):
+        encoder = OutputEncoder(workers=pool_size)
+        if pool_size:
+            encoder.encode(images[0])  # start the worker processes outside the timing
+        start = time.perf_counter()
+        encoded = [future.result() for future in [encoder.submit(image) for image in images]]
+        results[f"encode_seconds_workers_{pool_size}"] = round(time.perf_counter() - start, 3)
+        encoder.shutdown()
+
+    results["rendition_kb"] = {
+        name: round(sum(len(e[name]["data"]) for e in encoded) / count / 1024, 1)
+        for name in encoded[0]
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII Output Encoding Benchmark")
+    parser.add_argument("--count", type=int, default=16, help="Images to encode")
+    parser.add_argument("--size", type=int, default=512, help="Image width and height")
+    parser.add_argument("--workers", type=int, default=4, help="Encoder processes")
+    args = parser.parse_args()
+
+    for key, value in benchmark_encoding(args.count, args.size, args.workers).items():
+        logger.info(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
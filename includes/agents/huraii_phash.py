@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+HURAII PERCEPTUAL HASH INDEX
+64-bit DCT perceptual hashes and a multi-index hash table for near-duplicate lookup
+Hardware: CPU
+"""
+
+import argparse
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 low-frequency DCT coefficients -> 64-bit hash
+DCT_SIZE = 32  # images are reduced to 32x32 gray before the DCT
+
+CHUNK_BITS = 16
+NUM_CHUNKS = 64 // CHUNK_BITS
+MAX_CHUNK_RADIUS = 2  # probes per chunk grow as C(16, r); radius 2 keeps it at 137
+
+
+def _area_matrix(size: int, out: int) -> np.ndarray:
+    """(out, size) matrix whose rows average the input pixels each output pixel covers"""
+
+    edges = np.linspace(0, size, out + 1)
+    positions = np.arange(size + 1)
+    # Overlap of [edge_i, edge_i+1) with pixel [p, p+1), normalized per row
+    lo = np.maximum(edges[:-1, None], positions[None, :-1])
+    hi = np.minimum(edges[1:, None], positions[None, 1:])
+    weights = np.clip(hi - lo, 0, None)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix"""
+
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_PROJECTIONS = {}
+
+
+def _projection(size: int) -> np.ndarray:
+    """Area downscale to DCT_SIZE followed by the first HASH_SIZE DCT rows, as one matrix"""
+
+    if size not in _PROJECTIONS:
+        low_rows = _dct_matrix(DCT_SIZE)[:HASH_SIZE]
+        _PROJECTIONS[size] = (low_rows @ _area_matrix(size, DCT_SIZE)).astype(np.float32)
+    return _PROJECTIONS[size]
+
+
+def phash_batch(images) -> np.ndarray:
+    """64-bit perceptual hashes of an (N, H, W, 3) or (N, H, W) uint8 stack
+
+    The usual pHash (gray, 32x32 area downscale, 2-D DCT, low 8x8 block
+    thresholded at its median) collapses to two small matmuls per image,
+    because downscale and DCT are both linear and only 8 DCT rows are kept.
+    """
+
+    stack = np.asarray(images)
+    if stack.ndim == 3 and stack.shape[-1] == 3:
+        stack = stack[np.newaxis]
+    if stack.ndim == 4:
+        gray = stack[..., 0].astype(np.float32)
+        gray += stack[..., 1]
+        gray += stack[..., 2]
+        gray /= 3.0
+    elif stack.ndim == 3:
+        gray = stack.astype(np.float32)
+    else:
+        raise ValueError(f"expected an (N, H, W[, 3]) stack, got shape {stack.shape}")
+
+    _, height, width = gray.shape
+    coeffs = _projection(height) @ gray @ _projection(width).T  # (N, 8, 8)
+    flat = coeffs.reshape(len(coeffs), -1)
+
+    # Median over the AC terms; the DC term only tracks overall brightness
+    median = np.median(flat[:, 1:], axis=1, keepdims=True)
+    bits = flat > median
+    weights = np.uint64(1) << np.arange(63, -1, -1, dtype=np.uint64)
+    return (bits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+def hash_to_hex(code) -> str:
+    return f"{int(code):016x}"
+
+
+def hex_to_hash(text: str) -> np.uint64:
+    return np.uint64(int(text, 16))
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        as_bytes = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8).reshape(-1, 8)
+        return _BYTE_POPCOUNT[as_bytes].sum(axis=1, dtype=np.uint8).reshape(np.shape(values))
+
+
+def _flip_masks(radius: int) -> np.ndarray:
+    """Every CHUNK_BITS-bit mask with at most ``radius`` bits set"""
+
+    values = np.arange(1 << CHUNK_BITS, dtype=np.uint64)
+    return values[popcount(values) <= radius].astype(np.int64)
+
+
+_FLIP_MASKS = [_flip_masks(r) for r in range(MAX_CHUNK_RADIUS + 1)]
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for each pair, without a Python loop"""
+
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class PerceptualHashIndex:
+    """Multi-index hash table over 64-bit perceptual hashes
+
+    Each hash is split into four 16-bit chunks with one bucket table per
+    chunk. By pigeonhole, two hashes within Hamming distance ``d`` agree to
+    within ``d // 4`` bits on at least one chunk, so a query probes only the
+    buckets of chunk values that close and checks the candidates with a
+    vectorized popcount. Bucket tables are CSR arrays (offsets + positions)
+    rebuilt in bulk; incremental inserts go to a small unsorted tail that is
+    scanned linearly and folded into the tables once it outgrows
+    ``merge_threshold`` (or an eighth of the index).
+    """
+
+    MAX_DISTANCE = NUM_CHUNKS * (MAX_CHUNK_RADIUS + 1) - 1
+
+    def __init__(self, merge_threshold: int = 4096):
+        self.merge_threshold = merge_threshold
+
+        self._codes = np.empty(0, dtype=np.uint64)
+        self._ids: List = []
+        self._indexed = 0  # codes[:indexed] are in the bucket tables
+        self._offsets = []  # per chunk: bucket start positions, length 2**CHUNK_BITS + 1
+        self._order = []  # per chunk: code positions grouped by bucket
+        self._tail = []  # codes added since the last merge
+        self._lock = threading.RLock()
+        self.stats = {"queries": 0, "candidates_checked": 0, "merges": 0}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _chunks(codes: np.ndarray) -> List[np.ndarray]:
+        mask = np.uint64((1 << CHUNK_BITS) - 1)
+        return [
+            ((codes >> np.uint64(CHUNK_BITS * j)) & mask).astype(np.int64)
+            for j in range(NUM_CHUNKS)
+        ]
+
+    def _rebuild(self):
+        """Fold the tail into the bucket tables (caller holds the lock)"""
+
+        if self._tail:
+            self._codes = np.concatenate([self._codes, np.array(self._tail, dtype=np.uint64)])
+            self._tail = []
+        self._offsets, self._order = [], []
+        for chunk in self._chunks(self._codes):
+            counts = np.bincount(chunk, minlength=1 << CHUNK_BITS)
+            self._offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+            self._order.append(np.argsort(chunk, kind="stable").astype(np.int32))
+        self._indexed = len(self._codes)
+        self.stats["merges"] += 1
+
+    def add(self, code, item_id):
+        """Insert one hash; visible to queries immediately"""
+
+        with self._lock:
+            self._tail.append(int(code))
+            self._ids.append(item_id)
+            if len(self._tail) >= max(self.merge_threshold, self._indexed // 8):
+                self._rebuild()
+
+    def add_many(self, codes: Iterable, item_ids: Iterable):
+        """Bulk insert, then rebuild the tables once"""
+
+        codes = np.asarray(list(codes) if not isinstance(codes, np.ndarray) else codes, dtype=np.uint64)
+        item_ids = list(item_ids)
+        if len(codes) != len(item_ids):
+            raise ValueError("codes and item_ids must have the same length")
+        with self._lock:
+            self._codes = np.concatenate([self._codes, np.array(self._tail, dtype=np.uint64), codes])
+            self._tail = []
+            self._ids.extend(item_ids)
+            self._rebuild()
+
+    def query(self, code, max_distance: int = 6, limit: Optional[int] = None) -> List[Tuple]:
+        """(item_id, distance) of every stored hash within ``max_distance``, closest first"""
+
+        if not 0 <= max_distance <= self.MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {self.MAX_DISTANCE}")
+
+        query = np.uint64(code)
+        radius = max_distance // NUM_CHUNKS
+        with self._lock:
+            codes, indexed = self._codes, self._indexed
+            offsets, order = self._offsets, self._order
+            tail = np.array(self._tail, dtype=np.uint64)
+            ids = self._ids
+
+        candidates = [np.arange(indexed, indexed + len(tail))]
+        if indexed:
+            for j, value in enumerate(self._chunks(np.array([query]))):
+                probes = _FLIP_MASKS[radius] ^ value[0]
+                positions = _ranges(offsets[j][probes], offsets[j][probes + 1])
+                candidates.append(order[j][positions])
+        candidates = np.unique(np.concatenate(candidates))
+
+        stored = np.concatenate([codes[:indexed], tail]) if len(tail) else codes
+        distances = popcount(stored[candidates] ^ query).astype(np.int64)
+        keep = distances <= max_distance
+        candidates, distances = candidates[keep], distances[keep]
+        ranked = np.lexsort((candidates, distances))[:limit]
+
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["candidates_checked"] += int(keep.size)
+        return [(ids[i], int(d)) for i, d in zip(candidates[ranked], distances[ranked])]
+
+    def add_log(self, entries: Iterable[Dict]) -> int:
+        """Bulk insert generation log entries carrying ``phash`` and ``output_id``
+
+        Cache hits and coalesced runs repeat an image that is logged once
+        already, so they are skipped, as they are when added live.
+        """
+
+        codes, ids = [], []
+        for entry in entries:
+            repeat = entry.get("cache_hit") or entry.get("coalesced")
+            if entry.get("phash") and entry.get("output_id") and not repeat:
+                codes.append(int(entry["phash"], 16))
+                ids.append(entry["output_id"])
+        if codes:
+            self.add_many(np.array(codes, dtype=np.uint64), ids)
+        return len(codes)
+
+    @classmethod
+    def from_log(cls, entries: Iterable[Dict], **kwargs) -> "PerceptualHashIndex":
+        """Bulk build from generation log entries"""
+
+        index = cls(**kwargs)
+        index.add_log(entries)
+        return index
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._ids)
+            stats["unmerged"] = len(self._tail)
+        stats["avg_candidates"] = round(stats["candidates_checked"] / stats["queries"], 1) if stats["queries"] else 0.0
+        return stats
+
+
+def benchmark_index(size: int = 1_000_000, queries: int = 1000, distances=(2, 4, 6, 8), seed: int = 0) -> Dict:
+    """Bulk build and query latency against a linear popcount scan
+
+    Uniform random hashes spread evenly over the buckets; real pHashes
+    cluster somewhat, which raises candidate counts.
+    """
+
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+
+    start = time.perf_counter()
+    index = PerceptualHashIndex()
+    index.add_many(codes, range(size))
+    report = {"entries": size, "build_seconds": round(time.perf_counter() - start, 2)}
+
+    # Queries are stored hashes with a few bits flipped, so each has a true match
+    targets = rng.integers(0, size, size=queries)
+    for distance in distances:
+        latencies = []
+        for target in targets:
+            flips = rng.choice(64, size=distance // 2, replace=False)
+            query = codes[target] ^ np.uint64(sum(1 << int(b) for b in flips))
+            start = time.perf_counter()
+            found = index.query(query, max_distance=distance)
+            latencies.append(time.perf_counter() - start)
+            assert any(item == target for item, _ in found)
+        latencies.sort()
+        report[f"d{distance}_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 3)
+        report[f"d{distance}_p99_ms"] = round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+
+    start = time.perf_counter()
+    for target in targets[:20]:
+        np.flatnonzero(popcount(codes ^ codes[target]) <= distances[-1])
+    report["linear_scan_ms"] = round((time.perf_counter() - start) / 20 * 1000, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII perceptual hash index benchmark")
+    parser.add_argument("--size", type=int, default=1_000_000, help="Hashes in the index")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per distance")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"🔍 pHash index benchmark: {benchmark_index(args.size, args.queries)}")
+
+
+if __name__ == "__main__":
+    main()
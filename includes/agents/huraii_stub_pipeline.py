@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+HURAII STUB PIPELINE
+CPU stand-in for StableDiffusionPipeline used by tests and benchmarks
+Hardware: CPU
+"""
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+
+class StubDiffusionPipeline:
+    """Mimics the StableDiffusionPipeline call signature without loading a model
+
+    Each call sleeps ``step_time`` per inference step. A batch costs
+    ``1 + batch_overhead * (n - 1)`` times a single prompt, which models the
+    way a real GPU amortizes work across a batch. Images are deterministic for
+    a given prompt and seed. Called with ``image`` (img2img), it returns the
+    input images unchanged, so tiling tests can check how tiles are stitched.
+    ``prompt_embeds`` from ``encode_prompt`` give the same images as the
+    prompts they were encoded from.
+    """
+
+    def __init__(self, step_time: float = 0.001, batch_overhead: float = 0.25):
+        self.step_time = step_time
+        self.batch_overhead = batch_overhead
+        self.calls = []  # batch size of every call, in order
+        self.encoded = []  # every prompt passed to encode_prompt
+
+    @staticmethod
+    def _seed_of(generator):
+        if generator is None:
+            return None
+        if hasattr(generator, "initial_seed"):
+            return generator.initial_seed()
+        return int(generator)
+
+    def encode_prompt(self, prompt, device=None, num_images_per_prompt=1,
+                      do_classifier_free_guidance=False, **kwargs):
+        """(prompt_embeds, None) like the diffusers method; the text is recoverable from the embedding"""
+
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        self.encoded.extend(prompts)
+        embeds = np.zeros((len(prompts), 77, 8), dtype=np.float32)
+        embeds[:, 0, 0] = [sum(map(ord, text)) for text in prompts]
+        return embeds, None
+
+    def __call__(self, prompt=None, num_inference_steps=50, guidance_scale=7.5,
+                 width=512, height=512, generator=None, return_dict=True,
+                 callback_on_step_end=None, image=None, prompt_embeds=None, **kwargs):
+        if prompt_embeds is not None:
+            # Stand-in "text" whose character sum matches the encoded prompt's
+            prompt = [chr(int(embed[0, 0])) for embed in prompt_embeds]
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        if image is not None:
+            image = image if isinstance(image, list) else [image] * len(prompts)
+            width, height = image[0].size
+        generators = generator if isinstance(generator, list) else [generator] * len(prompts)
+        self.calls.append(len(prompts))
+
+        # Stand-in latents so per-step callbacks and previews have something to look at
+        latents = np.zeros((len(prompts), 4, height // 8, width // 8), dtype=np.float32)
+
+        self._interrupt = False
+        step_sleep = self.step_time * (1 + self.batch_overhead * (len(prompts) - 1))
+        for step in range(num_inference_steps):
+            if self._interrupt:
+                break
+            time.sleep(step_sleep)
+            latents += 1.0 / num_inference_steps
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, step, num_inference_steps - step, {"latents": latents})
+
+        if image is not None:
+            images = [source.copy() for source in image]
+            return SimpleNamespace(images=images) if return_dict else (images,)
+
+        images = []
+        for text, gen in zip(prompts, generators):
+            seed = self._seed_of(gen)
+            if seed is None:
+                seed = np.random.randint(0, 2**31)
+            seed = (seed + sum(map(ord, text))) % 2**32
+            rng = np.random.default_rng(seed)
+            pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+            images.append(Image.fromarray(pixels, "RGB"))
+
+        if not return_dict:
+            return (images,)
+        return SimpleNamespace(images=images)
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+HURAII TELEMETRY
+Background sampling of device memory, host memory, queue depth and stage timings
+Hardware: GPU (allocator stats when CUDA is up), CPU (everything else)
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "huraii_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Prometheus HELP text for the gauges the engine reports
+GAUGE_HELP = {
+    "host_rss_bytes": "Resident memory of the process",
+    "queue_depth": "Requests waiting for a batch slot",
+    "job_queue_depth": "Async jobs waiting for a worker",
+    "ready": "1 once models are loaded",
+    "ready_workers": "Device pool workers ready to take requests",
+    "device_memory_allocated_bytes": "Memory held by tensors on the device",
+    "device_memory_reserved_bytes": "Memory reserved by the CUDA caching allocator",
+    "device_memory_peak_bytes": "Peak tensor memory since the process started"
+}
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def series(name: str, **labels) -> str:
+    """Series key in Prometheus notation, e.g. ``name{device="cuda:0"}``"""
+
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+def process_rss(pid: Optional[int] = None) -> Optional[int]:
+    """Current resident set size of a process in bytes (None if it cannot be read)"""
+
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        if pid is not None or resource is None:
+            return None
+        # No procfs (macOS): the peak is the closest figure getrusage has; kB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Highest allocator peak seen per device, kept across reset_peak_memory_stats calls
+_device_peaks: Dict[str, int] = {}
+_device_peaks_lock = threading.Lock()
+
+
+def _device_key(torch, device) -> str:
+    device = torch.device(device)
+    return f"cuda:{torch.cuda.current_device() if device.index is None else device.index}"
+
+
+def note_device_peak(device=None) -> int:
+    """Fold the allocator's current peak into the process-wide one and return that
+
+    Call before ``torch.cuda.reset_peak_memory_stats`` so the telemetry peak
+    gauge does not lose what the reset clears.
+    """
+
+    torch = sys.modules["torch"]
+    key = _device_key(torch, "cuda" if device is None else device)
+    peak = torch.cuda.max_memory_allocated(key)
+    with _device_peaks_lock:
+        _device_peaks[key] = max(_device_peaks.get(key, 0), peak)
+        return _device_peaks[key]
+
+
+def device_memory(device) -> Optional[Dict[str, int]]:
+    """Allocator stats for a CUDA device; None without torch, CUDA or a CUDA device
+
+    Never imports torch itself, so sampling cannot stall on a cold import.
+    """
+
+    torch = sys.modules.get("torch")
+    if device is None or not str(device).startswith("cuda") or torch is None or not torch.cuda.is_available():
+        return None
+    return {
+        "allocated": torch.cuda.memory_allocated(device),
+        "reserved": torch.cuda.memory_reserved(device),
+        "peak": note_device_peak(device)
+    }
+
+
+class RingBuffer:
+    """Fixed-size float64 history; once full, each append overwrites the oldest value"""
+
+    def __init__(self, capacity: int, start: int = 0):
+        self.capacity = capacity
+        self.data = np.full(capacity, np.nan)
+        self.count = start  # values ever appended; earlier slots stay NaN
+
+    def append(self, value: float):
+        self.data[self.count % self.capacity] = value
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        """Retained values, oldest first"""
+
+        if self.count <= self.capacity:
+            return self.data[:self.count].copy()
+        head = self.count % self.capacity
+        return np.concatenate((self.data[head:], self.data[:head]))
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+
+class TelemetrySampler:
+    """Sample gauges on a background thread into ring buffers
+
+    ``collect()`` returns ``{series: value}`` (see ``series``) and is called
+    every ``interval`` seconds; the host RSS of this process is added to
+    each sample. Every series keeps its last ``capacity`` samples, aligned
+    with the sample timestamps (NaN where a series was missing).
+    ``record_stages`` takes per-generation stage timings; each stage keeps
+    its last ``stage_capacity`` durations plus running totals.
+
+    Sampling cost is timed. When a sample takes more than ``max_overhead``
+    of the interval, the interval is stretched so the sampler never uses
+    more than that share of a core.
+    """
+
+    def __init__(self, collect: Optional[Callable[[], Dict[str, float]]] = None, interval: float = 1.0,
+                 capacity: int = 600, stage_capacity: int = 2048, max_overhead: float = 0.01):
+        self.collect = collect
+        self.interval = interval
+        self.capacity = capacity
+        self.stage_capacity = stage_capacity
+        self.max_overhead = max_overhead
+
+        self._times = RingBuffer(capacity)
+        self._series = {}  # series key -> RingBuffer
+        self._stages = {}  # stage -> [RingBuffer, count, sum]
+        self._lock = threading.Lock()
+
+        self._samples = 0
+        self._sample_seconds = 0.0
+        self._sample_max = 0.0
+        self._collect_errors = 0
+        self._effective_interval = interval
+        self._started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="huraii-telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            cost = self.sample()
+            # Back off when a sample costs more than its share of the interval
+            self._effective_interval = max(self.interval, cost / self.max_overhead)
+            self._stop.wait(self._effective_interval - cost)
+
+    def sample(self) -> float:
+        """Take one sample now; returns how long it took in seconds"""
+
+        start = time.perf_counter()
+        values = {"host_rss_bytes": process_rss()}
+        if self.collect is not None:
+            try:
+                values.update(self.collect())
+            except Exception as e:
+                self._collect_errors += 1
+                logger.warning(f"⚠️ Telemetry collection failed: {e}")
+
+        with self._lock:
+            for key in values.keys() - self._series.keys():
+                self._series[key] = RingBuffer(self.capacity, start=self._times.count)
+            self._times.append(time.time())
+            for key, buffer in self._series.items():
+                value = values.get(key)
+                buffer.append(np.nan if value is None else float(value))
+
+            cost = time.perf_counter() - start
+            self._samples += 1
+            self._sample_seconds += cost
+            self._sample_max = max(self._sample_max, cost)
+        return cost
+
+    def record_stages(self, timings: Dict[str, Optional[float]]):
+        """Record one generation's per-stage durations in seconds (None entries are skipped)"""
+
+        with self._lock:
+            for stage, seconds in timings.items():
+                if seconds is None:
+                    continue
+                entry = self._stages.get(stage)
+                if entry is None:
+                    entry = self._stages[stage] = [RingBuffer(self.stage_capacity), 0, 0.0]
+                entry[0].append(seconds)
+                entry[1] += 1
+                entry[2] += seconds
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def _stage_summaries(self) -> Dict[str, Dict]:
+        summaries = {}
+        for stage, (buffer, count, total) in self._stages.items():
+            recent = buffer.values()
+            quantiles = np.quantile(recent, QUANTILES) if len(recent) else [0.0] * len(QUANTILES)
+            summaries[stage] = {
+                "count": count,
+                "sum": total,
+                "avg": total / count if count else 0.0,
+                **{f"p{int(q * 100)}": float(value) for q, value in zip(QUANTILES, quantiles)}
+            }
+        return summaries
+
+    def get_stats(self) -> Dict:
+        """Sampling overhead: time per sample and share of wall time spent sampling"""
+
+        with self._lock:
+            samples, spent, worst = self._samples, self._sample_seconds, self._sample_max
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "running": self._thread is not None,
+            "interval": self.interval,
+            "effective_interval": round(self._effective_interval, 4),
+            "samples": samples,
+            "collect_errors": self._collect_errors,
+            "avg_sample_ms": round(spent / samples * 1000, 3) if samples else 0.0,
+            "max_sample_ms": round(worst * 1000, 3),
+            "overhead_ratio": round(spent / elapsed, 6) if elapsed > 0 else 0.0
+        }
+
+    def snapshot(self, history: bool = False) -> Dict:
+        """Latest value, min/avg/max over the buffer and stage timings; ``history`` adds the raw series"""
+
+        with self._lock:
+            times = self._times.values()
+            buffers = {key: buffer.values() for key, buffer in self._series.items()}
+            stages = self._stage_summaries()
+
+        gauges = {}
+        for key, values in sorted(buffers.items()):
+            present = values[~np.isnan(values)]
+            latest = values[-1] if len(values) else np.nan
+            gauges[key] = {
+                "latest": None if math.isnan(latest) else float(latest),
+                "min": float(present.min()) if len(present) else None,
+                "avg": float(present.mean()) if len(present) else None,
+                "max": float(present.max()) if len(present) else None
+            }
+            if history:
+                gauges[key]["values"] = [None if math.isnan(v) else float(v) for v in values]
+
+        snapshot = {
+            "gpu_available": any(key.startswith("device_memory_") for key in gauges),
+            "window_seconds": round(float(times[-1] - times[0]), 3) if len(times) > 1 else 0.0,
+            "gauges": gauges,
+            "stages": {stage: {k: round(v, 6) for k, v in summary.items()} for stage, summary in stages.items()},
+            "sampler": self.get_stats()
+        }
+        if history:
+            snapshot["timestamps"] = times.tolist()
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Latest gauges, stage summaries and sampler overhead in the Prometheus text format"""
+
+        with self._lock:
+            latest = {key: buffer.data[(buffer.count - 1) % buffer.capacity]
+                      for key, buffer in self._series.items() if buffer.count}
+            stages = self._stage_summaries()
+
+        lines = []
+        described = set()
+        for key in sorted(latest):
+            value = latest[key]
+            if math.isnan(value):
+                continue
+            name = key.split("{", 1)[0]
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {GAUGE_HELP.get(name, name.replace('_', ' '))}")
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.append(f"{PREFIX}{key} {value:g}")
+
+        if stages:
+            lines.append(f"# HELP {PREFIX}stage_seconds Generation time per stage")
+            lines.append(f"# TYPE {PREFIX}stage_seconds summary")
+            for stage, summary in sorted(stages.items()):
+                for q in QUANTILES:
+                    lines.append(f'{PREFIX}stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                                 f'{summary[f"p{int(q * 100)}"]:g}')
+                lines.append(f'{PREFIX}stage_seconds_sum{{stage="{stage}"}} {summary["sum"]:g}')
+                lines.append(f'{PREFIX}stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+
+        stats = self.get_stats()
+        lines.append(f"# HELP {PREFIX}telemetry_overhead_ratio Share of wall time spent sampling")
+        lines.append(f"# TYPE {PREFIX}telemetry_overhead_ratio gauge")
+        lines.append(f"{PREFIX}telemetry_overhead_ratio {stats['overhead_ratio']:g}")
+        lines.append(f"# HELP {PREFIX}telemetry_samples_total Samples taken")
+        lines.append(f"# TYPE {PREFIX}telemetry_samples_total counter")
+        lines.append(f"{PREFIX}telemetry_samples_total {stats['samples']}")
+        return "\n".join(lines) + "\n"
+
+
+def mount_telemetry_routes(app, sampler: TelemetrySampler, metrics_path: str = "/metrics",
+                           snapshot_path: str = "/telemetry"):
+    """Serve Prometheus text and a JSON snapshot on a FastAPI app"""
+
+    from fastapi.responses import Response
+
+    @app.get(metrics_path)
+    def metrics():
+        return Response(content=sampler.prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get(snapshot_path)
+    def telemetry(history: bool = False):
+        return sampler.snapshot(history=history)
+
+
+def benchmark_overhead(samples: int = 2000, series_count: int = 16) -> Dict:
+    """Cost of one sample with ``series_count`` gauges, and the overhead at common intervals"""
+
+    sampler = TelemetrySampler(lambda: {series("queue_depth", worker=i): i for i in range(series_count)})
+    costs = np.array([sampler.sample() for _ in range(samples)])
+    return {
+        "series": series_count + 1,
+        "avg_sample_ms": round(float(costs.mean()) * 1000, 4),
+        "p99_sample_ms": round(float(np.quantile(costs, 0.99)) * 1000, 4),
+        "overhead_at_1s": round(float(costs.mean()) / 1.0, 6),
+        "overhead_at_100ms": round(float(costs.mean()) / 0.1, 6),
+        "prometheus_render_ms": round(_time_call(sampler.prometheus) * 1000, 4),
+        "snapshot_ms": round(_time_call(sampler.snapshot) * 1000, 4)
+    }
+
+
+def _time_call(fn, repeat: int = 50) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII telemetry sampling overhead benchmark")
+    parser.add_argument("--samples", type=int, default=2000, help="Samples to time")
+    parser.add_argument("--series", type=int, default=16, help="Gauges per sample")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"📡 Telemetry overhead: {benchmark_overhead(args.samples, args.series)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+HURAII TILED GENERATION
+Print-resolution output by refining overlapping tiles under a device memory cap
+Hardware: GPU (tile refinement), CPU (blending)
+"""
+
+import argparse
+import contextlib
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from huraii_telemetry import note_device_peak
+
+logger = logging.getLogger(__name__)
+
+# Stable Diffusion works on 8x8 latent cells, so tile positions and sizes stay on that grid
+GRID = 8
+
+Tile = namedtuple("Tile", ["index", "x", "y", "width", "height"])
+TiledResult = namedtuple("TiledResult", ["image", "tiles", "peak_memory_mb", "total_time"])
+# What ``refine`` may return instead of a bare list when it measures its own peak,
+# e.g. in a device pool worker, where a measurement around the call sees only the caller
+RefinedTiles = namedtuple("RefinedTiles", ["images", "peak_bytes"])
+
+
+def _tile_starts(size: int, tile: int, overlap: int) -> List[int]:
+    """Tile offsets along one axis, at least ``overlap`` apart from the next tile's edge"""
+
+    if size <= tile:
+        return [0]
+    count = math.ceil((size - overlap) / (tile - overlap))
+    starts = np.linspace(0, size - tile, count)
+    return sorted({int(s) // GRID * GRID for s in starts[:-1]} | {size - tile})
+
+
+def tile_grid(width: int, height: int, tile_size: int = 512, overlap: int = 64) -> List[Tile]:
+    if overlap >= tile_size:
+        raise ValueError("overlap must be smaller than tile_size")
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    tiles = []
+    for y in _tile_starts(height, tile_h, overlap):
+        for x in _tile_starts(width, tile_w, overlap):
+            tiles.append(Tile(len(tiles), x, y, tile_w, tile_h))
+    return tiles
+
+
+def _ramp(length: int, overlap: int, fade_start: bool, fade_end: bool) -> np.ndarray:
+    """1-D blend weights: linear fades over ``overlap`` pixels on edges shared with a neighbour"""
+
+    ramp = np.ones(length, dtype=np.float32)
+    fade = (np.arange(min(overlap, length), dtype=np.float32) + 0.5) / max(overlap, 1)
+    if fade_start:
+        ramp[:len(fade)] = np.minimum(ramp[:len(fade)], fade)
+    if fade_end:
+        ramp[length - len(fade):] = np.minimum(ramp[length - len(fade):], fade[::-1])
+    return ramp
+
+
+# One measurement at a time per process: the CUDA peak counter and tracemalloc are both global
+_MEASURE_LOCK = threading.Lock()
+
+
+class PeakMemory:
+    """Peak memory above the starting level while the block runs
+
+    Uses the CUDA allocator when torch has a GPU, otherwise tracemalloc
+    (numpy allocations are traced), so CPU runs with the stub report too.
+    Tracing runs only for the block. If another block is already being
+    measured, or ``enabled`` is false, nothing is measured and
+    ``peak_bytes`` stays None.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.peak_bytes = None
+
+    def __enter__(self):
+        self._measuring = self.enabled and _MEASURE_LOCK.acquire(blocking=False)
+        if not self._measuring:
+            return self
+        torch = sys.modules.get("torch")
+        self._cuda = torch if torch is not None and torch.cuda.is_available() else None
+        if self._cuda is not None:
+            note_device_peak()  # keep the telemetry peak gauge through the reset
+            self._cuda.cuda.reset_peak_memory_stats()
+            self._base = self._cuda.cuda.memory_allocated()
+        else:
+            self._started = not tracemalloc.is_tracing()
+            if self._started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        if not self._measuring:
+            return False
+        try:
+            if self._cuda is not None:
+                self.peak_bytes = self._cuda.cuda.max_memory_allocated() - self._base
+            else:
+                self.peak_bytes = tracemalloc.get_traced_memory()[1] - self._base
+                if self._started:
+                    tracemalloc.stop()
+        finally:
+            _MEASURE_LOCK.release()
+        return False
+
+
+def check_output_size(output_size, max_side: int) -> Tuple[int, int]:
+    """(width, height) as ints, or ValueError unless both are in [GRID, max_side]"""
+
+    try:
+        width, height = (int(side) for side in output_size)
+    except (TypeError, ValueError):
+        raise ValueError("output_size must be a (width, height) pair of integers")
+    if not (GRID <= width <= max_side and GRID <= height <= max_side):
+        raise ValueError(f"output_size sides must be between {GRID} and {max_side} pixels")
+    return width, height
+
+
+class TiledGenerator:
+    """Upscale an image to any size by refining overlapping tiles
+
+    ``refine(tiles, **params)`` takes a list of PIL tiles and returns them
+    refined (an img2img pass in the engine), either as a list or as
+    RefinedTiles carrying the peak memory measured where they were refined. The input is resized to the
+    target with Lanczos, cut into ``tile_size`` tiles overlapping by at
+    least ``overlap`` pixels, and the refined tiles are feathered back
+    together with linear ramps across each overlap.
+
+    Tiles are refined in batches. The first batch is a single tile; after
+    that the batch grows as far as ``max_memory_mb`` allows given the
+    measured peak memory per tile, so device memory stays bounded no matter
+    the output size. With ``work_dir`` set, the float32 blending canvas
+    (16 bytes per pixel) lives in memory-mapped files there. The resized
+    source, the uint8 result and the returned image (3 bytes per pixel
+    each) are still held in RAM, so callers should bound the output size
+    (see ``check_output_size``).
+    ``lock`` (re-entrant if ``refine`` takes it too) is held around each
+    batch, so nothing else runs on the device while its peak is measured.
+    """
+
+    def __init__(self, refine: Callable, tile_size: int = 512, overlap: int = 64,
+                 max_memory_mb: Optional[float] = None, max_batch: int = 8,
+                 work_dir: Optional[str] = None, lock=None):
+        if tile_size % GRID or overlap % GRID:
+            raise ValueError(f"tile_size and overlap must be multiples of {GRID}")
+        self.refine = refine
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.max_memory_mb = max_memory_mb
+        self.max_batch = max_batch
+        self.work_dir = work_dir
+        self.lock = lock if lock is not None else contextlib.nullcontext()
+
+    def _canvas(self, shape, dtype, name: str):
+        if not self.work_dir:
+            return np.zeros(shape, dtype=dtype), None
+        os.makedirs(self.work_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=f"huraii-{name}-", suffix=".npy", dir=self.work_dir)
+        os.close(fd)
+        return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape), path
+
+    def run(self, image: Image.Image, width: int, height: int, **params) -> TiledResult:
+        width, height = width // GRID * GRID, height // GRID * GRID
+        start = time.perf_counter()
+
+        source = image.convert("RGB").resize((width, height), Image.LANCZOS)
+        tiles = tile_grid(width, height, self.tile_size, self.overlap)
+
+        accumulator, acc_path = self._canvas((height, width, 3), np.float32, "acc")
+        weights, weight_path = self._canvas((height, width), np.float32, "weight")
+        try:
+            reports, peak_bytes = self._refine_tiles(source, tiles, accumulator, weights, params)
+            result = self._normalize(accumulator, weights)
+        finally:
+            del accumulator, weights
+            for path in (acc_path, weight_path):
+                if path:
+                    os.remove(path)
+
+        return TiledResult(
+            image=Image.fromarray(result, "RGB"),
+            tiles=reports,
+            peak_memory_mb=round(peak_bytes / 1024**2, 2),
+            total_time=round(time.perf_counter() - start, 3)
+        )
+
+    def _refine_tiles(self, source, tiles, accumulator, weights, params):
+        """Refine and blend every tile; returns (per-tile reports, peak bytes of any batch)"""
+
+        reports = []
+        batch_size = 1
+        position = 0
+        per_tile_bytes = 0.0
+        peak_bytes = 0
+        measured_size = 0
+        while position < len(tiles):
+            batch = tiles[position:position + batch_size]
+            crops = [source.crop((t.x, t.y, t.x + t.width, t.y + t.height)) for t in batch]
+
+            # Only a batch larger than any measured so far can raise the per-tile estimate
+            batch_start = time.perf_counter()
+            with self.lock, PeakMemory(enabled=len(batch) > measured_size) as peak:
+                refined = self.refine(crops, **params)
+            batch_time = time.perf_counter() - batch_start
+            batch_peak = peak.peak_bytes
+            if isinstance(refined, RefinedTiles):
+                if refined.peak_bytes is not None:
+                    batch_peak = refined.peak_bytes
+                refined = refined.images
+            measured = batch_peak is not None
+
+            for tile, out in zip(batch, refined):
+                self._blend(accumulator, weights, tile, out, source.size[0], source.size[1])
+                reports.append({
+                    "index": tile.index,
+                    "x": tile.x,
+                    "y": tile.y,
+                    "batch_size": len(batch),
+                    "seconds": round(batch_time / len(batch), 4),
+                    "peak_memory_mb": round(batch_peak / len(batch) / 1024**2, 2) if measured else None
+                })
+
+            if measured:
+                measured_size = len(batch)
+                per_tile_bytes = max(per_tile_bytes, batch_peak / len(batch))
+                peak_bytes = max(peak_bytes, batch_peak)
+            position += len(batch)
+            # Without a measurement yet, growing the batch could overshoot the cap
+            if measured_size or self.max_memory_mb is None:
+                batch_size = self._next_batch_size(per_tile_bytes)
+        return reports, peak_bytes
+
+    def _next_batch_size(self, per_tile_bytes: float) -> int:
+        if self.max_memory_mb is None:
+            return self.max_batch
+        cap = self.max_memory_mb * 1024**2
+        if per_tile_bytes > cap:
+            logger.warning(f"⚠️ One {self.tile_size}px tile needs {per_tile_bytes / 1024**2:.0f} MB, "
+                           f"over the {self.max_memory_mb} MB cap; use a smaller tile size")
+        return int(max(1, min(self.max_batch, cap // max(per_tile_bytes, 1))))
+
+    def _blend(self, accumulator, weights, tile: Tile, out: Image.Image, width: int, height: int):
+        if out.size != (tile.width, tile.height):
+            out = out.resize((tile.width, tile.height), Image.LANCZOS)
+
+        ramp_x = _ramp(tile.width, self.overlap, tile.x > 0, tile.x + tile.width < width)
+        ramp_y = _ramp(tile.height, self.overlap, tile.y > 0, tile.y + tile.height < height)
+        mask = np.outer(ramp_y, ramp_x)
+
+        window = (slice(tile.y, tile.y + tile.height), slice(tile.x, tile.x + tile.width))
+        accumulator[window] += np.asarray(out, dtype=np.float32) * mask[..., None]
+        weights[window] += mask
+
+    @staticmethod
+    def _normalize(accumulator, weights, rows: int = 256) -> np.ndarray:
+        """Weighted average of the blended tiles, a strip of rows at a time"""
+
+        height = accumulator.shape[0]
+        output = np.empty(accumulator.shape, dtype=np.uint8)
+        for top in range(0, height, rows):
+            strip = accumulator[top:top + rows] / weights[top:top + rows, :, None]
+            output[top:top + rows] = np.clip(np.rint(strip), 0, 255)
+        return output
+
+
+def benchmark_tiling(sizes=(1024, 2048), tile_size: int = 512, overlap: int = 64) -> List[Dict]:
+    """Tile counts, time and peak memory per tile with the CPU stub pipeline"""
+
+    from huraii_stub_pipeline import StubDiffusionPipeline
+
+    pipe = StubDiffusionPipeline(step_time=0.002)
+
+    def refine(tiles, **params):
+        return pipe(["benchmark"] * len(tiles), image=tiles, num_inference_steps=10).images
+
+    base = pipe("benchmark", generator=0, num_inference_steps=1, width=512, height=512).images[0]
+    reports = []
+    for size in sizes:
+        for cap in (None, 64):
+            result = TiledGenerator(refine, tile_size, overlap, max_memory_mb=cap).run(base, size, size)
+            reports.append({
+                "size": f"{size}x{size}",
+                "memory_cap_mb": cap,
+                "tiles": len(result.tiles),
+                "total_seconds": result.total_time,
+                "seconds_per_tile": round(result.total_time / len(result.tiles), 4),
+                "peak_memory_mb": result.peak_memory_mb
+            })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HURAII tiled generation benchmark")
+    parser.add_argument("--tile-size", type=int, default=512, help="Tile width and height")
+    parser.add_argument("--overlap", type=int, default=64, help="Minimum overlap between tiles")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for report in benchmark_tiling(tile_size=args.tile_size, overlap=args.overlap):
+        logger.info(f"🧩 Tiling benchmark: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from server.services.quantiles import price_sketches
 
 router = APIRouter()
 
@@ -9,9 +11,38 @@ class BatchAnalyticsRequest(BaseModel):
     artwork_ids: List[int]
 
 
+def category_price_analysis(category: str, price: Optional[float]) -> Dict:
+    """Where a price sits among the category's sales over the last 30 days"""
+
+    sketch = price_sketches.window(category, "30d")
+    if sketch.count == 0:
+        return {}
+    p25, p50, p75 = sketch.quantiles([0.25, 0.5, 0.75])
+    analysis = {
+        "optimal_price": round(p50, 2),
+        "comparable_price_range": {
+            "low": round(p25, 2),
+            "median": round(p50, 2),
+            "high": round(p75, 2),
+            "sales": sketch.count,
+            "relative_error": sketch.alpha,
+        },
+    }
+    if price is not None:
+        analysis["current_price"] = price
+        analysis["price_percentile"] = round(sketch.rank(price), 3)
+        # Cheaper than most comparable sales reads as competitive
+        analysis["price_competitiveness"] = round(1 - sketch.rank(price), 3)
+    return analysis
+
+
 @router.get("/artwork-analytics/{id}")
-async def get_artwork_analytics(id: int):
-    return {
+async def get_artwork_analytics(
+    id: int,
+    category: Optional[str] = Query(None, description="Category to compare against"),
+    price: Optional[float] = Query(None, description="Current listing price"),
+):
+    analytics = {
         "market_fit": {
             "overall_score": 0.85,
             "style_match": 0.9,
@@ -43,6 +74,9 @@ async def get_artwork_analytics(id: int):
             },
         },
     }
+    if category:
+        analytics["price_analysis"].update(category_price_analysis(category, price))
+    return analytics
 
 
 @router.post("/artwork-analytics/batch")
@@ -1,24 +1,78 @@
-from fastapi import APIRouter, Query
-from typing import Optional
+import time
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+
+from server.services.opportunities import MAX_OFFSET, undervalued_index
+from server.services.quantiles import price_sketches
+from server.services.trends import MAX_CLOCK_SKEW, TIMEFRAMES, trend_aggregator
 
 router = APIRouter()
 
 
+class SaleEvent(BaseModel):
+    price: float = Field(..., ge=0, allow_inf_nan=False)
+    category: str
+    # seconds since the epoch; defaults to now
+    timestamp: Optional[float] = Field(None, allow_inf_nan=False)
+
+    @field_validator("timestamp")
+    @classmethod
+    def within_horizon(cls, value: Optional[float]) -> Optional[float]:
+        now = time.time()
+        if value is not None and not (
+            now - trend_aggregator.horizon_seconds <= value <= now + MAX_CLOCK_SKEW
+        ):
+            raise ValueError("timestamp must fall within the trend horizon")
+        return value
+
+
+class SalesRequest(BaseModel):
+    sales: List[SaleEvent]
+
+
+class AssetValuation(BaseModel):
+    id: str
+    current_price: float = Field(..., allow_inf_nan=False)
+    predicted_value: float = Field(..., allow_inf_nan=False)
+    category: str = "uncategorized"
+
+
+class AssetsRequest(BaseModel):
+    assets: List[AssetValuation]
+
+
+@router.post("/sales")
+async def record_sales(request: SalesRequest):
+    now = time.time()
+    prices = [sale.price for sale in request.sales]
+    timestamps = [
+        sale.timestamp if sale.timestamp is not None else now for sale in request.sales
+    ]
+    categories = [sale.category for sale in request.sales]
+    try:
+        accepted = trend_aggregator.add_sales(prices, timestamps, categories, now)
+        price_sketches.add_sales(prices, timestamps, categories, now)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"accepted": accepted, "dropped": len(request.sales) - accepted}
+
+
 @router.get("/trends")
 async def get_market_trends(
     timeframe: str = Query("24h", description="Time frame: 24h, 7d, 30d"),
     category: Optional[str] = Query(None, description="Optional category filter"),
 ):
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(
+            status_code=400, detail=f"timeframe must be one of {sorted(TIMEFRAMES)}"
+        )
+    now = time.time()
     return {
-        "trend_data": {
-            "price_trend": 0.15,
-            "volume_trend": 0.08,
-            "sentiment": "bullish",
-        },
-        "opportunities": [
-            {"id": "opp_001", "type": "price_increase", "confidence": 0.85},
-            {"id": "opp_002", "type": "volume_spike", "confidence": 0.72},
-        ],
+        "timeframe": timeframe,
+        "category": category,
+        "trend_data": trend_aggregator.query(timeframe, category, now),
+        "opportunities": trend_aggregator.opportunities(timeframe, now),
     }
 
 
@@ -32,19 +86,45 @@ async def predict_market(nft_id: str):
     }
 
 
+@router.post("/assets")
+async def update_assets(request: AssetsRequest):
+    for asset in request.assets:
+        if asset.current_price <= 0:
+            raise HTTPException(
+                status_code=400, detail=f"{asset.id}: current_price must be positive"
+            )
+    undervalued_index.upsert_many(asset.model_dump() for asset in request.assets)
+    return {"updated": len(request.assets), "tracked": len(undervalued_index)}
+
+
 @router.get("/opportunities")
-async def get_market_opportunities():
-    return {
-        "trending_categories": [
-            {"name": "Digital Art", "growth_rate": 0.25, "volume": 150000},
-            {"name": "Abstract", "growth_rate": 0.18, "volume": 89000},
-        ],
-        "undervalued_assets": [
+async def get_market_opportunities(
+    limit: int = Query(10, ge=1, le=100, description="Undervalued assets per page"),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET, description="Assets to skip"),
+    category: Optional[str] = Query(None, description="Optional category filter"),
+):
+    now = time.time()
+    trending = []
+    for name in trend_aggregator.categories:
+        trend = trend_aggregator.query("30d", name, now)
+        prices = price_sketches.summary(name, "30d", now)["quantiles"]
+        trending.append(
             {
-                "id": "asset_001",
-                "current_price": 500,
-                "predicted_value": 750,
-                "potential_return": 0.50,
+                "name": name,
+                "growth_rate": trend["volume_trend"],
+                "volume": trend["volume"],
+                "median_price": prices["p50"],
+                "p90_price": prices["p90"],
             }
-        ],
+        )
+    trending.sort(key=lambda c: (c["growth_rate"], c["volume"]), reverse=True)
+    page = undervalued_index.top(limit, offset, category)
+    return {
+        "trending_categories": trending[:10],
+        "undervalued_assets": page["assets"],
+        "pagination": {
+            "offset": offset,
+            "limit": limit,
+            "total": page["total"],
+        },
     }
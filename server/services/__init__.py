@@ -0,0 +1 @@
+# Service layer for VORTEX AI AGENTS
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ALL = None  # heap key for the unfiltered ranking
+MAX_OFFSET = 1000  # a page pops offset + limit entries while holding the lock
+
+
+class UndervaluedIndex:
+    """Assets ranked by potential return (predicted value / current price - 1)
+
+    Each category has a heap of its undervalued assets, and one more heap
+    covers all of them. A price or prediction change pushes a fresh entry
+    and makes the asset's older entries stale. Stale entries are skipped
+    when they surface and dropped in bulk once they outnumber live ones.
+    A page pops just deep enough to reach ``offset + limit`` live
+    entries and pushes them back, so serving the top N costs
+    O(N log n), independent of catalog size and of how many updates
+    came in.
+    """
+
+    def __init__(self):
+        self._assets: Dict[str, Dict] = {}
+        self._versions: Dict[str, int] = {}
+        self._heaps: Dict[Optional[str], List[Tuple[float, int, str]]] = {ALL: []}
+        self._live: Dict[Optional[str], int] = {ALL: 0}  # undervalued assets per heap
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    @staticmethod
+    def potential_return(asset: Dict) -> float:
+        return asset["predicted_value"] / asset["current_price"] - 1
+
+    def _retire(self, asset_id: str):
+        """Make the asset's heap entries stale and drop it from the live counts"""
+
+        asset = self._assets.get(asset_id)
+        self._versions.pop(asset_id, None)
+        if asset is not None and self.potential_return(asset) > 0:
+            self._live[ALL] -= 1
+            self._live[asset["category"]] -= 1
+
+    def _push(self, asset_id: str, asset: Dict):
+        ret = self.potential_return(asset)
+        if ret <= 0:
+            return
+        version = next(self._sequence)
+        self._versions[asset_id] = version
+        for key in (ALL, asset["category"]):
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, (-ret, version, asset_id))
+            self._live[key] = self._live.get(key, 0) + 1
+            if len(heap) > 2 * self._live[key] + 1024:
+                self._compact(key)
+
+    def _compact(self, key: Optional[str]):
+        heap = [
+            entry
+            for entry in self._heaps[key]
+            if self._versions.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+
+    def upsert(
+        self,
+        asset_id: str,
+        current_price: float,
+        predicted_value: float,
+        category: str = "uncategorized",
+    ):
+        if not (math.isfinite(current_price) and math.isfinite(predicted_value)):
+            raise ValueError("current_price and predicted_value must be finite")
+        if current_price <= 0:
+            raise ValueError("current_price must be positive")
+        asset_id = str(asset_id)
+        asset = {
+            "category": category.lower(),
+            "current_price": float(current_price),
+            "predicted_value": float(predicted_value),
+        }
+        with self._lock:
+            self._retire(asset_id)
+            self._assets[asset_id] = asset
+            self._push(asset_id, asset)
+
+    def upsert_many(self, assets: Iterable[Dict]):
+        for asset in assets:
+            self.upsert(
+                asset["id"],
+                asset["current_price"],
+                asset["predicted_value"],
+                asset.get("category", "uncategorized"),
+            )
+
+    def update(
+        self,
+        asset_id: str,
+        current_price: Optional[float] = None,
+        predicted_value: Optional[float] = None,
+    ):
+        """Change an existing asset's price and/or prediction"""
+
+        asset = self._assets.get(str(asset_id))
+        if asset is None:
+            raise KeyError(asset_id)
+        self.upsert(
+            asset_id,
+            asset["current_price"] if current_price is None else current_price,
+            asset["predicted_value"] if predicted_value is None else predicted_value,
+            asset["category"],
+        )
+
+    def remove(self, asset_id: str):
+        with self._lock:
+            self._retire(str(asset_id))
+            self._assets.pop(str(asset_id), None)
+
+    def top(
+        self, limit: int = 10, offset: int = 0, category: Optional[str] = None
+    ) -> Dict:
+        """One page of the most undervalued assets, best first"""
+
+        key = category.lower() if category else ALL
+        with self._lock:
+            heap = self._heaps.get(key, [])
+            taken = []
+            while heap and len(taken) < offset + limit:
+                entry = heapq.heappop(heap)
+                if self._versions.get(entry[2]) == entry[1]:
+                    taken.append(entry)
+            for entry in taken:
+                heapq.heappush(heap, entry)
+            total = self._live.get(key, 0)
+            page = [
+                {
+                    "id": asset_id,
+                    "category": self._assets[asset_id]["category"],
+                    "current_price": self._assets[asset_id]["current_price"],
+                    "predicted_value": self._assets[asset_id]["predicted_value"],
+                    "potential_return": round(-negative_return, 4),
+                }
+                for negative_return, _, asset_id in taken[offset:]
+            ]
+        return {"assets": page, "total": total, "offset": offset, "limit": limit}
+
+    def get_stats(self) -> Dict:
+        return {
+            "assets": len(self._assets),
+            "undervalued": self._live[ALL],
+            "categories": len(self._heaps) - 1,
+            "heap_entries": sum(len(heap) for heap in self._heaps.values()),
+        }
+
+
+undervalued_index = UndervaluedIndex()
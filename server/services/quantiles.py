@@ -0,0 +1,321 @@
+import argparse
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from server.services.trends import (
+    MAX_CATEGORIES,
+    TIMEFRAMES,
+    assign_rows,
+    check_sales,
+    claim_slots,
+    grow_rows,
+)
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+class QuantileSketch:
+    """Mergeable price quantile sketch over log-spaced bins
+
+    Positive values land in bin ``ceil(log(v) / log(gamma))``, where
+    gamma = (1 + alpha) / (1 - alpha). Each bin answers with the value
+    whose relative distance to both bin edges is alpha. So any quantile
+    of values in [min_value, max_value] comes back within a relative
+    error of ``alpha`` of the exact order statistic at rank
+    ``q * (count - 1)``. Smaller values are counted in a zero bin and
+    larger ones are clamped to the top bin.
+
+    Two sketches with the same parameters merge by adding their counts.
+    The merge is exact, so combining time buckets, windows or worker
+    processes keeps the same bound. The estimate does not depend on
+    insertion or merge order. The default alpha of 1% covers $0.01 to
+    $100M in 1,152 bins.
+    """
+
+    def __init__(
+        self, alpha: float = 0.01, min_value: float = 0.01, max_value: float = 1e8
+    ):
+        self.alpha = alpha
+        self.min_value = min_value
+        self.max_value = max_value
+        self.log_gamma = float(np.log((1 + alpha) / (1 - alpha)))
+        self.offset = int(np.ceil(np.log(min_value) / self.log_gamma))
+        self.bins = int(np.ceil(np.log(max_value) / self.log_gamma)) - self.offset + 2
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def index(self, values) -> np.ndarray:
+        """Bin of each value; bin 0 holds everything below ``min_value``"""
+
+        values = np.asarray(values, dtype=np.float64)
+        logs = np.log(np.maximum(values, self.min_value)) / self.log_gamma
+        bins = np.ceil(logs).astype(np.int64) - self.offset + 1
+        return np.where(values < self.min_value, 0, np.clip(bins, 1, self.bins - 1))
+
+    def add(self, values) -> "QuantileSketch":
+        self.counts += np.bincount(self.index(values), minlength=self.bins)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if (other.alpha, other.min_value, other.max_value) != (
+            self.alpha,
+            self.min_value,
+            self.max_value,
+        ):
+            raise ValueError("only sketches with the same parameters can be merged")
+        self.counts += other.counts
+        return self
+
+    def bin_values(self, bins) -> np.ndarray:
+        """Representative value of each bin, alpha-close to anything inside it"""
+
+        gamma = np.exp(self.log_gamma)
+        upper = np.exp((np.asarray(bins) + self.offset - 1) * self.log_gamma)
+        return np.where(np.asarray(bins) == 0, 0.0, 2 * upper / (gamma + 1))
+
+    def quantiles(
+        self, qs: Sequence[float] = DEFAULT_QUANTILES
+    ) -> List[Optional[float]]:
+        total = self.count
+        if total == 0:
+            return [None] * len(qs)
+        ranks = np.asarray(qs, dtype=np.float64) * (total - 1)
+        bins = np.searchsorted(np.cumsum(self.counts), ranks, side="right")
+        return [float(v) for v in self.bin_values(bins)]
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    def rank(self, value: float) -> Optional[float]:
+        """Share of the values at or below ``value`` (to within its bin)"""
+
+        total = self.count
+        if total == 0:
+            return None
+        return float(self.counts[: int(self.index([value])[0]) + 1].sum() / total)
+
+    def to_dict(self) -> Dict:
+        """Sparse form for shipping a sketch between processes"""
+
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "alpha": self.alpha,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "bins": nonzero.tolist(),
+            "counts": self.counts[nonzero].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(data["alpha"], data["min_value"], data["max_value"])
+        sketch.counts[np.asarray(data["bins"], dtype=np.int64)] = data["counts"]
+        return sketch
+
+
+class PriceSketches:
+    """One quantile sketch per category per day, kept in a ring like the trend buckets
+
+    A window query merges the sketches of its days, which costs
+    O(days x bins) however many sales they hold. Each category row takes
+    about 270KB, so at most ``max_categories`` exist; later categories
+    are counted under "other", with the same cap and rule as the trend
+    buckets.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 86400,
+        horizon_seconds: Optional[int] = None,
+        alpha: float = 0.01,
+        max_categories: int = MAX_CATEGORIES,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.max_categories = max_categories
+        horizon = horizon_seconds or 2 * max(TIMEFRAMES.values())
+        self.buckets = -(-horizon // bucket_seconds) + 1
+        self._template = QuantileSketch(alpha)
+        self._slot_bucket = np.full(self.buckets, -1, dtype=np.int64)
+        self._counts = np.zeros((0, self.buckets, self._template.bins), dtype=np.int32)
+        self._categories: Dict[str, int] = {}
+        self._latest_bucket = -1
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def _rows(self, categories: Iterable[str]) -> np.ndarray:
+        rows = assign_rows(self._categories, categories, self.max_categories)
+        self._counts = grow_rows(
+            self._counts, len(self._categories), self.max_categories
+        )
+        return rows
+
+    def add_sales(
+        self,
+        prices: Iterable[float],
+        timestamps: Iterable[float],
+        categories: Iterable[str],
+        now: Optional[float] = None,
+    ) -> int:
+        prices = np.asarray(list(prices), dtype=np.float64)
+        timestamps = np.asarray(list(timestamps), dtype=np.float64)
+        check_sales(prices, timestamps, now)
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+        categories = [str(category).lower() for category in categories]
+        if len(prices) == 0:
+            return 0
+
+        with self._lock:
+            rows = self._rows(categories)
+            self._latest_bucket = max(self._latest_bucket, int(buckets.max()))
+            keep = buckets > self._latest_bucket - self.buckets
+            self.dropped += int((~keep).sum())
+            prices, buckets, rows = prices[keep], buckets[keep], rows[keep]
+
+            slots = buckets % self.buckets
+            current = claim_slots(self._slot_bucket, slots, buckets, (self._counts,))
+            bins = self._template.index(prices[current])
+            # Count repeats per cell first: far cheaper than np.add.at per sale
+            cells, repeats = np.unique(
+                np.ravel_multi_index(
+                    (rows[current], slots[current], bins), self._counts.shape
+                ),
+                return_counts=True,
+            )
+            self._counts.reshape(-1)[cells] += repeats.astype(np.int32)
+            return int(current.sum())
+
+    def merge(self, other: "PriceSketches"):
+        """Fold in the sketches of another process, bucket by bucket"""
+
+        if (other.bucket_seconds, other.buckets, other._template.bins) != (
+            self.bucket_seconds,
+            self.buckets,
+            self._template.bins,
+        ):
+            raise ValueError("only rings with the same layout can be merged")
+        with other._lock:
+            names = other.categories
+            slot_bucket = other._slot_bucket.copy()
+            counts = other._counts.copy()
+        with self._lock:
+            rows = self._rows(names)
+            valid = slot_bucket >= 0
+            self._latest_bucket = max(self._latest_bucket, int(slot_bucket.max()))
+            valid &= slot_bucket > self._latest_bucket - self.buckets
+            slots = np.flatnonzero(valid)
+            buckets = slot_bucket[slots]
+            # Same layout, so a bucket sits in the same slot in both rings
+            current = claim_slots(self._slot_bucket, slots, buckets, (self._counts,))
+            for source, row in enumerate(rows):
+                self._counts[row, slots[current]] += counts[source, slots[current]]
+
+    def window(
+        self,
+        category: Optional[str] = None,
+        timeframe: str = "30d",
+        now: Optional[float] = None,
+    ) -> QuantileSketch:
+        """Merged sketch of one category (or all) over the last timeframe"""
+
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"timeframe must be one of {sorted(TIMEFRAMES)}")
+        width = -(-TIMEFRAMES[timeframe] // self.bucket_seconds)
+        end = int((time.time() if now is None else now) // self.bucket_seconds)
+
+        sketch = QuantileSketch(
+            self._template.alpha, self._template.min_value, self._template.max_value
+        )
+        with self._lock:
+            slots = np.flatnonzero(
+                (self._slot_bucket > end - width) & (self._slot_bucket <= end)
+            )
+            if category is None:
+                sketch.counts += self._counts[:, slots].sum(axis=(0, 1))
+            elif category.lower() in self._categories:
+                row = self._categories[category.lower()]
+                sketch.counts += self._counts[row, slots].sum(axis=0)
+        return sketch
+
+    def summary(
+        self,
+        category: Optional[str] = None,
+        timeframe: str = "30d",
+        now: Optional[float] = None,
+        qs: Sequence[float] = DEFAULT_QUANTILES,
+    ) -> Dict:
+        sketch = self.window(category, timeframe, now)
+        values = sketch.quantiles(qs)
+        return {
+            "sales": sketch.count,
+            "quantiles": {
+                f"p{round(q * 100)}": None if v is None else round(v, 2)
+                for q, v in zip(qs, values)
+            },
+            "relative_error": sketch.alpha,
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "categories": len(self._categories),
+            "buckets": self.buckets,
+            "bins": self._template.bins,
+            "dropped": self.dropped,
+            "memory_mb": round(self._counts.nbytes / 1024**2, 2),
+        }
+
+
+price_sketches = PriceSketches()
+
+
+def benchmark(
+    count: int = 1_000_000, qs: Sequence[float] = (0.01, 0.25, 0.5, 0.75, 0.99)
+) -> Dict:
+    """Sketch vs exact np.percentile: accuracy, build time and query time"""
+
+    rng = np.random.default_rng(0)
+    prices = rng.lognormal(6.0, 1.2, count)
+
+    start = time.perf_counter()
+    exact = np.percentile(prices, np.asarray(qs) * 100, method="lower")
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parts = [QuantileSketch().add(chunk) for chunk in np.array_split(prices, 8)]
+    build_seconds = time.perf_counter() - start
+    sketch = QuantileSketch()
+    start = time.perf_counter()
+    for part in parts:
+        sketch.merge(part)
+    merge_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    estimates = np.array(sketch.quantiles(qs))
+    query_seconds = time.perf_counter() - start
+
+    return {
+        "values": count,
+        "max_relative_error": round(
+            float(np.max(np.abs(estimates - exact) / exact)), 5
+        ),
+        "error_bound": sketch.alpha,
+        "np_percentile_ms": round(exact_seconds * 1000, 2),
+        "sketch_build_ms": round(build_seconds * 1000, 2),
+        "merge_8_ms": round(merge_seconds * 1000, 3),
+        "sketch_query_ms": round(query_seconds * 1000, 3),
+        "sketch_bytes": sketch.counts.nbytes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price sketch benchmark")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    print(benchmark(parser.parse_args().count))
@@ -0,0 +1,320 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TIMEFRAMES = {"24h": 24 * 3600, "7d": 7 * 86400, "30d": 30 * 86400}
+SENTIMENT_THRESHOLD = 0.02  # price moves smaller than 2% read as neutral
+MAX_CLOCK_SKEW = 3600  # sales may be stamped up to an hour ahead of the server clock
+# Rows per ring, shared by the trend buckets and the price sketches so both
+# track the same categories; later categories are counted under "other"
+MAX_CATEGORIES = 64
+OVERFLOW_CATEGORY = "other"
+
+
+def check_sales(
+    prices: np.ndarray, timestamps: np.ndarray, now: Optional[float] = None
+):
+    """Reject sales that would corrupt the buckets
+
+    A NaN or infinite price poisons every sum it lands in. A timestamp far
+    in the future moves the newest bucket ahead, and every real sale after
+    it is then dropped as older than the horizon.
+    """
+
+    if not np.isfinite(prices).all() or (prices < 0).any():
+        raise ValueError("prices must be finite and non-negative")
+    if not np.isfinite(timestamps).all():
+        raise ValueError("timestamps must be finite")
+    limit = (time.time() if now is None else now) + MAX_CLOCK_SKEW
+    if len(timestamps) and timestamps.max() > limit:
+        raise ValueError("timestamps must not be in the future")
+
+
+def assign_rows(
+    table: Dict[str, int], categories: Iterable[str], max_categories: int
+) -> np.ndarray:
+    """Row of each category, adding unseen ones to ``table``
+
+    Categories come from clients, so rows are capped: once a new one would
+    take the last free row, it and every later newcomer share the
+    OVERFLOW_CATEGORY row instead.
+    """
+
+    names, inverse = np.unique(np.asarray(categories, dtype=str), return_inverse=True)
+    lookup = np.empty(len(names), dtype=np.int64)
+    for i, category in enumerate(names.tolist()):
+        row = table.get(category)
+        if row is None:
+            if len(table) < max_categories - 1:
+                row = table[category] = len(table)
+            else:
+                row = table.setdefault(OVERFLOW_CATEGORY, len(table))
+        lookup[i] = row
+    return lookup[inverse.reshape(-1)]
+
+
+def grow_rows(array: np.ndarray, rows: int, max_rows: int) -> np.ndarray:
+    """``array`` with room for ``rows`` rows, doubling capacity up to ``max_rows``"""
+
+    if rows <= len(array):
+        return array
+    capacity = min(max(rows, 2 * len(array)), max_rows)
+    extra = np.zeros((capacity - len(array),) + array.shape[1:], dtype=array.dtype)
+    return np.concatenate([array, extra])
+
+
+def claim_slots(slot_bucket, slots, buckets, arrays) -> np.ndarray:
+    """Hand ring slots over to newer buckets, zeroing what they held
+
+    ``arrays`` are indexed (row, slot, ...). Returns a mask of the events
+    whose bucket now owns its slot.
+    """
+
+    for bucket in np.unique(buckets):
+        slot = bucket % len(slot_bucket)
+        if slot_bucket[slot] < bucket:
+            slot_bucket[slot] = bucket
+            for array in arrays:
+                array[:, slot] = 0
+    return slot_bucket[slots] == buckets
+
+
+def summarize(volume, value, previous_volume, previous_value) -> Dict:
+    """Trend of one window against the one before it"""
+
+    volume, previous_volume = int(volume), int(previous_volume)
+    value, previous_value = float(value), float(previous_value)
+    average = value / volume if volume else 0.0
+    previous_average = previous_value / previous_volume if previous_volume else 0.0
+    price_trend = (
+        (average - previous_average) / previous_average if previous_average else 0.0
+    )
+    volume_trend = (
+        (volume - previous_volume) / previous_volume if previous_volume else 0.0
+    )
+    if price_trend > SENTIMENT_THRESHOLD:
+        sentiment = "bullish"
+    elif price_trend < -SENTIMENT_THRESHOLD:
+        sentiment = "bearish"
+    else:
+        sentiment = "neutral"
+
+    return {
+        "price_trend": round(price_trend, 4),
+        "volume_trend": round(volume_trend, 4),
+        "sentiment": sentiment,
+        "volume": volume,
+        "previous_volume": previous_volume,
+        "average_price": round(average, 2),
+        "total_value": round(value, 2),
+    }
+
+
+def rank_opportunities(categories: List[str], windows) -> List[Dict]:
+    """Rising categories, strongest signal first, from per-row window totals"""
+
+    volumes, values, previous_volumes, previous_values = (
+        window.tolist() for window in windows
+    )
+    found = []
+    for row, category in enumerate(categories):
+        trend = summarize(
+            volumes[row], values[row], previous_volumes[row], previous_values[row]
+        )
+        confidence = round(float(1 - 1 / np.sqrt(1 + trend["volume"])), 2)
+        if trend["price_trend"] > SENTIMENT_THRESHOLD:
+            found.append(
+                {
+                    "id": f"opp_{category}_price",
+                    "type": "price_increase",
+                    "category": category,
+                    "change": trend["price_trend"],
+                    "confidence": confidence,
+                }
+            )
+        if trend["volume_trend"] > 0.2:
+            found.append(
+                {
+                    "id": f"opp_{category}_volume",
+                    "type": "volume_spike",
+                    "category": category,
+                    "change": trend["volume_trend"],
+                    "confidence": confidence,
+                }
+            )
+    found.sort(key=lambda o: o["change"] * o["confidence"], reverse=True)
+    return found
+
+
+class TrendAggregator:
+    """Sale count and price sums per category in hourly ring buffers
+
+    One row of buckets per category, one column per hour, with enough
+    columns to compare the longest timeframe against the one before it.
+    A slot is reused once its hour falls out of the horizon. A query sums
+    the slots of the current and the previous window, so its cost depends
+    on the number of buckets, never on the number of sales; a running total
+    row over every category keeps unfiltered queries to a single row. At most
+    ``max_categories`` rows exist, which bounds memory at about 23KB each.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 3600,
+        horizon_seconds: Optional[int] = None,
+        max_categories: int = MAX_CATEGORIES,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.max_categories = max_categories
+        self.horizon_seconds = horizon_seconds or 2 * max(TIMEFRAMES.values())
+        self.buckets = -(-self.horizon_seconds // bucket_seconds) + 1
+        self._slot_bucket = np.full(self.buckets, -1, dtype=np.int64)
+        self._counts = np.zeros((0, self.buckets), dtype=np.int64)
+        self._sums = np.zeros((0, self.buckets), dtype=np.float64)
+        # Running totals over every category, so unfiltered queries sum one row
+        self._total_counts = np.zeros((1, self.buckets), dtype=np.int64)
+        self._total_sums = np.zeros((1, self.buckets), dtype=np.float64)
+        self._categories: Dict[str, int] = {}
+        self._latest_bucket = -1
+        self.dropped = 0
+        self._version = 0  # bumped whenever sales land, to invalidate rankings
+        self._rankings: Dict[str, Tuple[Tuple[int, int], List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def _rows(self, categories: Iterable[str]) -> np.ndarray:
+        rows = assign_rows(self._categories, categories, self.max_categories)
+        self._counts = grow_rows(
+            self._counts, len(self._categories), self.max_categories
+        )
+        self._sums = grow_rows(self._sums, len(self._categories), self.max_categories)
+        return rows
+
+    def add_sales(
+        self,
+        prices: Iterable[float],
+        timestamps: Iterable[float],
+        categories: Iterable[str],
+        now: Optional[float] = None,
+    ) -> int:
+        """Fold a batch of sales into the buckets; returns how many were kept
+
+        Sales older than the horizon, relative to the newest bucket seen,
+        are dropped and counted in ``dropped``. A batch with a negative or
+        non-finite price, or a sale stamped after ``now``, raises ValueError.
+        """
+
+        prices = np.asarray(list(prices), dtype=np.float64)
+        timestamps = np.asarray(list(timestamps), dtype=np.float64)
+        check_sales(prices, timestamps, now)
+        buckets = (timestamps // self.bucket_seconds).astype(np.int64)
+        categories = [str(category).lower() for category in categories]
+        if len(prices) == 0:
+            return 0
+
+        with self._lock:
+            rows = self._rows(categories)
+            self._latest_bucket = max(self._latest_bucket, int(buckets.max()))
+            keep = buckets > self._latest_bucket - self.buckets
+            self.dropped += int((~keep).sum())
+            prices, buckets, rows = prices[keep], buckets[keep], rows[keep]
+
+            slots = buckets % self.buckets
+            current = claim_slots(
+                self._slot_bucket,
+                slots,
+                buckets,
+                (self._counts, self._sums, self._total_counts, self._total_sums),
+            )
+            prices, slots, rows = prices[current], slots[current], rows[current]
+            np.add.at(self._counts, (rows, slots), 1)
+            np.add.at(self._sums, (rows, slots), prices)
+            self._total_counts[0] += np.bincount(slots, minlength=self.buckets)
+            self._total_sums[0] += np.bincount(
+                slots, weights=prices, minlength=self.buckets
+            )
+            kept = int(current.sum())
+            self._version += kept > 0
+            return kept
+
+    def _window(
+        self, counts: np.ndarray, sums: np.ndarray, first: int, last: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Sales and value per row in buckets ``first <= bucket <= last``"""
+
+        slots = np.flatnonzero(
+            (self._slot_bucket >= first) & (self._slot_bucket <= last)
+        )
+        return counts[:, slots].sum(axis=1), sums[:, slots].sum(axis=1)
+
+    def _end(self, timeframe: str, now: Optional[float]) -> int:
+        """Newest bucket of ``timeframe`` at ``now``"""
+
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"timeframe must be one of {sorted(TIMEFRAMES)}")
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def _compare(self, timeframe: str, end: int, counts, sums):
+        """Per-row (volume, value) of the current and the previous window"""
+
+        width = TIMEFRAMES[timeframe] // self.bucket_seconds
+        return self._window(counts, sums, end - width + 1, end) + self._window(
+            counts, sums, end - 2 * width + 1, end - width
+        )
+
+    def query(
+        self,
+        timeframe: str = "24h",
+        category: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Dict:
+        """Volume, average price and their change against the previous window"""
+
+        end = self._end(timeframe, now)
+        with self._lock:
+            if category is None:
+                counts, sums = self._total_counts, self._total_sums
+            else:
+                row = self._categories.get(category.lower(), len(self._counts))
+                counts, sums = self._counts[row : row + 1], self._sums[row : row + 1]
+            windows = self._compare(timeframe, end, counts, sums)
+
+        return summarize(*(window.sum() for window in windows))
+
+    def opportunities(
+        self, timeframe: str = "24h", now: Optional[float] = None, limit: int = 5
+    ) -> List[Dict]:
+        """Categories whose price or volume is rising fastest
+
+        Both windows of every category come from one pass over the buckets,
+        and the ranking is reused until a bucket rolls over or sales land.
+        Confidence grows with the number of sales behind the signal:
+        1 - 1 / sqrt(1 + volume).
+        """
+
+        end = self._end(timeframe, now)
+        with self._lock:
+            stamp = (end, self._version)
+            cached = self._rankings.get(timeframe)
+            if cached is None or cached[0] != stamp:
+                windows = self._compare(timeframe, end, self._counts, self._sums)
+                ranking = rank_opportunities(self.categories, windows)
+                cached = self._rankings[timeframe] = (stamp, ranking)
+        return [dict(opportunity) for opportunity in cached[1][:limit]]
+
+    def get_stats(self) -> Dict:
+        return {
+            "categories": len(self._categories),
+            "buckets": self.buckets,
+            "bucket_seconds": self.bucket_seconds,
+            "dropped": self.dropped,
+            "memory_kb": round((self._counts.nbytes + self._sums.nbytes) / 1024, 1),
+        }
+
+
+trend_aggregator = TrendAggregator()
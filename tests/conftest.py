@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The agents are standalone scripts that import their siblings directly
+AGENTS_DIR = os.path.join(os.path.dirname(__file__), "..", "includes", "agents")
+sys.path.insert(0, os.path.abspath(AGENTS_DIR))
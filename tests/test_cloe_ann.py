@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from cloe_agent import CloeAgent
+from cloe_ann import IVFIndex, kmeans
+from cloe_matching import synthetic_collectors
+
+
+def unit_vectors(count, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top(vectors, query, k):
+    return np.argsort(vectors @ query)[::-1][:k]
+
+
+class TestKMeans:
+    def test_finds_separated_clusters(self):
+        rng = np.random.default_rng(0)
+        centers = np.array([[0, 0], [10, 10], [-10, 10]], dtype=np.float32)
+        points = np.concatenate([c + rng.normal(0, 0.5, (200, 2)) for c in centers])
+
+        found = kmeans(points, 3, seed=1)
+        for center in centers:
+            assert np.min(np.linalg.norm(found - center, axis=1)) < 0.5
+
+    def test_needs_enough_points(self):
+        with pytest.raises(ValueError):
+            kmeans(np.zeros((3, 2)), 4)
+
+
+class TestIVFIndex:
+    def test_probing_every_cell_is_exact(self):
+        vectors = unit_vectors(2000)
+        index = IVFIndex(32, nlist=16)
+        index.train(vectors)
+        index.add(np.arange(2000), vectors)
+
+        for query in unit_vectors(5, seed=1):
+            labels, scores = index.search(query, k=10, nprobe=16)
+            assert labels.tolist() == exact_top(vectors, query, 10).tolist()
+            assert np.allclose(scores, vectors[labels] @ query)
+
+    def test_pq_with_refinement_has_high_recall(self):
+        vectors = unit_vectors(5000, seed=2)
+        index = IVFIndex(32, nlist=16, pq_m=8)
+        index.train(vectors)
+        index.add(np.arange(5000), vectors)
+        assert index.get_stats()["bytes_per_vector"] == 8
+
+        recalls = []
+        for query in unit_vectors(20, seed=3):
+            labels, _ = index.search(
+                query, k=10, nprobe=16, refine=vectors, refine_factor=10
+            )
+            truth = set(exact_top(vectors, query, 10).tolist())
+            recalls.append(len(truth & set(labels.tolist())) / 10)
+        assert np.mean(recalls) >= 0.9
+
+    def test_readded_label_supersedes_the_old_entry(self):
+        vectors = unit_vectors(500)
+        index = IVFIndex(32, nlist=8)
+        index.train(vectors)
+        index.add(np.arange(500), vectors)
+        index.add([7], -vectors[7:8])
+
+        labels, _ = index.search(vectors[7], k=5, nprobe=8)
+        assert 7 not in labels.tolist()
+        assert len(index) == 500
+
+        index.compact()
+        assert index.get_stats()["tail"] == 0
+        assert len(index._labels) == 500
+
+    def test_allowed_mask_filters_labels(self):
+        vectors = unit_vectors(500)
+        index = IVFIndex(32, nlist=8)
+        index.train(vectors)
+        index.add(np.arange(500), vectors)
+        allowed = np.zeros(500, dtype=bool)
+        allowed[::2] = True
+
+        labels, _ = index.search(vectors[1], k=20, nprobe=8, allowed=allowed)
+        assert len(labels) == 20
+        assert all(label % 2 == 0 for label in labels)
+
+    def test_save_and_memory_mapped_load(self, tmp_path):
+        vectors = unit_vectors(1000)
+        index = IVFIndex(32, nlist=8, pq_m=4)
+        index.train(vectors)
+        index.add(np.arange(1000), vectors)
+        index.save(str(tmp_path))
+
+        loaded = IVFIndex.load(str(tmp_path))
+        assert loaded.get_stats()["memory_mapped"]
+        query = vectors[3]
+        assert np.array_equal(
+            loaded.search(query, nprobe=8)[0], index.search(query, nprobe=8)[0]
+        )
+
+        # Adds after loading land in the tail and are searchable
+        extra = unit_vectors(1, seed=9)
+        loaded.add([1000], extra)
+        assert (
+            loaded.search(extra[0], k=1, nprobe=8, refine=np.vstack([vectors, extra]))[
+                0
+            ][0]
+            == 1000
+        )
+
+
+class TestCloeAgentANN:
+    def test_ann_matches_agree_with_exact_matching(self, tmp_path):
+        cloe = CloeAgent()
+        ids, vectors, low, high = synthetic_collectors(3000, seed=4)
+        cloe.collector_profiles.add(ids, vectors, low, high)
+        exact = cloe.match_collectors("abstract", price=300, k=5)
+
+        index = cloe.build_collector_ann(nlist=8, nprobe=8)
+        assert cloe.match_collectors("abstract", price=300, k=5) == exact
+
+        cloe.add_collectors(
+            [
+                {
+                    "collector_id": "new",
+                    "preferences": {"abstract": 1.0},
+                    "budget_min": 0,
+                    "budget_max": 1000,
+                }
+            ]
+        )
+        assert (
+            cloe.match_collectors("abstract", price=300, k=1)[0]["collector_id"]
+            == "new"
+        )
+
+        cloe.save_collector_ann(str(tmp_path))
+        cloe.load_collector_ann(str(tmp_path), nprobe=8)
+        assert cloe.collector_ann is not index
+        assert (
+            cloe.match_collectors("abstract", price=300, k=1)[0]["collector_id"]
+            == "new"
+        )
+
+    def test_saving_before_building_is_a_clear_error(self, tmp_path):
+        with pytest.raises(RuntimeError, match="build the collector index"):
+            CloeAgent().save_collector_ann(str(tmp_path))
@@ -0,0 +1,161 @@
+import numpy as np
+
+from cloe_agent import CloeAgent
+from cloe_assignment import (
+    candidate_edges,
+    check_caps,
+    exact_assignment,
+    greedy_assignment,
+    synthetic_artworks,
+)
+from cloe_matching import synthetic_collectors
+
+
+def small_problem(collectors=120, artworks=15, seed=0):
+    _, vectors, low, high = synthetic_collectors(collectors, seed=seed)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+    a_vectors, prices = synthetic_artworks(artworks, seed=seed + 1)
+    return vectors, low, high, a_vectors, prices
+
+
+def sequential_greedy(edges, per_collector, per_artwork):
+    collectors, artworks, scores = edges
+    used_c, used_a, chosen = {}, {}, []
+    for i in np.argsort(-scores, kind="stable"):
+        c, a = collectors[i], artworks[i]
+        if used_c.get(c, 0) < per_collector and used_a.get(a, 0) < per_artwork:
+            used_c[c] = used_c.get(c, 0) + 1
+            used_a[a] = used_a.get(a, 0) + 1
+            chosen.append(i)
+    return np.sort(chosen)
+
+
+class TestCandidateEdges:
+    def test_blocks_do_not_change_the_edges(self):
+        problem = small_problem()
+        whole = candidate_edges(*problem)
+        blocked = candidate_edges(*problem, memory_mb=0.001)
+
+        assert np.array_equal(whole[0], blocked[0])
+        assert np.array_equal(whole[1], blocked[1])
+        assert np.allclose(whole[2], blocked[2], atol=1e-6)
+
+    def test_budgets_and_candidate_limit(self):
+        vectors, low, high, a_vectors, prices = small_problem()
+        collectors, artworks, scores = candidate_edges(
+            vectors, low, high, a_vectors, prices, candidates=2
+        )
+
+        assert np.all(low[collectors] <= prices[artworks])
+        assert np.all(high[collectors] >= prices[artworks])
+        assert np.bincount(collectors).max() <= 2
+        expected = vectors[collectors] @ a_vectors.T
+        assert np.allclose(
+            scores, expected[np.arange(len(scores)), artworks], atol=1e-5
+        )
+
+
+class TestAssignment:
+    def test_rounds_match_sequential_greedy(self):
+        edges = candidate_edges(*small_problem(300, 20))
+        chosen = greedy_assignment(edges, 3, 10)
+
+        assert np.array_equal(chosen, sequential_greedy(edges, 3, 10))
+        assert check_caps(edges, chosen, 3, 10)
+
+    def test_greedy_is_close_to_optimal(self):
+        edges = candidate_edges(*small_problem(150, 12, seed=4))
+        greedy = greedy_assignment(edges, 2, 6)
+        exact = exact_assignment(edges, 2, 6)
+
+        assert check_caps(edges, exact, 2, 6)
+        scores = edges[2]
+        assert scores[exact].sum() >= scores[greedy].sum() - 1e-6
+        assert scores[greedy].sum() >= 0.95 * scores[exact].sum()
+
+    def test_without_artwork_cap_each_collector_takes_its_best(self):
+        edges = candidate_edges(*small_problem())
+        chosen = greedy_assignment(edges, 2)
+        collectors, _, scores = edges
+
+        for collector in np.unique(collectors):
+            own = np.flatnonzero(collectors == collector)
+            best = own[np.argsort(-scores[own])[:2]]
+            assert set(best) == set(chosen[collectors[chosen] == collector])
+
+    def test_exact_solves_a_known_instance(self):
+        # Greedy takes the 0.9 edge and is left with 0.1; the optimum takes 0.8 twice
+        edges = (
+            np.array([0, 0, 1, 1]),
+            np.array([0, 1, 0, 1]),
+            np.array([0.9, 0.8, 0.8, 0.1]),
+        )
+
+        assert greedy_assignment(edges, 1, 1).tolist() == [0, 3]
+        assert exact_assignment(edges, 1, 1).tolist() == [1, 2]
+
+
+class TestAgentPlan:
+    def test_plan_notifications(self):
+        cloe = CloeAgent()
+        cloe.add_collectors(
+            [
+                {
+                    "collector_id": "a",
+                    "preferences": {"abstract": 1.0},
+                    "budget_min": 0,
+                    "budget_max": 500,
+                },
+                {
+                    "collector_id": "b",
+                    "preferences": {"fantasy": 1.0},
+                    "budget_min": 0,
+                    "budget_max": 100,
+                },
+            ]
+        )
+        plan = cloe.plan_notifications(
+            [
+                {"id": "w1", "style": "abstract", "price": 300},
+                {"id": "w2", "style": "fantasy", "price": 80},
+                {"id": "w3", "style": "fantasy", "price": 400},
+            ],
+            k=1,
+        )
+
+        assert plan == {
+            "a": [{"artwork_id": "w1", "match_score": 1.0}],
+            "b": [{"artwork_id": "w2", "match_score": 1.0}],
+        }
+
+    def test_plan_defaults_to_a_bounded_candidate_list(self, monkeypatch):
+        import cloe_agent
+
+        cloe = CloeAgent()
+        cloe.add_collectors(
+            [
+                {
+                    "collector_id": str(i),
+                    "preferences": {"abstract": 1.0},
+                    "budget_min": 0,
+                    "budget_max": 1000,
+                }
+                for i in range(5)
+            ]
+        )
+        sizes = []
+        real = cloe_agent.candidate_edges
+
+        def recording(*args, **kwargs):
+            edges = real(*args, **kwargs)
+            sizes.append(len(edges[2]))
+            return edges
+
+        monkeypatch.setattr(cloe_agent, "candidate_edges", recording)
+        artworks = [
+            {"id": f"w{i}", "style": "abstract", "price": 100} for i in range(40)
+        ]
+        plan = cloe.plan_notifications(artworks, k=2)
+
+        assert sizes == [5 * 8]
+        assert all(len(notes) == 2 for notes in plan.values())
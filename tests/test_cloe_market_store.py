@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from cloe_agent import CloeAgent
+from cloe_market_store import (
+    MarketStore,
+    group_medians,
+    synthetic_sales,
+    to_epoch_seconds,
+)
+
+DAY = 86400
+
+
+def small_store(count=5000, seed=0):
+    store = MarketStore(capacity=16)
+    store.append(*synthetic_sales(count, seed=seed, days=30))
+    return store
+
+
+def reference_medians(store, start=None, end=None):
+    rows = store.window(start, end)
+    names = store.names("category")
+    return {
+        names[code]: float(
+            np.median(rows["price"][rows["category"] == code].astype(np.float64))
+        )
+        for code in np.unique(rows["category"])
+    }
+
+
+class TestGroupMedians:
+    def test_matches_numpy_with_odd_even_and_empty_groups(self):
+        codes = np.array([0, 0, 0, 2, 2, 2, 2], dtype=np.uint16)
+        prices = np.array([5, 1, 3, 4, 1, 2, 10], dtype=np.float32)
+
+        medians = group_medians(codes, prices, 3)
+        assert medians[0] == 3
+        assert np.isnan(medians[1])
+        assert medians[2] == 3
+
+
+class TestMarketStore:
+    def test_window_medians_match_numpy(self):
+        store = small_store()
+        start = 1_700_000_000 + 10 * DAY
+        end = start + 7 * DAY
+
+        medians = store.median_price_by_category(start, end)
+        expected = reference_medians(store, start, end)
+        assert medians.keys() == expected.keys()
+        for name in expected:
+            assert medians[name] == pytest.approx(expected[name], rel=1e-6)
+
+    def test_negative_zero_and_plain_str_names(self):
+        store = MarketStore()
+        store.append([-0.0, 5, 7], [1, 2, 3], [np.str_("a")] * 3, ["x"] * 3, ["s"] * 3)
+
+        medians = store.median_price_by_category()
+        assert medians == {"a": 5.0}
+        assert all(type(name) is str for name in medians)
+
+    def test_group_stats_counts_and_means(self):
+        store = MarketStore()
+        store.append(
+            [10, 20, 30, 40],
+            [1, 2, 3, 4],
+            ["a", "a", "b", "b"],
+            ["x", "y", "x", "y"],
+            ["s", "s", "s", "t"],
+        )
+
+        assert store.group_stats("category") == {
+            "a": {"count": 2, "sum": 30.0, "mean": 15.0, "median": 15.0},
+            "b": {"count": 2, "sum": 70.0, "mean": 35.0, "median": 35.0},
+        }
+        assert store.group_stats("artist", start=2, stats=("count",)) == {
+            "x": {"count": 1},
+            "y": {"count": 2},
+        }
+        assert store.group_stats("style", category="b", stats=("median",)) == {
+            "s": {"median": 30.0},
+            "t": {"median": 40.0},
+        }
+        assert store.group_stats(category="unknown") == {}
+
+    def test_out_of_order_timestamps_fall_back_to_a_scan(self):
+        store = MarketStore()
+        store.append([1, 2], [100, 200], ["a", "a"], ["x", "x"], ["s", "s"])
+        store.append([3, 4], [50, 300], ["a", "a"], ["x", "x"], ["s", "s"])
+
+        assert store.get_stats()["time_sorted"] is False
+        assert sorted(store.window(start=60, end=250)["price"].tolist()) == [1, 2]
+
+    def test_iso_timestamps_and_validation(self):
+        store = MarketStore()
+        store.append_sale(12.5, "2024-03-01T12:00:00", "digital", "ada", "neon")
+        assert store.window(start="2024-03-01", end="2024-03-02")["price"].tolist() == [
+            12.5
+        ]
+
+        with pytest.raises(ValueError):
+            store.append_sale(-1, 0, "digital", "ada", "neon")
+        with pytest.raises(ValueError):
+            store.append([1, 2], [0], ["a"], ["b"], ["c"])
+
+    def test_iso_offsets_are_converted_to_utc(self):
+        assert (
+            to_epoch_seconds(
+                [
+                    "2024-03-01T12:00:00Z",
+                    "2024-03-01T14:00:00+02:00",
+                    "2024-03-01T12:00:00",
+                ]
+            ).tolist()
+            == [1709294400] * 3
+        )
+        assert to_epoch_seconds(np.datetime64("2024-03-01T12:00:00")).tolist() == [
+            1709294400
+        ]
+
+    def test_flush_and_reopen_mapped(self, tmp_path):
+        store = small_store(3000)
+        store.flush(str(tmp_path))
+        store.append(
+            *synthetic_sales(1000, seed=1, start=1_700_000_000 + 31 * DAY, days=5)
+        )
+        store.flush()
+
+        reopened = MarketStore.open(str(tmp_path))
+        assert len(reopened) == 4000
+        assert reopened.get_stats()["mapped"] is True
+        assert reopened.median_price_by_category() == store.median_price_by_category()
+
+        # Appending after open goes to the tail, and a flush persists only the new rows
+        reopened.append_sale(99, 1_800_000_000, "digital", "new artist", "neon")
+        reopened.flush()
+        again = MarketStore.open(str(tmp_path), mmap=False)
+        assert len(again) == 4001
+        assert again.names("artist")[-1] == "new artist"
+        assert again.get_stats()["time_sorted"] is True
+
+    def test_agent_records_sales(self):
+        cloe = CloeAgent()
+        cloe.record_sales(
+            [
+                {"price": 100, "timestamp": 10, "category": "digital", "artist": "a"},
+                {"price": 300, "timestamp": 20, "category": "digital", "artist": "b"},
+            ]
+        )
+        assert cloe.market_data.median_price_by_category() == {"digital": 200.0}
@@ -0,0 +1,107 @@
+import numpy as np
+
+from cloe_agent import CloeAgent
+from cloe_matching import (
+    CollectorIndex,
+    artwork_vector,
+    feature_vector,
+    synthetic_collectors,
+)
+
+
+def brute_force(index, query, k, price):
+    scores = index.scores(query)
+    eligible = (index._budget_min[: len(index)] <= price) & (
+        index._budget_max[: len(index)] >= price
+    )
+    order = np.argsort(np.where(eligible, scores, -np.inf))[::-1]
+    return [index.ids[row] for row in order[:k] if eligible[row]]
+
+
+class TestCollectorIndex:
+    def test_top_k_matches_a_full_sort(self):
+        index = CollectorIndex(capacity=16)  # grows several times
+        index.add(*synthetic_collectors(5000, seed=3))
+        rng = np.random.default_rng(0)
+
+        for price in (80.0, 250.0, 900.0):
+            query = rng.random(index.dim, dtype=np.float32)
+            matches = index.match(query, k=10, price=price)
+            assert [m["collector_id"] for m in matches] == brute_force(
+                index, query, 10, price
+            )
+            assert all(m["budget_min"] <= price <= m["budget_max"] for m in matches)
+
+    def test_budget_filter_can_leave_fewer_than_k(self):
+        index = CollectorIndex()
+        index.add_profiles(
+            [
+                {
+                    "collector_id": "a",
+                    "preferences": {"abstract": 1},
+                    "budget_min": 100,
+                    "budget_max": 300,
+                },
+                {
+                    "collector_id": "b",
+                    "preferences": {"abstract": 1},
+                    "budget_min": 500,
+                    "budget_max": 900,
+                },
+            ]
+        )
+
+        matches = index.match(artwork_vector("abstract"), k=5, price=200)
+        assert [m["collector_id"] for m in matches] == ["a"]
+        assert matches[0]["budget"] == "$100-300"
+        assert index.match(artwork_vector("abstract"), k=5, price=5000) == []
+
+    def test_readding_a_collector_replaces_its_row(self):
+        index = CollectorIndex()
+        profile = {
+            "collector_id": "x",
+            "preferences": {"fantasy": 1},
+            "budget_min": 0,
+            "budget_max": 100,
+        }
+        index.add_profiles([profile])
+        index.add_profiles([dict(profile, preferences={"vintage": 1})])
+
+        assert len(index) == 1
+        assert index.match(artwork_vector("vintage"), k=1)[0]["match_score"] == 1.0
+
+    def test_feature_vectors_are_unit_length(self):
+        vector = feature_vector({"abstract": 1.0, "neon": 0.5})
+        assert vector.dtype == np.float32
+        assert np.isclose(np.linalg.norm(vector), 1.0)
+
+
+class TestCloeAgent:
+    def test_match_collectors_ranks_by_style_and_budget(self):
+        cloe = CloeAgent()
+        cloe.add_collectors(
+            [
+                {
+                    "collector_id": "C001",
+                    "preferences": {"digital": 1.0},
+                    "budget_min": 200,
+                    "budget_max": 500,
+                },
+                {
+                    "collector_id": "C042",
+                    "preferences": {"digital": 0.5, "abstract": 1.0},
+                    "budget_min": 100,
+                    "budget_max": 300,
+                },
+                {
+                    "collector_id": "C156",
+                    "preferences": {"realistic": 1.0},
+                    "budget_min": 300,
+                    "budget_max": 800,
+                },
+            ]
+        )
+
+        matches = cloe.match_collectors("digital", price=250)
+        assert [m["collector_id"] for m in matches][:2] == ["C001", "C042"]
+        assert matches[0]["match_score"] > matches[1]["match_score"]
@@ -0,0 +1,110 @@
+import numpy as np
+
+from cloe_agent import CloeAgent
+from cloe_trends import (
+    artwork_features,
+    format_trends,
+    score_trends,
+    synthetic_catalog,
+    trending_styles,
+)
+
+
+class TestScoreTrends:
+    def test_batch_matches_one_at_a_time(self):
+        catalog = synthetic_catalog(200, seed=3)
+        batch = score_trends(artwork_features(catalog))
+        singles = [score_trends(artwork_features([artwork])) for artwork in catalog]
+
+        for key in ("trend_score", "recommended_price", "demand_level"):
+            assert np.allclose(batch[key], [single[key][0] for single in singles])
+
+    def test_momentum_and_engagement_raise_the_score(self):
+        scores = score_trends(
+            artwork_features(
+                [
+                    {"style": "vintage", "views": 10},
+                    {"style": "digital", "views": 10},
+                    {"style": "digital", "views": 5000, "favorites": 500},
+                ]
+            )
+        )
+        trend = scores["trend_score"]
+        assert trend[0] < trend[1] < trend[2]
+        assert scores["demand_level"][2] == 2
+
+    def test_created_at_gives_age(self):
+        features = artwork_features(
+            [{"created_at": "2024-01-01T00:00:00"}, {"age_days": 3}, {}],
+            now=np.datetime64("2024-01-11T00:00:00"),
+        )
+        assert features["age_days"][0] == 10
+        assert features["age_days"][1] == 3
+        assert np.isnan(features["age_days"][2])
+
+    def test_created_at_offsets_are_converted_to_utc(self):
+        features = artwork_features(
+            [
+                {"created_at": "2024-01-01T00:00:00Z"},
+                {"created_at": "2024-01-01T00:00:00+00:00"},
+                {"created_at": "2024-01-01T12:00:00+12:00"},
+                {"created_at": "2023-12-31T19:00:00-05:00"},
+            ],
+            now=np.datetime64("2024-01-11T00:00:00"),
+        )
+        assert features["age_days"].tolist() == [10, 10, 10, 10]
+
+    def test_collector_interest_counts_covering_budgets(self):
+        budgets = (np.array([0, 100, 1000.0]), np.array([50, 500, 5000.0]))
+        scores = score_trends(
+            artwork_features([{"price": 200, "style": "portrait"}]),
+            collector_budgets=budgets,
+        )
+        # Only the 100-500 collector covers a recommended price near 200-270
+        assert scores["collector_interest"][0] == 1 / 3
+
+    def test_format_keeps_the_original_shape(self):
+        scores = score_trends(artwork_features([{"style": "abstract", "price": 100}]))
+        (result,) = format_trends(scores, trending_styles())
+
+        assert set(result) == {
+            "trend_score",
+            "market_demand",
+            "recommended_price",
+            "best_time_to_sell",
+            "trending_styles",
+            "collector_interest",
+        }
+        assert result["recommended_price"].startswith("$")
+        assert result["trending_styles"] == ["digital art", "abstract", "fantasy"]
+
+
+class TestAgentBatch:
+    def test_seeded_results_are_reproducible(self):
+        cloe = CloeAgent()
+        catalog = synthetic_catalog(500)
+
+        first = cloe.analyze_market_trends_batch(catalog, seed=7)
+        assert first == cloe.analyze_market_trends_batch(catalog, seed=7)
+        assert first != cloe.analyze_market_trends_batch(catalog, seed=8)
+        assert len(first) == 500
+
+    def test_single_artwork_still_works(self):
+        cloe = CloeAgent()
+        result = cloe.analyze_market_trends(
+            {"description": "a fox", "style": "fantasy"}, seed=1
+        )
+        assert result == cloe.analyze_market_trends(
+            {"description": "a fox", "style": "fantasy"}, seed=1
+        )
+        assert 0 <= result["trend_score"] <= 1
+
+    def test_style_momentum_override(self):
+        cloe = CloeAgent()
+        cloe.trend_analysis["style_momentum"] = {"vintage": 1.0, "digital": -1.0}
+        vintage, digital = cloe.analyze_market_trends_batch(
+            [{"style": "vintage"}, {"style": "digital"}], seed=0
+        )
+
+        assert vintage["trend_score"] > digital["trend_score"]
+        assert vintage["trending_styles"] == ["vintage", "digital art"]
@@ -0,0 +1,41 @@
+from huraii_admission import AdmissionController
+
+
+def loaded_controller(step_latency, **kwargs):
+    controller = AdmissionController(target_p95=10.0, batch_size=4, **kwargs)
+    for _ in range(20):
+        controller.record(step_latency * 50, 50, 512, 512)
+    return controller
+
+
+class TestAdmissionController:
+    def test_idle_system_runs_full_quality(self):
+        decision = AdmissionController(target_p95=10.0).admit(50)
+        assert decision["tier"] == "full"
+        assert decision["num_inference_steps"] == 50
+        assert decision["degraded"] is False
+
+    def test_sustained_load_degrades_non_premium(self):
+        controller = loaded_controller(0.1, sustain_checks=3)
+        # 50 steps * 0.1s = 5s per batch; 12 queued = 4 batches -> 20s > 10s target
+        decisions = [controller.admit(50, queue_depth=12) for _ in range(3)]
+
+        assert [d["tier"] for d in decisions[:2]] == ["full", "full"]
+        assert decisions[2]["degraded"] is True
+        assert decisions[2]["num_inference_steps"] < 50
+
+    def test_premium_requests_keep_full_quality(self):
+        controller = loaded_controller(0.1, sustain_checks=1)
+        controller.admit(50, queue_depth=12)
+        decision = controller.admit(50, premium=True, queue_depth=12)
+        assert decision["tier"] == "full"
+        assert controller.get_stats()["current_tier"] != "full"
+
+    def test_recovers_one_tier_at_a_time(self):
+        controller = loaded_controller(0.1, sustain_checks=1, recover_checks=2)
+        controller.admit(50, queue_depth=40)
+        degraded = controller.get_stats()["current_tier"]
+        assert degraded == "minimal"
+
+        tiers = [controller.admit(50, queue_depth=0)["tier"] for _ in range(4)]
+        assert tiers == ["minimal", "economy", "economy", "reduced"]
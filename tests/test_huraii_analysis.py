@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import huraii_analysis
+from huraii_analysis import (
+    analyze_colors,
+    analyze_image_batch,
+    calculate_quality_score,
+    dominant_colors_batch,
+)
+
+
+def make_stack(n=4, height=48, width=40, seed=0):
+    rng = np.random.default_rng(seed)
+    noisy = rng.integers(0, 256, size=(n, height, width, 3), dtype=np.uint8)
+    # Smooth gradients exercise the low-sharpness end of the quality score
+    ramp = np.linspace(0, 255, width, dtype=np.float64)
+    noisy[0] = np.broadcast_to(ramp[None, :, None], (height, width, 3)).astype(np.uint8)
+    return noisy
+
+
+class TestAnalyzeImageBatch:
+    def test_matches_per_image_analysis(self):
+        stack = make_stack()
+        for img_array, result in zip(stack, analyze_image_batch(stack)):
+            assert result["color_analysis"] == analyze_colors(img_array)
+            assert result["quality_score"] == calculate_quality_score(img_array)
+
+    def test_color_stats_match_numpy(self):
+        for img_array in make_stack():
+            pixels = img_array.reshape(-1, 3)
+            colors = analyze_colors(img_array)
+            np.testing.assert_allclose(colors["average_rgb"], np.mean(pixels, axis=0))
+            np.testing.assert_allclose(
+                colors["color_variance"], np.var(pixels, axis=0), rtol=1e-9
+            )
+            assert colors["brightness"] == pytest.approx(np.mean(pixels))
+            assert colors["contrast"] == pytest.approx(np.std(pixels), rel=1e-9)
+
+    def test_chunked_processing_gives_same_results(self, monkeypatch):
+        stack = make_stack(n=5, seed=3)
+        whole = analyze_image_batch(stack)
+        monkeypatch.setattr(huraii_analysis, "BATCH_CHUNK_VALUES", 1)
+        assert analyze_image_batch(stack) == whole
+
+    def test_single_image_is_accepted(self):
+        image = make_stack(n=1)[0]
+        assert len(analyze_image_batch(image)) == 1
+
+    def test_rejects_non_uint8_stacks(self):
+        with pytest.raises(ValueError):
+            analyze_image_batch(np.zeros((2, 8, 8, 3), dtype=np.float32))
+
+
+class TestDominantColors:
+    def test_finds_flat_regions_with_weights(self):
+        image = np.zeros((40, 40, 3), dtype=np.uint8)
+        image[:, :30] = (200, 30, 30)
+        image[:, 30:] = (20, 20, 220)
+
+        palette = analyze_colors(image)["dominant_colors"]
+        assert palette == [
+            {"rgb": [200, 30, 30], "weight": 0.75},
+            {"rgb": [20, 20, 220], "weight": 0.25},
+        ]
+
+    def test_top_k_is_sorted_and_bounded(self):
+        stack = make_stack(n=2, height=64, width=64)
+        for palette in dominant_colors_batch(stack, k=7):
+            weights = [color["weight"] for color in palette]
+            assert len(palette) == 7
+            assert weights == sorted(weights, reverse=True)
+
+    def test_large_images_are_subsampled(self):
+        image = np.zeros((1, 512, 512, 3), dtype=np.uint8)
+        image[0, 256:] = 255
+        palette = dominant_colors_batch(image, max_samples=1024)[0]
+        assert [color["weight"] for color in palette] == [0.5, 0.5]
@@ -0,0 +1,161 @@
+import json
+import pytest
+from PIL import Image
+
+from huraii_batch_job import BatchGenerationJob, load_manifest
+
+
+def fake_generate(prompt, style="photorealistic", seed=None, **kwargs):
+    if prompt == "broken":
+        return {"error": "pipeline exploded"}
+    return {
+        "image": Image.new("RGB", (8, 8), (seed or 0, 0, 0)),
+        "generation_time": 0.01,
+        "analysis": {"quality_score": 0.5},
+        "output_id": f"out-{seed}",
+        "metadata": {"style": style, "seed": seed, "device_time": 0.25},
+    }
+
+
+def write_manifest(path, count=10):
+    items = [{"prompt": f"piece {i}", "seed": i} for i in range(count)]
+    path.write_text("\n".join(json.dumps(item) for item in items))
+    return load_manifest(str(path))
+
+
+def result_lines(run_dir):
+    return [
+        json.loads(line)
+        for line in (run_dir / "results.jsonl").read_text().splitlines()
+    ]
+
+
+class TestBatchGenerationJob:
+    def test_generates_every_item_and_reports_throughput(self, tmp_path):
+        manifest = write_manifest(tmp_path / "manifest.jsonl")
+        report = BatchGenerationJob(
+            fake_generate, manifest, str(tmp_path / "run")
+        ).run()
+
+        assert report["remaining"] == 0
+        assert report["this_run"]["completed"] == 10
+        assert report["this_run"]["gpu_seconds_per_image"] == 0.25
+        assert report["this_run"]["images_per_hour"] > 0
+        assert len(list((tmp_path / "run" / "images").iterdir())) == 10
+
+    def test_resume_skips_finished_items(self, tmp_path):
+        manifest = write_manifest(tmp_path / "manifest.jsonl")
+        calls = []
+
+        def counting(**item):
+            calls.append(item["seed"])
+            return fake_generate(**item)
+
+        run_dir = tmp_path / "run"
+        first = BatchGenerationJob(counting, manifest, str(run_dir)).run(limit=4)
+        assert first["remaining"] == 6
+
+        second = BatchGenerationJob(counting, manifest, str(run_dir)).run()
+        assert sorted(calls) == list(range(10))
+        assert second["all_runs"]["runs"] == 2
+        assert second["all_runs"]["completed"] == 10
+        assert len(result_lines(run_dir)) == 10
+
+    def test_stop_drains_in_flight_items(self, tmp_path):
+        manifest = write_manifest(tmp_path / "manifest.jsonl", count=20)
+        job = None
+
+        def stopping(**item):
+            if item["seed"] == 2:
+                job.stop()
+            return fake_generate(**item)
+
+        job = BatchGenerationJob(
+            stopping, manifest, str(tmp_path / "run"), concurrency=1
+        )
+        report = job.run()
+        assert report["stopped_early"] is True
+        assert report["this_run"]["completed"] == 3
+        assert report["remaining"] == 17
+
+    def test_torn_result_line_is_redone(self, tmp_path):
+        manifest = write_manifest(tmp_path / "manifest.jsonl", count=3)
+        run_dir = tmp_path / "run"
+        BatchGenerationJob(fake_generate, manifest, str(run_dir)).run(limit=2)
+        with open(run_dir / "results.jsonl", "a") as f:
+            f.write('{"id": "000002", "status": "comp')
+
+        report = BatchGenerationJob(fake_generate, manifest, str(run_dir)).run()
+        assert report["this_run"]["completed"] == 1
+        assert sorted(r["id"] for r in result_lines(run_dir)) == [
+            "000000",
+            "000001",
+            "000002",
+        ]
+
+    def test_failed_items_are_retried(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        path.write_text(
+            json.dumps([{"prompt": "broken"}, {"prompt": "fine", "seed": 1}])
+        )
+        manifest = load_manifest(str(path))
+        run_dir = tmp_path / "run"
+
+        report = BatchGenerationJob(fake_generate, manifest, str(run_dir)).run()
+        assert report["this_run"]["failed"] == 1
+        assert report["remaining"] == 1
+
+        report = BatchGenerationJob(fake_generate, manifest, str(run_dir)).run()
+        assert report["this_run"]["failed"] == 1
+        assert report["this_run"]["completed"] == 0
+
+    def test_refuses_to_resume_a_different_manifest(self, tmp_path):
+        run_dir = tmp_path / "run"
+        manifest = write_manifest(tmp_path / "a.jsonl", count=2)
+        BatchGenerationJob(fake_generate, manifest, str(run_dir)).run()
+
+        other = write_manifest(tmp_path / "b.jsonl", count=3)
+        with pytest.raises(ValueError):
+            BatchGenerationJob(fake_generate, other, str(run_dir)).run()
+        report = BatchGenerationJob(fake_generate, other, str(run_dir)).run(
+            restart=True
+        )
+        assert report["this_run"]["completed"] == 3
+
+    def test_manifest_is_checked_before_the_first_checkpoint(self, tmp_path):
+        class Crash(BaseException):
+            pass
+
+        def crash(**params):
+            raise Crash()
+
+        run_dir = tmp_path / "run"
+        manifest = write_manifest(tmp_path / "a.jsonl", count=2)
+        with pytest.raises(Crash):
+            BatchGenerationJob(crash, manifest, str(run_dir)).run()
+        assert not (run_dir / "checkpoint.json").exists()
+
+        other = write_manifest(tmp_path / "b.jsonl", count=3)
+        with pytest.raises(ValueError):
+            BatchGenerationJob(fake_generate, other, str(run_dir)).run()
+
+    def test_image_save_errors_fail_only_that_item(self, tmp_path):
+        class FullDisk:
+            def save(self, path, format=None):
+                raise OSError(28, "No space left on device")
+
+        def generate(prompt, seed=None, **kwargs):
+            result = fake_generate(prompt, seed=seed)
+            if seed == 1:
+                result["image"] = FullDisk()
+            return result
+
+        manifest = write_manifest(tmp_path / "manifest.jsonl", count=3)
+        run_dir = tmp_path / "run"
+        report = BatchGenerationJob(generate, manifest, str(run_dir)).run()
+
+        assert report["this_run"]["completed"] == 2
+        assert report["this_run"]["failed"] == 1
+        (failed,) = [r for r in result_lines(run_dir) if r["status"] == "failed"]
+        assert failed["id"] == manifest[1]["id"]
+        assert "No space left" in failed["error"]
@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from huraii_batching import BatchScheduler
+from huraii_stub_pipeline import StubDiffusionPipeline
+
+
+def make_scheduler(pipe, **kwargs):
+    def run_batch(prompts, seeds, params, step_callback=None):
+        return pipe(prompts, generator=seeds, **params).images
+
+    return BatchScheduler(run_batch, **kwargs)
+
+
+class TestBatchScheduler:
+    def test_concurrent_compatible_requests_share_a_batch(self):
+        pipe = StubDiffusionPipeline(step_time=0.001)
+        scheduler = make_scheduler(pipe, max_batch_size=4, max_wait_ms=200)
+        params = {"num_inference_steps": 5, "width": 64, "height": 64}
+
+        futures = [scheduler.submit(f"prompt {i}", seed=i, **params) for i in range(4)]
+        results = [f.result(timeout=5) for f in futures]
+        scheduler.shutdown()
+
+        assert pipe.calls == [4]
+        assert all(r.batch_size == 4 for r in results)
+        assert scheduler.get_stats()["batch_size_histogram"] == {4: 1}
+
+    def test_incompatible_params_are_not_mixed(self):
+        pipe = StubDiffusionPipeline(step_time=0.001)
+        scheduler = make_scheduler(pipe, max_batch_size=4, max_wait_ms=20)
+
+        a = scheduler.submit("a", num_inference_steps=5, width=64, height=64)
+        b = scheduler.submit("b", num_inference_steps=10, width=64, height=64)
+        assert a.result(timeout=5).batch_size == 1
+        assert b.result(timeout=5).batch_size == 1
+        scheduler.shutdown()
+
+        assert sorted(pipe.calls) == [1, 1]
+
+    def test_results_go_back_to_their_callers(self):
+        pipe = StubDiffusionPipeline(step_time=0.0)
+        scheduler = make_scheduler(pipe, max_batch_size=3, max_wait_ms=50)
+        params = {"num_inference_steps": 1, "width": 16, "height": 16}
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            futures = [
+                pool.submit(
+                    lambda i=i: scheduler.submit(f"p{i}", seed=i, **params).result()
+                )
+                for i in range(6)
+            ]
+            batched = [f.result(timeout=5).output.tobytes() for f in futures]
+        scheduler.shutdown()
+
+        single = [
+            pipe(f"p{i}", generator=i, **params).images[0].tobytes() for i in range(6)
+        ]
+        assert batched == single
+
+    def test_pipeline_errors_reach_every_caller(self):
+        def failing(prompts, seeds, params, step_callback=None):
+            raise RuntimeError("out of memory")
+
+        scheduler = BatchScheduler(failing, max_batch_size=2, max_wait_ms=50)
+        futures = [scheduler.submit("x"), scheduler.submit("y")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="out of memory"):
+                future.result(timeout=5)
+        scheduler.shutdown()
+
+        assert scheduler.get_stats()["failed_batches"] == 1
+
+    def test_stats_report_queue_wait(self):
+        pipe = StubDiffusionPipeline(step_time=0.0)
+        scheduler = make_scheduler(pipe, max_batch_size=8, max_wait_ms=30)
+        scheduler.submit("lonely", num_inference_steps=1, width=8, height=8).result(5)
+        scheduler.shutdown()
+
+        stats = scheduler.get_stats()
+        assert stats["requests_served"] == 1
+        assert stats["queue_wait_max_ms"] >= 25
+
+
+class TestPostprocessing:
+    def test_postprocess_results_reach_callers(self):
+        pipe = StubDiffusionPipeline(step_time=0.0)
+
+        def postprocess(outputs, contexts):
+            return [f"{c}:{o.size[0]}" for o, c in zip(outputs, contexts)]
+
+        scheduler = make_scheduler(
+            pipe, max_batch_size=2, max_wait_ms=20, postprocess=postprocess
+        )
+        futures = [
+            scheduler.submit(
+                f"p{i}", context=f"ctx{i}", num_inference_steps=1, width=8, height=8
+            )
+            for i in range(2)
+        ]
+        assert [f.result(5).post for f in futures] == ["ctx0:8", "ctx1:8"]
+        scheduler.shutdown()
+
+    def test_device_thread_does_not_wait_for_postprocessing(self):
+        pipe = StubDiffusionPipeline(step_time=0.0)
+        release = threading.Event()
+
+        def slow_postprocess(outputs, contexts):
+            release.wait(5)
+            return [None] * len(outputs)
+
+        scheduler = make_scheduler(
+            pipe,
+            max_batch_size=1,
+            max_wait_ms=0,
+            postprocess=slow_postprocess,
+            postprocess_workers=2,
+        )
+        params = {"num_inference_steps": 1, "width": 8, "height": 8}
+        futures = [scheduler.submit(f"p{i}", **params) for i in range(3)]
+        deadline = time.monotonic() + 5
+        while len(pipe.calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        # All three batches ran on the device while post-processing was blocked
+        assert pipe.calls == [1, 1, 1]
+        assert not any(f.done() for f in futures)
+        release.set()
+        assert all(f.result(5).batch_size == 1 for f in futures)
+        scheduler.shutdown()
+
+        stats = scheduler.get_stats()
+        assert stats["postprocess_pipelined"] is True
+        assert stats["requests_served"] == 3
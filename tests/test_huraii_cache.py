@@ -0,0 +1,178 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from huraii_cache import FlightAbandoned, GenerationCache, SingleFlight, generation_key
+
+
+def image(seed):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8), "RGB")
+
+
+def key(seed, steps=50):
+    return generation_key(
+        "a fox, fantasy art", seed, steps, 7.5, 512, 512, model_id="sd-1.5"
+    )
+
+
+class TestGenerationKey:
+    def test_key_covers_every_deterministic_parameter(self):
+        assert key(1) == key(1)
+        assert key(1) != key(2)
+        assert key(1) != key(1, steps=30)
+
+
+class TestGenerationCache:
+    def test_memory_tier_lru_eviction(self):
+        cache = GenerationCache(memory_items=2)
+        for seed in range(3):
+            cache.put(key(seed), image(seed), {"generation_time": 1.0})
+
+        assert cache.get(key(0)) is None
+        assert cache.get(key(2)) is not None
+        stats = cache.get_stats()
+        assert stats["memory_evictions"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        cache = GenerationCache(memory_items=1, disk_dir=tmp_path)
+        cache.put(key(7), image(7), {"generation_time": 4.2, "analysis": {"q": 1}})
+
+        reopened = GenerationCache(memory_items=1, disk_dir=tmp_path)
+        found = reopened.get(key(7))
+        assert found is not None
+        cached_image, metadata = found
+        assert cached_image.tobytes() == image(7).tobytes()
+        assert metadata == {"generation_time": 4.2, "analysis": {"q": 1}}
+        assert reopened.get_stats()["disk_hits"] == 1
+
+    def test_disk_tier_respects_size_cap(self, tmp_path):
+        cache = GenerationCache(memory_items=1, disk_dir=tmp_path, disk_max_bytes=3000)
+        for seed in range(10):
+            cache.put(key(seed), image(seed), {"generation_time": 1.0})
+
+        stats = cache.get_stats()
+        assert stats["disk_evictions"] > 0
+        assert stats["disk_mb"] * 1024**2 <= 3000
+        assert len(list(tmp_path.rglob("*.png"))) == stats["disk_items"]
+
+
+class TestSingleFlight:
+    def test_concurrent_identical_keys_run_once(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_render():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "image"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, "k", slow_render, lambda r: 2.0)
+            started.wait(5)
+            followers = [pool.submit(flight.do, "k", slow_render) for _ in range(3)]
+            while flight.get_stats()["coalesced"] < 3:
+                time.sleep(0.001)
+            release.set()
+
+            assert leader.result(5) == ("image", False)
+            assert [f.result(5) for f in followers] == [("image", True)] * 3
+
+        stats = flight.get_stats()
+        assert len(calls) == 1
+        assert stats["executions"] == 1
+        assert stats["gpu_seconds_saved"] == 6.0
+        assert stats["in_flight"] == 0
+
+    def test_errors_propagate_and_do_not_stick(self):
+        flight = SingleFlight()
+
+        def boom():
+            raise RuntimeError("CUDA error")
+
+        with pytest.raises(RuntimeError):
+            flight.do("k", boom)
+        assert flight.do("k", lambda: "ok") == ("ok", False)
+
+    def test_failing_cost_still_releases_followers(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def render():
+            started.set()
+            release.wait(5)
+            return "image"
+
+        def bad_cost(result):
+            raise ValueError("no timing")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", render, bad_cost)
+            started.wait(5)
+            follower = pool.submit(flight.do, "k", render)
+            while flight.get_stats()["coalesced"] < 1:
+                time.sleep(0.001)
+            release.set()
+
+            with pytest.raises(ValueError):
+                leader.result(5)
+            with pytest.raises(ValueError):
+                follower.result(5)
+        assert flight.in_flight() == 0
+
+    def test_progress_fans_out_until_every_caller_gives_up(self):
+        flight = SingleFlight()
+        joined = threading.Event()
+        seen = {"leader": [], "follower": []}
+
+        def leader_progress(step, total, latents=None):
+            if step > 2:
+                raise RuntimeError("leader cancelled")
+            seen["leader"].append(step)
+
+        def render(progress):
+            joined.wait(5)
+            for step in range(1, 6):
+                progress(step, 5)
+            return "image"
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(
+                flight.do, "k", render, progress=leader_progress, fan_out=True
+            )
+            while flight.in_flight() == 0:
+                time.sleep(0.001)
+            follower = pool.submit(
+                flight.do,
+                "k",
+                render,
+                progress=lambda step, total, latents=None: seen["follower"].append(
+                    step
+                ),
+                fan_out=True,
+            )
+            while flight.get_stats()["coalesced"] < 1:
+                time.sleep(0.001)
+            joined.set()
+
+            assert leader.result(5) == ("image", False)
+            assert follower.result(5) == ("image", True)
+        assert seen == {"leader": [1, 2], "follower": [1, 2, 3, 4, 5]}
+
+        def cancelled(step, total, latents=None):
+            raise RuntimeError("cancelled")
+
+        with pytest.raises(FlightAbandoned):
+            flight.do(
+                "k", lambda progress: progress(1, 5), progress=cancelled, fan_out=True
+            )
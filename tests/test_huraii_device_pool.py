@@ -0,0 +1,171 @@
+import os
+import signal
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+
+from huraii_batching import GenerationInterrupted
+from huraii_device_pool import FAILED, READY, DevicePool, StubWorker
+from huraii_gpu_engine import HuraiiGPUEngine
+from huraii_stub_pipeline import StubDiffusionPipeline
+
+PARAMS = {"num_inference_steps": 5, "width": 32, "height": 32}
+
+
+class MissingDeviceWorker(StubWorker):
+    """Fails to load on the device called "missing", like an absent GPU"""
+
+    def __init__(self, device, step_time=0.001):
+        if device == "missing":
+            raise RuntimeError("no such device")
+        super().__init__(device, step_time)
+
+
+def wait_until(predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(devices, factory=partial(StubWorker, step_time=0.001), **kwargs):
+        kwargs.setdefault("restart_backoff", 0.05)
+        pool = DevicePool(factory, devices, max_wait_ms=5, **kwargs)
+        pools.append(pool)
+        wait_until(lambda: all(w.state != "starting" for w in pool.workers))
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+class TestRouting:
+    def test_requests_spread_over_workers_and_match_a_single_device(self, make_pool):
+        pool = make_pool(["cpu", "cpu"], max_batch_size=1)
+
+        futures = [pool.submit(f"prompt {i}", seed=i, **PARAMS) for i in range(8)]
+        results = [f.result(timeout=20) for f in futures]
+
+        expected = StubDiffusionPipeline()(
+            [f"prompt {i}" for i in range(8)], generator=list(range(8)), **PARAMS
+        ).images
+        for result, image in zip(results, expected):
+            assert np.array_equal(np.asarray(result.output), np.asarray(image))
+
+        served = [w["batching"]["requests_served"] for w in pool.get_stats()["workers"]]
+        assert sum(served) == 8
+        assert min(served) >= 2
+
+    def test_failed_device_is_skipped(self, make_pool):
+        pool = make_pool(
+            ["cpu", "missing"], factory=MissingDeviceWorker, max_restarts=1
+        )
+        wait_until(lambda: pool.workers[1].state == FAILED)
+
+        results = [
+            pool.submit("p", seed=i, **PARAMS).result(timeout=20) for i in range(3)
+        ]
+
+        assert len(results) == 3
+        stats = pool.get_stats()
+        assert stats["ready_workers"] == 1
+        assert "no such device" in stats["workers"][1]["error"]
+
+    def test_wait_ready_raises_when_every_worker_fails(self, make_pool):
+        pool = make_pool(["missing"], factory=MissingDeviceWorker, max_restarts=0)
+
+        with pytest.raises(RuntimeError, match="every HURAII worker failed"):
+            pool.wait_ready(timeout=20)
+
+
+class TestFailover:
+    def test_requests_on_a_killed_worker_move_to_another(self, make_pool):
+        pool = make_pool(
+            ["cpu", "cpu"],
+            factory=partial(StubWorker, step_time=0.02),
+            max_batch_size=2,
+        )
+        params = dict(PARAMS, num_inference_steps=20)
+
+        futures = [pool.submit(f"p{i}", seed=i, **params) for i in range(4)]
+        wait_until(lambda: pool.workers[0].outstanding and pool.workers[0]._calls)
+        pool.workers[0].kill("test")
+
+        assert all(f.result(timeout=20).output.size == (32, 32) for f in futures)
+        assert pool.get_stats()["failovers"] >= 1
+
+        wait_until(lambda: pool.workers[0].state == READY)
+        assert pool.workers[0].restarts == 1
+
+    def test_unresponsive_worker_is_restarted(self, make_pool):
+        pool = make_pool(["cpu"], heartbeat_interval=0.05, heartbeat_timeout=0.5)
+        pid = pool.workers[0].info["pid"]
+
+        os.kill(pid, signal.SIGSTOP)
+        wait_until(lambda: pool.workers[0].restarts == 1)
+        wait_until(lambda: pool.workers[0].state == READY)
+
+        assert pool.workers[0].info["pid"] != pid
+        assert pool.submit("p", seed=1, **PARAMS).result(timeout=20).output is not None
+
+
+class TestProgress:
+    def test_progress_crosses_the_process_boundary(self, make_pool):
+        pool = make_pool(["cpu"])
+        steps = []
+
+        result = pool.submit(
+            "p",
+            seed=1,
+            progress=lambda s, t, latents: steps.append((s, latents.shape)),
+            **PARAMS,
+        ).result(timeout=20)
+
+        assert result.output is not None
+        assert [s for s, _ in steps] == [1, 2, 3, 4, 5]
+        assert steps[0][1] == (4, 4, 4)
+
+    def test_cancelled_progress_interrupts_the_run(self, make_pool):
+        pool = make_pool(["cpu"], factory=partial(StubWorker, step_time=0.01))
+
+        def progress(step, total, latents):
+            raise RuntimeError("cancelled")
+
+        future = pool.submit(
+            "p", seed=1, progress=progress, **dict(PARAMS, num_inference_steps=200)
+        )
+        with pytest.raises(GenerationInterrupted):
+            future.result(timeout=20)
+
+
+class TestEngineWithPool:
+    def test_engine_generates_through_device_workers(self):
+        engine = HuraiiGPUEngine(
+            model_id="stub",
+            devices=["cpu", "cpu"],
+            postprocess_workers=0,
+            output_workers=0,
+        )
+        try:
+            result = engine.generate_art("a harbour at dusk", seed=3)
+            assert "error" not in result
+            assert engine.get_status()["device"] == ["cpu", "cpu"]
+
+            stats = engine.get_gpu_stats()["batching"]
+            assert stats["devices"] == 2
+            assert stats["requests_served"] == 1
+
+            tile = result["image"].crop((0, 0, 64, 64))
+            refined = engine.refine_tiles([tile], "a harbour at dusk", 3, 5, 7.5)
+            assert np.array_equal(np.asarray(refined.images[0]), np.asarray(tile))
+            # Measured in the worker that ran the pipeline
+            assert refined.peak_bytes > 0
+        finally:
+            engine.pool.shutdown()
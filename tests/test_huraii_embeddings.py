@@ -0,0 +1,61 @@
+import numpy as np
+
+from huraii_embeddings import PromptEmbeddingCache, normalize_prompt
+
+
+class CountingEncoder:
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, prompts):
+        self.calls.append(list(prompts))
+        embeds = np.zeros((len(prompts), 77, self.dim), dtype=np.float32)
+        embeds[:, 0, 0] = [len(prompt) for prompt in prompts]
+        return embeds
+
+
+class TestPromptEmbeddingCache:
+    def test_only_unseen_prompts_are_encoded(self):
+        encoder = CountingEncoder()
+        cache = PromptEmbeddingCache(encoder)
+
+        cache.get(["a cat", "a dog"])
+        embeds = cache.get(["a dog", "a bird", "a cat"])
+
+        assert encoder.calls == [["a cat", "a dog"], ["a bird"]]
+        assert embeds.shape == (3, 77, 16)
+        assert embeds[:, 0, 0].tolist() == [5, 6, 5]
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (2, 3)
+        assert stats["hit_rate"] == 0.4
+
+    def test_prompts_are_normalized(self):
+        assert normalize_prompt("  A  Red\tFox ") == "a red fox"
+        encoder = CountingEncoder()
+        cache = PromptEmbeddingCache(encoder)
+        cache.get(["A red fox"])
+        cache.get(["a  red fox"])
+        assert len(encoder.calls) == 1
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        encoder = CountingEncoder()
+        per_prompt = 77 * 16 * 4
+        cache = PromptEmbeddingCache(encoder, max_bytes=per_prompt * 2)
+        cache.get(["one"])
+        cache.get(["two"])
+        cache.get(["one"])
+        cache.get(["three"])
+
+        assert len(cache) == 2
+        assert cache.get_stats()["evictions"] == 1
+        cache.get(["one"])
+        assert encoder.calls[-1] == ["three"]
+
+    def test_prewarm_counts_new_prompts_only(self):
+        cache = PromptEmbeddingCache(CountingEncoder())
+        assert cache.prewarm(["x", "y", "x"]) == 2
+        assert cache.prewarm(["y", "z"]) == 1
+        cache.get(["x"])
+        assert cache.get_stats()["prewarmed"] == 3
+        assert cache.get_stats()["hits"] == 1
@@ -0,0 +1,205 @@
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import huraii_gpu_engine
+from huraii_gpu_engine import HuraiiGPUEngine
+from huraii_telemetry import series
+
+
+def wait_for_state(engine, states, timeout=5):
+    deadline = time.monotonic() + timeout
+    while engine.get_status()["state"] not in states and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return engine.get_status()
+
+
+class TestLazyLoading:
+    def test_module_import_does_not_pull_heavy_dependencies(self):
+        code = (
+            "import sys, huraii_gpu_engine; "
+            "print(any(m in sys.modules for m in ('gradio', 'diffusers', 'torch')))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(huraii_gpu_engine.__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert out.stdout.strip() == "False"
+
+    def test_on_demand_stays_cold_until_first_request(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="on_demand")
+        assert engine.get_status()["state"] == "cold"
+
+        result = engine.generate_art("a lighthouse", seed=1)
+        assert "error" not in result
+        assert engine.get_status()["state"] == "ready"
+
+    def test_background_load_reports_timings(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="background")
+        status = wait_for_state(engine, ("ready", "failed"))
+
+        assert status["state"] == "ready"
+        assert status["device"] == "cpu"
+        assert {"engine_init", "model_load", "ready_after"} <= set(status["timings"])
+
+    def test_failed_load_is_reported(self, monkeypatch):
+        def broken_pipeline():
+            raise OSError("no weights")
+
+        monkeypatch.setattr(
+            "huraii_stub_pipeline.StubDiffusionPipeline", broken_pipeline
+        )
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="background")
+        status = wait_for_state(engine, ("ready", "failed"))
+
+        assert status["state"] == "failed"
+        assert status["error"] == "no weights"
+        with pytest.raises(RuntimeError, match="no weights"):
+            engine.ensure_ready(timeout=1)
+
+
+class TestGenerateArt:
+    def test_repeated_seeded_request_is_served_from_cache(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager")
+        first = engine.generate_art("a red fox", style="realistic", seed=7)
+        second = engine.generate_art("a red fox", style="realistic", seed=7)
+
+        assert first["metadata"]["cache_hit"] is False
+        assert second["metadata"]["cache_hit"] is True
+        assert first["image"].tobytes() == second["image"].tobytes()
+        assert engine.get_gpu_stats()["engine"]["state"] == "ready"
+
+    def test_renditions_are_encoded_once_per_generation(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager", output_workers=0)
+        first = engine.generate_art("a blue whale", seed=3)
+        second = engine.generate_art("a blue whale", seed=3)
+
+        assert first["output_id"] == second["output_id"]
+        assert set(first["renditions"]) == {"archival", "large", "medium", "small"}
+        assert engine.outputs.get_rendition(first["output_id"], "small")[1] == (
+            "image/jpeg"
+        )
+        assert engine.output_encoder.get_stats()["images_encoded"] == 1
+
+    def test_regenerated_image_is_flagged_as_near_duplicate(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager", output_workers=0)
+        first = engine.generate_art("a quiet harbor", seed=11)
+        engine.result_cache = type(engine.result_cache)(memory_items=0)
+        again = engine.generate_art("a quiet harbor", seed=11)
+
+        assert first["near_duplicates"] == []
+        assert again["near_duplicates"][0]["distance"] == 0
+        assert engine.get_gpu_stats()["duplicates"]["entries"] == 2
+
+    def test_history_is_indexed_in_the_background(self, tmp_path):
+        first = HuraiiGPUEngine(
+            model_id="stub", load_mode="eager", output_workers=0, history_dir=tmp_path
+        )
+        first.generate_art("a quiet harbor", seed=11)
+        first.generation_history.close()
+
+        engine = HuraiiGPUEngine(
+            model_id="stub", load_mode="eager", output_workers=0, history_dir=tmp_path
+        )
+        assert engine.duplicates_loaded.wait(5)
+        engine.result_cache = type(engine.result_cache)(memory_items=0)
+        again = engine.generate_art("a quiet harbor", seed=11)
+
+        assert again["near_duplicates"][0]["distance"] == 0
+        assert engine.get_gpu_stats()["duplicates"]["history_indexed"]
+        assert "phash_index" in engine.get_status()["timings"]
+
+    def test_history_log_retention_is_bounded_by_default(self, tmp_path):
+        engine = HuraiiGPUEngine(
+            model_id="stub", load_mode="on_demand", history_dir=tmp_path
+        )
+        assert engine.generation_history.max_segments == 16
+
+        unbounded = HuraiiGPUEngine(
+            model_id="stub",
+            load_mode="on_demand",
+            history_dir=tmp_path,
+            history_max_segments=0,
+        )
+        assert unbounded.generation_history.max_segments is None
+
+    def test_output_size_beyond_base_resolution_is_tiled(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager", output_workers=0)
+        result = engine.generate_art(
+            "a mountain range", seed=5, output_size=(1024, 768)
+        )
+
+        assert result["image"].size == (1024, 768)
+        assert result["metadata"]["resolution"] == "1024x768"
+        assert result["metadata"]["tiling"]["tiles"] > 1
+
+    def test_output_size_is_validated_and_capped(self):
+        engine = HuraiiGPUEngine(
+            model_id="stub", load_mode="eager", output_workers=0, max_output_side=2048
+        )
+        for size in ((100_000, 100_000), (4096, 512), (0, 512), ("wide", 512), 512):
+            assert "error" in engine.generate_art("a big canvas", output_size=size)
+        assert engine.batcher.get_stats()["requests_served"] == 0
+
+    def test_prompt_embeddings_are_reused(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager", output_workers=0)
+        first = engine.generate_art("an old lighthouse", seed=1)
+        second = engine.generate_art("an old lighthouse", seed=2)
+        reference = engine.sd_pipe(
+            engine.enhance_prompt("an old lighthouse", "photorealistic"),
+            generator=1,
+            num_inference_steps=1,
+            width=first["image"].size[0],
+            height=first["image"].size[1],
+        ).images[0]
+
+        assert first["image"].tobytes() == reference.tobytes()
+        assert second["image"].tobytes() != first["image"].tobytes()
+        stats = engine.get_gpu_stats()["embeddings"]
+        assert (
+            stats["hits"] >= 2
+        )  # negative prompt on the first run, both on the second
+        assert engine.sd_pipe.encoded.count("") == 1
+
+    def test_cancelling_the_leader_does_not_fail_coalesced_jobs(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="eager", output_workers=0)
+        engine.sd_pipe.step_time = 0.01
+        leader = engine.jobs.submit(prompt="a slow tide", seed=21)["job_id"]
+        while engine.jobs.get_status(leader)["step"] < 2:
+            time.sleep(0.002)
+        follower = engine.jobs.submit(prompt="a slow tide", seed=21)["job_id"]
+        while engine.single_flight.get_stats()["coalesced"] < 1:
+            time.sleep(0.002)
+        assert engine.jobs.cancel(leader)
+
+        deadline = time.monotonic() + 10
+        while engine.jobs.get_status(follower)["status"] in ("queued", "running"):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        status = engine.jobs.get_status(follower)
+        assert status["status"] == "completed"
+        assert status["step"] == status["total_steps"] > 0
+        assert engine.jobs.get_status(leader)["status"] == "cancelled"
+
+
+class TestTelemetry:
+    def test_worker_rss_waits_for_the_worker_pid(self):
+        engine = HuraiiGPUEngine(model_id="stub", load_mode="on_demand")
+        starting = SimpleNamespace(index=0, info={}, device="cpu", memory=None)
+        running = SimpleNamespace(
+            index=1, info={"pid": os.getpid()}, device="cpu", memory=None
+        )
+        engine.pool = SimpleNamespace(
+            workers=[starting, running], ready_workers=lambda: [running]
+        )
+
+        gauges = engine.telemetry_gauges()
+        assert series("host_rss_bytes", worker=0) not in gauges
+        assert gauges[series("host_rss_bytes", worker=1)] > 0
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from huraii_history import GenerationHistory
+
+START = datetime(2026, 1, 1)
+
+
+def entry(i):
+    return {
+        "timestamp": (START + timedelta(minutes=i)).isoformat(),
+        "prompt": f"prompt {i}",
+        "analysis": {"quality_score": 0.5},
+    }
+
+
+def fill(history, count):
+    for i in range(count):
+        history.append(entry(i))
+
+
+class TestGenerationHistory:
+    def test_memory_only_ring_is_bounded(self):
+        history = GenerationHistory(capacity=5)
+        fill(history, 12)
+
+        assert len(history) == 5
+        assert [e["prompt"] for e in history.last(3)] == [
+            "prompt 9",
+            "prompt 10",
+            "prompt 11",
+        ]
+        assert len(history.last(50)) == 5
+
+    def test_segments_rotate_by_size(self, tmp_path):
+        history = GenerationHistory(capacity=5, log_dir=tmp_path, segment_max_bytes=500)
+        fill(history, 40)
+        history.close()
+
+        segments = sorted(tmp_path.iterdir())
+        assert len(segments) > 1
+        assert all(p.stat().st_size < 500 + 200 for p in segments)
+        assert history.get_stats()["log_segments"] == len(segments)
+
+    def test_last_reaches_past_the_ring(self, tmp_path):
+        history = GenerationHistory(capacity=5, log_dir=tmp_path, segment_max_bytes=500)
+        fill(history, 40)
+
+        last = history.last(25)
+        assert [e["prompt"] for e in last] == [f"prompt {i}" for i in range(15, 40)]
+
+    def test_time_range_query(self, tmp_path):
+        history = GenerationHistory(capacity=5, log_dir=tmp_path, segment_max_bytes=500)
+        fill(history, 40)
+
+        found = list(
+            history.between(
+                START + timedelta(minutes=10), START + timedelta(minutes=20)
+            )
+        )
+        assert [e["prompt"] for e in found] == [f"prompt {i}" for i in range(10, 20)]
+
+    def test_reopened_log_is_queryable(self, tmp_path):
+        history = GenerationHistory(capacity=5, log_dir=tmp_path, segment_max_bytes=500)
+        fill(history, 30)
+        history.close()
+
+        reopened = GenerationHistory(
+            capacity=5, log_dir=tmp_path, segment_max_bytes=500
+        )
+        assert len(reopened) == 0
+        assert reopened.last(2)[-1]["prompt"] == "prompt 29"
+        assert sum(1 for _ in reopened.iter_log()) == 30
+
+    def test_iter_log_leaves_out_later_appends(self, tmp_path):
+        history = GenerationHistory(capacity=5, log_dir=tmp_path)
+        fill(history, 3)
+        stream = history.iter_log()
+        history.append(entry(3))
+
+        assert [e["prompt"] for e in stream] == ["prompt 0", "prompt 1", "prompt 2"]
+
+    def test_max_segments_drops_oldest(self, tmp_path):
+        history = GenerationHistory(
+            capacity=5, log_dir=tmp_path, segment_max_bytes=500, max_segments=2
+        )
+        fill(history, 40)
+
+        assert len(list(tmp_path.iterdir())) == 2
+        assert history.last(40)[-1]["prompt"] == "prompt 39"
+        assert len(history.last(40)) < 40
@@ -0,0 +1,186 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from huraii_batching import BatchScheduler
+from huraii_jobs import JobManager, latents_to_preview, mount_job_routes
+from huraii_stub_pipeline import StubDiffusionPipeline
+
+
+def make_manager(step_time=0.002, steps=20, **kwargs):
+    pipe = StubDiffusionPipeline(step_time=step_time)
+
+    def run_batch(prompts, seeds, params, step_callback):
+        def on_step_end(p, step, timestep, callback_kwargs):
+            if step_callback(
+                step + 1, params["num_inference_steps"], callback_kwargs["latents"]
+            ):
+                p._interrupt = True
+            return callback_kwargs
+
+        return pipe(
+            prompts, generator=seeds, callback_on_step_end=on_step_end, **params
+        ).images
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=2, max_wait_ms=5)
+
+    def run_job(job, prompt, seed=None):
+        try:
+            item = scheduler.submit(
+                prompt,
+                seed=seed,
+                progress=job.report_progress,
+                num_inference_steps=steps,
+                width=32,
+                height=32,
+            ).result()
+        except Exception as e:
+            return {"error": str(e)}
+        return {"image": item.output, "prompt": prompt}
+
+    return JobManager(run_job, **kwargs), pipe
+
+
+def wait_for(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.get_status(job_id)
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(0.005)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class TestJobManager:
+    def test_submit_returns_immediately_and_completes(self):
+        manager, _ = make_manager()
+        submitted = manager.submit(prompt="a castle", seed=1)
+        assert submitted["status"] == "queued"
+
+        status = wait_for(manager, submitted["job_id"])
+        assert status["status"] == "completed"
+        assert status["step"] == status["total_steps"] == 20
+        assert manager.get_result(submitted["job_id"])["prompt"] == "a castle"
+
+    def test_stream_reports_increasing_progress(self):
+        manager, _ = make_manager()
+        job_id = manager.submit(prompt="a river")["job_id"]
+
+        updates = list(manager.stream(job_id))
+        steps = [u["step"] for u in updates]
+        assert steps == sorted(steps)
+        assert updates[-1]["status"] == "completed"
+
+    def test_cancel_running_job_interrupts_pipeline(self):
+        manager, pipe = make_manager(step_time=0.01, steps=200)
+        job_id = manager.submit(prompt="a storm")["job_id"]
+        while manager.get_status(job_id)["step"] < 2:
+            time.sleep(0.005)
+
+        assert manager.cancel(job_id)
+        assert wait_for(manager, job_id)["status"] == "cancelled"
+        assert "error" in manager.get_result(job_id)
+
+    def test_running_job_times_out(self):
+        manager, _ = make_manager(step_time=0.01, steps=500)
+        job_id = manager.submit(prompt="slow", timeout=0.1)["job_id"]
+        assert wait_for(manager, job_id)["status"] == "timed_out"
+
+    def test_requested_timeouts_are_clamped(self):
+        manager = JobManager(
+            lambda job, **params: {"ok": True}, default_timeout=30, max_timeout=60
+        )
+        for requested, allowed in ((1e12, 60), (float("nan"), 30), (-5, 30)):
+            job_id = manager.submit(timeout=requested)["job_id"]
+            remaining = manager._jobs[job_id].deadline - time.monotonic()
+            assert allowed - 1 < remaining <= allowed
+
+    def test_queue_depth_is_bounded(self):
+        release = threading.Event()
+
+        def blocked(job, **params):
+            release.wait(5)
+            return {"ok": True}
+
+        manager = JobManager(blocked, max_queue=2, workers=1)
+        first = manager.submit()["job_id"]
+        while manager.get_status(first)["status"] != "running":
+            time.sleep(0.001)
+
+        assert "job_id" in manager.submit()
+        assert "job_id" in manager.submit()
+        assert manager.submit() == {"error": "queue full", "queue_depth": 2}
+        release.set()
+        assert manager.get_stats()["rejected"] == 1
+
+    def test_preview_from_latents(self):
+        latents = [[[0.0] * 8] * 8] * 4
+        assert latents_to_preview(latents).size == (8, 8)
+
+
+class TestJobRoutes:
+    def test_premium_comes_from_the_api_key_not_the_body(self):
+        seen = []
+
+        def run_job(job, premium=False, **params):
+            seen.append(premium)
+            return {"ok": True}
+
+        manager = JobManager(run_job, workers=1)
+        app = FastAPI()
+        mount_job_routes(app, manager, premium_keys=["s3cret"])
+        client = TestClient(app)
+
+        for headers in ({}, {"X-API-Key": "wrong"}, {"X-API-Key": "s3cret"}):
+            job_id = client.post(
+                "/jobs", json={"prompt": "a harbor"}, headers=headers
+            ).json()["job_id"]
+            wait_for(manager, job_id)
+        assert seen == [False, False, True]
+
+        body = {"prompt": "a harbor", "premium": True}
+        assert client.post("/jobs", json=body).status_code == 422
+
+    def test_job_bodies_are_typed_and_bounded(self):
+        seen = []
+
+        def run_job(job, **params):
+            seen.append(params)
+            return {"ok": True}
+
+        manager = JobManager(run_job, workers=1, max_timeout=60)
+        app = FastAPI()
+        mount_job_routes(app, manager, styles=["artistic"], max_output_side=1024)
+        client = TestClient(app)
+
+        for body in (
+            {},
+            {"prompt": ""},
+            {"prompt": "x" * 5000},
+            {"prompt": "a harbor", "style": "unknown"},
+            {"prompt": "a harbor", "quality": "ultra"},
+            {"prompt": "a harbor", "seed": -1},
+            {"prompt": "a harbor", "timeout": "soon"},
+            {"prompt": "a harbor", "timeout": 3600},
+            {"prompt": "a harbor", "output_size": [4096, 4096]},
+            {"prompt": "a harbor", "steps": 500},
+        ):
+            assert client.post("/jobs", json=body).status_code == 422, body
+
+        body = {"prompt": "a harbor", "style": "artistic", "seed": 7, "timeout": 30}
+        job_id = client.post("/jobs", json=dict(body, output_size=[512, 768])).json()[
+            "job_id"
+        ]
+        wait_for(manager, job_id)
+        assert seen == [
+            {
+                "prompt": "a harbor",
+                "style": "artistic",
+                "quality": "high",
+                "seed": 7,
+                "output_size": (512, 768),
+                "premium": False,
+            }
+        ]
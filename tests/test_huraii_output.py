@@ -0,0 +1,120 @@
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from huraii_output import (
+    OutputEncoder,
+    Rendition,
+    RenditionStore,
+    encode_renditions,
+    mount_output_routes,
+    parse_renditions,
+)
+from huraii_stub_pipeline import StubDiffusionPipeline
+
+
+def make_image(size=512, seed=0):
+    # Upscaled stub noise: smooth like real artwork, unlike raw noise
+    pipe = StubDiffusionPipeline(step_time=0.0)
+    image = pipe(
+        "gallery piece", generator=seed, num_inference_steps=1, width=16, height=16
+    ).images[0]
+    return image.resize((size, size), Image.BICUBIC)
+
+
+class TestEncoding:
+    def test_default_renditions_have_expected_formats_and_sizes(self):
+        encoded = OutputEncoder(workers=0).encode(make_image())
+
+        assert encoded["archival"]["format"] == "PNG"
+        assert (encoded["archival"]["width"], encoded["archival"]["height"]) == (
+            512,
+            512,
+        )
+        assert encoded["medium"]["format"] == "WEBP"
+        assert max(encoded["medium"]["width"], encoded["medium"]["height"]) == 256
+        assert encoded["small"]["format"] == "JPEG"
+
+        for rendition in encoded.values():
+            with Image.open(io.BytesIO(rendition["data"])) as decoded:
+                assert decoded.format == rendition["format"]
+                assert decoded.size == (rendition["width"], rendition["height"])
+
+    def test_archival_png_is_lossless(self):
+        image = make_image(size=64)
+        encoded = encode_renditions(image, [Rendition("archival", "PNG", None, {})])
+
+        with Image.open(io.BytesIO(encoded["archival"]["data"])) as decoded:
+            assert decoded.tobytes() == image.tobytes()
+
+    def test_thumbnails_are_smaller_than_raw_pixels(self):
+        encoder = OutputEncoder(workers=0)
+        encoded = encoder.encode(make_image())
+
+        assert len(encoded["large"]["data"]) < 512 * 512 * 3 / 10
+        assert encoder.get_stats()["images_encoded"] == 1
+
+    def test_process_pool_matches_inline_encoding(self):
+        image = make_image(size=128)
+        pooled = OutputEncoder(workers=1)
+        try:
+            result = pooled.submit(image).result(timeout=60)
+        finally:
+            pooled.shutdown()
+
+        inline = OutputEncoder(workers=0).encode(image)
+        assert {name: r["data"] for name, r in result.items()} == {
+            name: r["data"] for name, r in inline.items()
+        }
+
+    def test_parse_renditions(self):
+        renditions = parse_renditions("archival:png,thumb:jpg:96:70")
+        assert renditions == [
+            Rendition("archival", "PNG", None, {}),
+            Rendition("thumb", "JPEG", 96, {"quality": 70}),
+        ]
+        with pytest.raises(ValueError):
+            parse_renditions("thumb:gif:96")
+
+
+class TestRenditionStore:
+    def test_disk_copy_survives_restart(self, tmp_path):
+        encoded = OutputEncoder(workers=0).encode(make_image(size=128))
+        RenditionStore(disk_dir=str(tmp_path)).put("ab" * 32, encoded)
+
+        reopened = RenditionStore(disk_dir=str(tmp_path))
+        data, media_type = reopened.get_rendition("ab" * 32, "medium")
+        assert data == encoded["medium"]["data"]
+        assert media_type == "image/webp"
+        assert reopened.get_stats()["disk_hits"] == 1
+
+    def test_memory_tier_is_bounded(self):
+        encoded = OutputEncoder(workers=0).encode(make_image(size=128))
+        size = sum(len(r["data"]) for r in encoded.values())
+        store = RenditionStore(memory_bytes=int(size * 2.5))
+        for i in range(5):
+            store.put(f"{i:064x}", encoded)
+
+        assert store.get_stats()["memory_items"] == 2
+        assert store.get(f"{0:064x}") is None
+        assert store.get(f"{4:064x}") is not None
+
+    def test_ids_outside_the_digest_format_never_touch_disk(self, tmp_path):
+        secret = tmp_path / "secret"
+        secret.mkdir()
+        (secret / "archival.png").write_bytes(b"not for you")
+        store = RenditionStore(disk_dir=str(tmp_path / "outputs"))
+
+        for output_id in ("../secret", "..", "AB" * 32, "ab" * 31, "ab" * 33):
+            assert store.get(output_id) is None
+        with pytest.raises(ValueError):
+            store.put("../secret", {})
+
+        app = FastAPI()
+        mount_output_routes(app, store)
+        client = TestClient(app)
+        assert client.get("/outputs/..%2Fsecret").status_code == 404
+        assert client.get("/outputs/..%2Fsecret/archival").status_code == 404
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance
+
+from huraii_history import GenerationHistory
+from huraii_phash import (
+    PerceptualHashIndex,
+    hash_to_hex,
+    phash_batch,
+    popcount,
+)
+from huraii_stub_pipeline import StubDiffusionPipeline
+
+
+def artwork(seed, size=256):
+    pipe = StubDiffusionPipeline(step_time=0.0)
+    image = pipe(
+        "piece", generator=seed, num_inference_steps=1, width=16, height=16
+    ).images[0]
+    return image.resize((size, size), Image.BICUBIC)
+
+
+def distance(a, b):
+    return int(popcount(np.uint64(a) ^ np.uint64(b)))
+
+
+class TestPhash:
+    def test_survives_resizing_and_brightness_changes(self):
+        original = artwork(1)
+        variants = [
+            original.resize((128, 128), Image.LANCZOS),
+            ImageEnhance.Brightness(original).enhance(1.2),
+        ]
+        base = phash_batch(np.asarray(original))[0]
+        for variant in variants:
+            assert distance(base, phash_batch(np.asarray(variant))[0]) <= 4
+
+    def test_different_images_are_far_apart(self):
+        hashes = phash_batch(np.stack([np.asarray(artwork(seed)) for seed in range(6)]))
+        for i in range(len(hashes)):
+            for j in range(i + 1, len(hashes)):
+                assert distance(hashes[i], hashes[j]) > 12
+
+
+class TestPerceptualHashIndex:
+    def test_query_matches_linear_scan(self):
+        rng = np.random.default_rng(0)
+        codes = rng.integers(0, 2**64, size=5000, dtype=np.uint64)
+        index = PerceptualHashIndex(merge_threshold=64)
+        index.add_many(codes[:4000], range(4000))
+        for i in range(4000, 5000):
+            index.add(codes[i], i)
+
+        for target in rng.integers(0, 5000, size=50):
+            query = codes[target] ^ np.uint64(0b1011)
+            for max_distance in (0, 3, 7, 11):
+                found = index.query(query, max_distance=max_distance)
+                scan = np.flatnonzero(popcount(codes ^ query) <= max_distance)
+                assert sorted(item for item, _ in found) == sorted(scan.tolist())
+
+    def test_results_are_closest_first(self):
+        index = PerceptualHashIndex()
+        index.add_many([0b1111, 0b1, 0b0], ["far", "near", "same"])
+        assert index.query(0, max_distance=4) == [
+            ("same", 0),
+            ("near", 1),
+            ("far", 4),
+        ]
+
+    def test_rejects_unsupported_distance(self):
+        with pytest.raises(ValueError):
+            PerceptualHashIndex().query(0, max_distance=12)
+
+    def test_bulk_build_from_generation_log(self, tmp_path):
+        history = GenerationHistory(log_dir=str(tmp_path))
+        history.append({"output_id": "a", "phash": hash_to_hex(0xFF)})
+        history.append(
+            {"output_id": "b", "phash": hash_to_hex(0xFF), "cache_hit": True}
+        )
+        history.append(
+            {"output_id": "a", "phash": hash_to_hex(0xFF), "coalesced": True}
+        )
+        history.append({"output_id": "c"})
+        history.close()
+
+        index = PerceptualHashIndex.from_log(
+            GenerationHistory(log_dir=str(tmp_path)).iter_log()
+        )
+        assert len(index) == 1
+        assert index.query(0xFE, max_distance=1) == [("a", 1)]
@@ -0,0 +1,175 @@
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import huraii_telemetry
+from huraii_gpu_engine import HuraiiGPUEngine
+from huraii_telemetry import (
+    RingBuffer,
+    TelemetrySampler,
+    device_memory,
+    note_device_peak,
+    process_rss,
+    series,
+)
+
+
+class FakeCuda:
+    """Just enough of torch.cuda for the allocator gauges"""
+
+    def __init__(self):
+        self.allocated = 0
+        self.peak = 0
+
+    def is_available(self):
+        return True
+
+    def current_device(self):
+        return 0
+
+    def memory_allocated(self, device=None):
+        return self.allocated
+
+    def memory_reserved(self, device=None):
+        return self.allocated
+
+    def max_memory_allocated(self, device=None):
+        return self.peak
+
+    def reset_peak_memory_stats(self, device=None):
+        self.peak = self.allocated
+
+
+class TestRingBuffer:
+    def test_keeps_the_latest_values_in_order(self):
+        buffer = RingBuffer(4)
+        for value in range(6):
+            buffer.append(value)
+
+        assert buffer.values().tolist() == [2, 3, 4, 5]
+        assert len(buffer) == 4
+
+    def test_late_series_is_padded_to_align(self):
+        buffer = RingBuffer(4, start=2)
+        buffer.append(7)
+
+        values = buffer.values()
+        assert np.isnan(values[:2]).all() and values[2] == 7
+
+
+class TestSampler:
+    def test_sample_records_gauges_and_host_rss(self):
+        depth = iter(range(10))
+        sampler = TelemetrySampler(lambda: {"queue_depth": next(depth)}, capacity=8)
+        for _ in range(3):
+            sampler.sample()
+
+        snapshot = sampler.snapshot(history=True)
+        assert snapshot["gauges"]["queue_depth"]["values"] == [0, 1, 2]
+        assert snapshot["gauges"]["host_rss_bytes"]["latest"] > 0
+        assert snapshot["sampler"]["samples"] == 3
+        # No CUDA here: no device series, and the snapshot says so
+        assert snapshot["gpu_available"] is False
+
+    def test_missing_values_and_collect_errors(self):
+        calls = iter([{"a": 1}, {}, RuntimeError("boom")])
+
+        def collect():
+            value = next(calls)
+            if isinstance(value, Exception):
+                raise value
+            return value
+
+        sampler = TelemetrySampler(collect)
+        for _ in range(3):
+            sampler.sample()
+
+        snapshot = sampler.snapshot(history=True)
+        assert snapshot["gauges"]["a"]["values"] == [1, None, None]
+        assert snapshot["sampler"]["collect_errors"] == 1
+
+    def test_stage_quantiles(self):
+        sampler = TelemetrySampler(stage_capacity=100)
+        for ms in range(1, 101):
+            sampler.record_stages({"device": ms / 1000, "tiling": None})
+
+        stages = sampler.snapshot()["stages"]
+        assert set(stages) == {"device"}
+        assert stages["device"]["count"] == 100
+        assert abs(stages["device"]["p50"] - 0.0505) < 1e-3
+        assert stages["device"]["p99"] > 0.098
+
+    def test_prometheus_text(self):
+        sampler = TelemetrySampler(
+            lambda: {"queue_depth": 3, series("host_rss_bytes", worker=0): 1024}
+        )
+        sampler.sample()
+        sampler.record_stages({"total": 0.5})
+
+        text = sampler.prometheus()
+        lines = text.splitlines()
+        assert "# TYPE huraii_queue_depth gauge" in lines
+        assert "huraii_queue_depth 3" in lines
+        assert 'huraii_host_rss_bytes{worker="0"} 1024' in lines
+        assert lines.count("# TYPE huraii_host_rss_bytes gauge") == 1
+        assert 'huraii_stage_seconds_count{stage="total"} 1' in lines
+        assert "nan" not in text.lower()
+
+    def test_slow_collection_stretches_the_interval(self):
+        def slow():
+            time.sleep(0.02)
+            return {}
+
+        sampler = TelemetrySampler(slow, interval=0.01, max_overhead=0.5)
+        sampler.start()
+        time.sleep(0.3)
+        sampler.stop()
+
+        stats = sampler.get_stats()
+        assert stats["effective_interval"] >= 0.04
+        assert stats["overhead_ratio"] <= 0.6
+
+    def test_process_rss(self):
+        assert process_rss() > 0
+        assert process_rss(pid=2**22 + 1) is None
+
+    def test_process_rss_without_procfs_or_resource(self, monkeypatch):
+        def no_procfs(*args, **kwargs):
+            raise OSError("no /proc")
+
+        monkeypatch.setattr(huraii_telemetry, "open", no_procfs, raising=False)
+        assert process_rss() > 0  # getrusage fallback
+        monkeypatch.setattr(huraii_telemetry, "resource", None)
+        assert process_rss() is None
+
+    def test_peak_gauge_survives_allocator_resets(self, monkeypatch):
+        cuda = FakeCuda()
+        fake_torch = SimpleNamespace(
+            cuda=cuda, device=lambda d: SimpleNamespace(index=None)
+        )
+        monkeypatch.setitem(sys.modules, "torch", fake_torch)
+        monkeypatch.setattr(huraii_telemetry, "_device_peaks", {})
+
+        cuda.peak = 8 << 20
+        note_device_peak()  # what the tiler does before resetting
+        cuda.reset_peak_memory_stats()
+        cuda.peak = 2 << 20
+
+        assert device_memory("cuda")["peak"] == 8 << 20
+
+
+class TestEngineTelemetry:
+    def test_generation_stages_and_gauges(self):
+        engine = HuraiiGPUEngine(model_id="stub", telemetry_interval=0)
+        engine.generate_art("a quiet harbour", seed=5)
+        engine.generate_art("a quiet harbour", seed=5)
+        engine.telemetry.sample()
+
+        snapshot = engine.telemetry.snapshot()
+        assert snapshot["stages"]["device"]["count"] == 1
+        assert snapshot["stages"]["cache_hit"]["count"] == 1
+        assert snapshot["gauges"]["queue_depth"]["latest"] == 0
+        assert snapshot["gauges"]["ready"]["latest"] == 1
+        assert "telemetry" in engine.get_gpu_stats()
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.main import app
+from server.services.trends import TrendAggregator, trend_aggregator
+
+HOUR = 3600
+NOW = 1_700_000_000 // HOUR * HOUR + HOUR - 1  # last second of an hour
+
+
+class TestTrendAggregator:
+    def test_windows_compare_against_the_previous_period(self):
+        trends = TrendAggregator()
+        # Yesterday: 2 sales at 100; today: 4 sales at 150
+        trends.add_sales([100, 100], [NOW - 30 * HOUR] * 2, ["digital"] * 2)
+        trends.add_sales([150] * 4, [NOW - HOUR] * 4, ["digital"] * 4)
+
+        result = trends.query("24h", "digital", now=NOW)
+        assert result["volume"] == 4
+        assert result["previous_volume"] == 2
+        assert result["average_price"] == 150
+        assert result["price_trend"] == 0.5
+        assert result["volume_trend"] == 1.0
+        assert result["sentiment"] == "bullish"
+
+        week = trends.query("7d", now=NOW)
+        assert week["volume"] == 6 and week["previous_volume"] == 0
+
+    def test_category_filter_and_unknown_category(self):
+        trends = TrendAggregator()
+        trends.add_sales([10, 20], [NOW, NOW], ["Digital", "abstract"])
+
+        assert trends.query("24h", "digital", now=NOW)["total_value"] == 10
+        assert trends.query("24h", now=NOW)["total_value"] == 30
+        assert trends.query("24h", "sculpture", now=NOW)["volume"] == 0
+        with pytest.raises(ValueError):
+            trends.query("1y")
+
+    def test_ring_reuses_expired_slots(self):
+        trends = TrendAggregator(horizon_seconds=48 * HOUR)
+        trends.add_sales([100], [NOW - 40 * HOUR], ["digital"])
+        # 49 hours later the same slot belongs to a new hour
+        later = NOW - 40 * HOUR + trends.buckets * HOUR
+        trends.add_sales([300], [later], ["digital"])
+
+        assert trends.query("24h", now=later)["total_value"] == 300
+        assert trends.query("7d", now=later)["volume"] == 1
+
+        # Older than the horizon: dropped
+        assert trends.add_sales([5], [NOW - 40 * HOUR], ["digital"]) == 0
+        assert trends.get_stats()["dropped"] == 1
+
+    def test_opportunities_rank_rising_categories(self):
+        trends = TrendAggregator()
+        trends.add_sales([100] * 10, [NOW - 30 * HOUR] * 10, ["digital"] * 10)
+        trends.add_sales([130] * 10, [NOW - HOUR] * 10, ["digital"] * 10)
+        trends.add_sales([50] * 5, [NOW - 30 * HOUR] * 5, ["abstract"] * 5)
+        trends.add_sales([50] * 2, [NOW - HOUR] * 2, ["abstract"] * 2)
+
+        (opportunity,) = trends.opportunities("24h", now=NOW)
+        assert opportunity["category"] == "digital"
+        assert opportunity["type"] == "price_increase"
+        assert 0 < opportunity["confidence"] < 1
+
+    def test_cached_ranking_follows_new_sales_and_bucket_rolls(self):
+        trends = TrendAggregator()
+        trends.add_sales([100] * 10, [NOW - 30 * HOUR] * 10, ["digital"] * 10)
+        trends.add_sales([130] * 10, [NOW - HOUR] * 10, ["digital"] * 10)
+        first = trends.opportunities("24h", now=NOW)
+        first[0]["change"] = 99  # callers get copies
+        assert trends.opportunities("24h", now=NOW)[0]["change"] == 0.3
+
+        trends.add_sales([50] * 5, [NOW - 30 * HOUR] * 5, ["abstract"] * 5)
+        trends.add_sales([50] * 20, [NOW - HOUR] * 20, ["abstract"] * 20)
+        assert trends.opportunities("24h", now=NOW)[0]["category"] == "abstract"
+
+        # A day later both windows have moved on and nothing is rising
+        assert trends.opportunities("24h", now=NOW + 24 * HOUR) == []
+
+    def test_category_rows_are_capped(self):
+        trends = TrendAggregator(max_categories=8)
+        for i in range(100):
+            trends.add_sales([10], [NOW], [f"style-{i}"])
+
+        assert len(trends.categories) == 8
+        assert trends.query("24h", "other", now=NOW)["volume"] == 93
+        assert trends.query("24h", now=NOW)["volume"] == 100
+        assert trends.get_stats()["memory_kb"] <= 8 * trends.buckets * 16 / 1024
+
+    def test_bad_prices_and_future_timestamps_are_rejected(self):
+        trends = TrendAggregator()
+        trends.add_sales([100], [NOW], ["digital"], now=NOW)
+        for prices, stamps in (
+            ([-1], [NOW]),
+            ([float("nan")], [NOW]),
+            ([float("inf")], [NOW]),
+            ([100], [float("nan")]),
+            ([100], [NOW + 10 * 365 * 86400]),
+        ):
+            with pytest.raises(ValueError):
+                trends.add_sales(prices, stamps, ["digital"], now=NOW)
+
+        # The rejected far-future sale did not push later sales out of the horizon
+        assert trends.add_sales([100], [NOW], ["digital"], now=NOW) == 1
+        assert trends.query("24h", "digital", now=NOW)["volume"] == 2
+
+
+class TestTrendEndpoint:
+    client = TestClient(app)
+
+    def test_sales_feed_the_trends(self):
+        category = f"test-{time.time_ns()}"
+        response = self.client.post(
+            "/market/sales",
+            json={
+                "sales": [
+                    {"price": 200, "category": category},
+                    {"price": 400, "category": category},
+                ]
+            },
+        )
+        assert response.json() == {"accepted": 2, "dropped": 0}
+
+        response = self.client.get(f"/market/trends?timeframe=7d&category={category}")
+        assert response.status_code == 200
+        data = response.json()["trend_data"]
+        assert data["volume"] == 2
+        assert data["average_price"] == 300
+        assert category in trend_aggregator.categories
+
+    def test_unknown_timeframe_is_rejected(self):
+        assert self.client.get("/market/trends?timeframe=1y").status_code == 400
+
+    def test_invalid_sales_are_rejected_by_the_model(self):
+        now = time.time()
+        for sale in (
+            {"price": -5, "category": "digital"},
+            {"price": "NaN", "category": "digital"},
+            {"price": 5, "category": "digital", "timestamp": now + 10 * 365 * 86400},
+            {"price": 5, "category": "digital", "timestamp": now - 10 * 365 * 86400},
+        ):
+            response = self.client.post("/market/sales", json={"sales": [sale]})
+            assert response.status_code == 422
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from server.main import app
+from server.services.quantiles import PriceSketches, QuantileSketch
+from server.services.trends import TrendAggregator
+
+DAY = 86400
+NOW = 1_700_000_000
+
+
+def exact_quantile(values, q):
+    return np.sort(values)[int(q * (len(values) - 1))]
+
+
+class TestQuantileSketch:
+    @pytest.mark.parametrize("q", [0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 1.0])
+    def test_relative_error_bound(self, q):
+        values = np.random.default_rng(0).lognormal(6, 1.5, 50_000)
+        sketch = QuantileSketch(alpha=0.01).add(values)
+
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1e-9
+
+    def test_merge_equals_one_sketch_over_everything(self):
+        values = np.random.default_rng(1).lognormal(4, 1, 10_000)
+        whole = QuantileSketch().add(values)
+        merged = QuantileSketch()
+        for part in np.array_split(values, 7):
+            merged.merge(QuantileSketch().add(part))
+
+        assert np.array_equal(whole.counts, merged.counts)
+        with pytest.raises(ValueError):
+            merged.merge(QuantileSketch(alpha=0.02))
+
+    def test_round_trip_and_rank(self):
+        sketch = QuantileSketch().add([1, 2, 3, 4, 0.001])
+        copy = QuantileSketch.from_dict(sketch.to_dict())
+
+        assert np.array_equal(copy.counts, sketch.counts)
+        assert copy.quantile(0) == 0.0  # below min_value counts as zero
+        assert copy.rank(2) == 0.6
+        assert QuantileSketch().quantile(0.5) is None
+
+
+class TestPriceSketches:
+    def test_windows_and_categories(self):
+        sketches = PriceSketches()
+        sketches.add_sales([100] * 3, [NOW - 20 * DAY] * 3, ["digital"] * 3)
+        sketches.add_sales([300] * 3, [NOW] * 3, ["digital"] * 3)
+        sketches.add_sales([50], [NOW], ["abstract"])
+
+        week = sketches.summary("digital", "7d", now=NOW)
+        assert week["sales"] == 3
+        assert week["quantiles"]["p50"] == pytest.approx(300, rel=0.01)
+        month = sketches.window("digital", "30d", now=NOW)
+        assert month.count == 6
+        assert sketches.window(None, "24h", now=NOW).count == 4
+        assert sketches.window("sculpture", "30d", now=NOW).count == 0
+
+    def test_merge_across_processes(self):
+        rng = np.random.default_rng(2)
+        prices = rng.lognormal(5, 1, 2000)
+        stamps = NOW - rng.uniform(0, 10 * DAY, 2000)
+        one, a, b = PriceSketches(), PriceSketches(), PriceSketches()
+        one.add_sales(prices, stamps, ["digital"] * 2000)
+        a.add_sales(prices[:1000], stamps[:1000], ["digital"] * 1000)
+        b.add_sales(prices[1000:], stamps[1000:], ["digital"] * 1000)
+        a.merge(b)
+
+        assert np.array_equal(
+            a.window("digital", "30d", now=NOW).counts,
+            one.window("digital", "30d", now=NOW).counts,
+        )
+        with pytest.raises(ValueError):
+            a.merge(PriceSketches(bucket_seconds=3600))
+
+    def test_category_rows_are_capped(self):
+        sketches = PriceSketches(max_categories=4)
+        names = [f"style-{i}" for i in range(50)]
+        sketches.add_sales([100] * 50, [NOW] * 50, names)
+
+        assert sketches.categories == ["style-0", "style-1", "style-10", "other"]
+        assert sketches.window("other", "24h", now=NOW).count == 47
+        assert sketches.window(None, "24h", now=NOW).count == 50
+        assert sketches.get_stats()["memory_mb"] <= 4 * 0.27
+
+    def test_categories_match_the_trend_buckets(self):
+        sketches, trends = PriceSketches(), TrendAggregator()
+        assert sketches.max_categories == trends.max_categories
+        names = [f"style-{i}" for i in range(2 * trends.max_categories)]
+        for batch in (names[:10], names[10:], names[::-1]):
+            sketches.add_sales([100] * len(batch), [NOW] * len(batch), batch)
+            trends.add_sales([100] * len(batch), [NOW] * len(batch), batch, now=NOW)
+
+        assert sketches.categories == trends.categories
+        for name in trends.categories:
+            assert (
+                sketches.summary(name, "24h", now=NOW)["quantiles"]["p50"] is not None
+            )
+
+
+class TestSketchEndpoints:
+    client = TestClient(app)
+
+    def test_price_analysis_uses_the_sketches(self):
+        self.client.post(
+            "/market/sales",
+            json={
+                "sales": [
+                    {"price": p, "category": "sketch-test"} for p in range(1, 101)
+                ]
+            },
+        )
+        response = self.client.get(
+            "/wp-json/vortex-ai/v1/artwork-analytics/1?category=sketch-test&price=25"
+        )
+        analysis = response.json()["price_analysis"]
+        assert analysis["comparable_price_range"]["sales"] == 100
+        assert analysis["optimal_price"] == pytest.approx(50, rel=0.02)
+        assert analysis["price_percentile"] == pytest.approx(0.25, abs=0.02)
+
+        categories = self.client.get("/market/opportunities").json()[
+            "trending_categories"
+        ]
+        (entry,) = [c for c in categories if c["name"] == "sketch-test"]
+        assert entry["median_price"] == pytest.approx(50, rel=0.02)
@@ -0,0 +1,148 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.main import app
+from server.services.opportunities import MAX_OFFSET, UndervaluedIndex
+
+
+def brute_force(assets, category=None):
+    ranked = [
+        (a["predicted_value"] / a["current_price"] - 1, asset_id)
+        for asset_id, a in assets.items()
+        if category is None or a["category"] == category
+    ]
+    return [asset_id for ret, asset_id in sorted(ranked, reverse=True) if ret > 0]
+
+
+class TestUndervaluedIndex:
+    def test_ranking_and_pagination(self):
+        index = UndervaluedIndex()
+        index.upsert("a", 100, 150, "digital")
+        index.upsert("b", 100, 300, "abstract")
+        index.upsert("c", 100, 120, "digital")
+        index.upsert("d", 100, 90, "digital")  # overvalued: never listed
+
+        page = index.top(limit=2)
+        assert [a["id"] for a in page["assets"]] == ["b", "a"]
+        assert page["assets"][0]["potential_return"] == 2.0
+        assert page["total"] == 3
+        assert [a["id"] for a in index.top(limit=2, offset=2)["assets"]] == ["c"]
+        assert [a["id"] for a in index.top(category="Digital")["assets"]] == ["a", "c"]
+        assert index.top(category="sculpture")["assets"] == []
+
+    def test_updates_reorder_and_remove(self):
+        index = UndervaluedIndex()
+        index.upsert("a", 100, 150, "digital")
+        index.upsert("b", 100, 130, "digital")
+
+        index.update("a", current_price=149)  # return drops to ~0.7%
+        assert [a["id"] for a in index.top()["assets"]] == ["b", "a"]
+        index.update("b", predicted_value=50)  # no longer undervalued
+        assert [a["id"] for a in index.top()["assets"]] == ["a"]
+        assert index.top()["total"] == 1
+        index.remove("a")
+        assert index.top()["assets"] == []
+        assert index.get_stats()["undervalued"] == 0
+
+        with pytest.raises(KeyError):
+            index.update("missing", current_price=1)
+        with pytest.raises(ValueError):
+            index.upsert("z", 0, 10)
+        for price, value in (
+            (float("nan"), 10),
+            (10, float("inf")),
+            (10, float("nan")),
+        ):
+            with pytest.raises(ValueError):
+                index.upsert("z", price, value)
+        assert len(index) == 1  # only "b"
+
+    def test_matches_brute_force_under_random_updates(self):
+        rng = random.Random(0)
+        index = UndervaluedIndex()
+        assets = {}
+        for step in range(5000):
+            asset_id = f"asset_{rng.randrange(300)}"
+            if asset_id in assets and rng.random() < 0.1:
+                index.remove(asset_id)
+                del assets[asset_id]
+                continue
+            asset = {
+                "category": rng.choice(["digital", "abstract", "photo"]),
+                "current_price": rng.uniform(10, 1000),
+                "predicted_value": rng.uniform(10, 1000),
+            }
+            assets[asset_id] = asset
+            index.upsert(asset_id, **asset)
+
+        for category in (None, "digital", "photo"):
+            expected = brute_force(assets, category)
+            page = index.top(limit=25, offset=5, category=category)
+            assert [a["id"] for a in page["assets"]] == expected[5:30]
+            assert page["total"] == len(expected)
+        # Stale entries are compacted away rather than piling up
+        assert index.get_stats()["heap_entries"] < 2 * (5000 + 2 * 1024)
+
+
+class TestOpportunitiesEndpoint:
+    client = TestClient(app)
+
+    def test_assets_feed_the_opportunities(self):
+        response = self.client.post(
+            "/market/assets",
+            json={
+                "assets": [
+                    {
+                        "id": "uv-1",
+                        "current_price": 500,
+                        "predicted_value": 750,
+                        "category": "uv-test",
+                    },
+                    {
+                        "id": "uv-2",
+                        "current_price": 100,
+                        "predicted_value": 400,
+                        "category": "uv-test",
+                    },
+                ]
+            },
+        )
+        assert response.status_code == 200
+
+        data = self.client.get(
+            "/market/opportunities?category=uv-test&limit=1&offset=1"
+        ).json()
+        assert data["undervalued_assets"] == [
+            {
+                "id": "uv-1",
+                "category": "uv-test",
+                "current_price": 500.0,
+                "predicted_value": 750.0,
+                "potential_return": 0.5,
+            }
+        ]
+        assert data["pagination"] == {"offset": 1, "limit": 1, "total": 2}
+
+        response = self.client.get(
+            f"/market/opportunities?offset={MAX_OFFSET + 1}&limit=1"
+        )
+        assert response.status_code == 422
+
+    def test_invalid_input_is_rejected(self):
+        response = self.client.post(
+            "/market/assets",
+            json={"assets": [{"id": "x", "current_price": 0, "predicted_value": 1}]},
+        )
+        assert response.status_code == 400
+        response = self.client.post(
+            "/market/assets",
+            json={
+                "assets": [
+                    {"id": "x", "current_price": 1, "predicted_value": "Infinity"}
+                ]
+            },
+        )
+        assert response.status_code == 422
+        assert self.client.get("/market/opportunities?limit=0").status_code == 422